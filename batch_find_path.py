@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import pandas as pd
+
+from processRoadNetwork.ContractionHierarchy import ContractionHierarchy
+from processRoadNetwork.ImportNetwork import ImportNetwork
+from processRoadNetwork.Landmarks import Landmarks
+from processRoadNetwork.PathCache import PathCache
+from processRoadNetwork.PathFile import PathFile
+from processRoadNetwork.SearchStats import SearchStats
+from processRoadNetwork.SectionSolver import SectionSolver
+
+
+def read_route_sections(route_UID2node_dir: str):
+    """讀取每條路線的UID與點號對應，回傳[(區間檔名, 起點, 終點)]"""
+    route_sections = []
+    for f in os.listdir(route_UID2node_dir):
+        if not f.endswith('.csv'):
+            continue
+        route_UID2node = pd.read_csv(os.path.join(route_UID2node_dir, f))
+        node_list = list(map(int, route_UID2node['TargetID'].tolist()))
+        uid_list = route_UID2node['InputID'].tolist()
+        for (n1, n2), (u1, u2) in zip(zip(node_list, node_list[1:]), zip(uid_list, uid_list[1:])):
+            path_filename = '{}({})_{}({})'.format(n1, u1, n2, u2)
+            route_sections.append((path_filename, n1, n2))
+    print('完成路線讀取...(區間數: {})'.format(len(route_sections)))
+    return route_sections
+
+def main():
+    D_drive = 'D:/Users/63707/Documents/python3/bus_route/'
+    data_dir = os.path.join(D_drive, 'find_path_test')
+
+    output_dir = {
+        'route_UID2node': os.path.join(data_dir, '00_route_UID2node'),
+        'init_path': os.path.join(data_dir, '01_initial_path_result'),
+        'frthr_inspct': os.path.join(data_dir, '02_further_inspect'),
+        'checked_path': os.path.join(data_dir, '03_checked_path'),
+    }
+    node_csv_path = 'P:/09091-中臺區域模式/Working/98_GIS/road/CSV/C_TWN_NET_node.csv'
+    road_csv_path = 'P:/09091-中臺區域模式/Working/98_GIS/road/CSV/C_TWN_NET_link.csv'
+
+    excluded_roadtype = ['RR', 'ZL', 'WL', 'TL']
+    #第一次讀CSV後路網會存起來，之後直接用memory map讀存檔
+    road_graph = ImportNetwork.load_graph(node_csv_path, road_csv_path, excluded_roadtype, min_N=5001, max_N=150000)
+    #小連通塊與死路的清單，區間找不到路徑時拿來對照
+    ImportNetwork.export_diagnostics(road_graph, os.path.join(data_dir, 'network_diagnostics.csv'))
+
+    #預處理contraction hierarchy，存在路網檔旁邊，路網沒改就直接讀檔
+    ch_path = '{}_CH.npz'.format(os.path.splitext(road_csv_path)[0])
+    hierarchy = ContractionHierarchy.prepare(road_graph, ch_path)
+    #ALT地標也存在路網檔旁邊，A*用地標的下界當heuristic
+    landmarks = Landmarks.prepare(road_graph, '{}_landmarks.npz'.format(os.path.splitext(road_csv_path)[0]))
+    path_cache = PathCache.for_network(node_csv_path, road_csv_path, excluded_roadtype)
+
+    #已經確認過或已經有初步結果的區間就不用再算
+    todo = []
+    for path_filename, n1, n2 in read_route_sections(output_dir['route_UID2node']):
+        if (
+            os.path.isfile(os.path.join(output_dir['checked_path'], '{}.txt'.format(path_filename))) or
+            os.path.isfile(os.path.join(output_dir['init_path'], '{}.txt'.format(path_filename)))
+        ):
+            continue
+        if n1 == n2: #頭尾同站就不用找路徑
+            PathFile.save([n1], output_dir['checked_path'], path_filename)
+        elif n1 != 0 and n2 != 0: #0是還沒對應到點號的站牌
+            todo.append((path_filename, n1, n2))
+
+    search_stats = SearchStats()
+    solver = SectionSolver(road_graph, hierarchy, landmarks, path_cache=path_cache, stats=search_stats)
+    section_result = solver.solve([(n1, n2) for _, n1, n2 in todo])
+    path_cache.save()
+    #記下每次搜尋花的時間，找出特別慢的區間
+    print('\n'.join(search_stats.slowest_report()))
+    search_stats.save(os.path.join(data_dir, 'search_stats.csv'))
+
+    #找不到的區間跟find_path一樣放到待檢查區，之後在QGIS裡處理
+    num_failed = 0
+    for path_filename, n1, n2 in todo:
+        path_list, _ = section_result[(n1, n2)]
+        if len(path_list) > 0:
+            PathFile.save(path_list, output_dir['init_path'], path_filename)
+        else:
+            PathFile.save([n1, 0, n2], output_dir['frthr_inspct'], path_filename)
+            num_failed += 1
+    print('完成區間路徑輸出...(找不到的區間數: {})'.format(num_failed))
+
+if __name__ == '__main__':
+    main()
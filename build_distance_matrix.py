@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+import os
+from math import radians
+
+import pandas as pd
+
+from processRoadNetwork.DistanceMatrix import DistanceMatrix
+from processRoadNetwork.ImportNetwork import ImportNetwork
+from processRoadNetwork.LatLonToTWD97 import LatLonToTWD97
+from processRoadNetwork.NodeIndex import NodeIndex
+
+
+def read_bus_stop(ptx_data_dir: str, zone2dir: dict):
+    """讀取各區域的bus_stop.csv，回傳{StopUID: TWD97座標}"""
+    stop_coord = {}
+    for zone in zone2dir:
+        stop_path = os.path.join(ptx_data_dir, zone2dir[zone], 'bus_stop.csv')
+        if not os.path.isfile(stop_path):
+            print('找不到{}'.format(stop_path))
+            continue
+        bus_stop = pd.read_csv(stop_path)
+        for StopUID, lat, lon in zip(bus_stop.StopUID, bus_stop.PositionLat, bus_stop.PositionLon):
+            #get_ptx_bus輸出的bus_stop.csv經緯度欄位是反的，臺灣的緯度一定比經度小
+            if lat > lon:
+                lat, lon = lon, lat
+            stop_coord[StopUID] = LatLonToTWD97().convert(radians(lat), radians(lon))
+    print('完成站牌讀取...(站牌數: {})'.format(len(stop_coord)))
+    return stop_coord
+
+def snap_stop(road_graph, stop_coord: dict, max_snap_dist: float):
+    """把站牌接到直線距離最近的節點，超過max_snap_dist(m)的站牌就略過"""
+    stop_uid = list(stop_coord)
+    stop_x = [stop_coord[s][0] for s in stop_uid]
+    stop_y = [stop_coord[s][1] for s in stop_uid]
+    nearest_node, dist = NodeIndex.from_graph(road_graph).query(stop_x, stop_y)
+    stop_node = {
+        StopUID: int(nearest_node[i, 0]) for i, StopUID in enumerate(stop_uid) if dist[i, 0] <= max_snap_dist
+    }
+    print('完成站牌對應節點...(對應到的站牌數: {})'.format(len(stop_node)))
+    return stop_node
+
+def main():
+    D_drive = 'D:/Users/63707/Documents/python3/bus_route/'
+    data_dir = os.path.join(D_drive, 'find_path_test')
+    ptx_data_dir = os.path.join(D_drive, 'PTX_data/CSV_20210407/Bus')
+    matrix_path = os.path.join(data_dir, 'C_TWN_bus_stop_distance_matrix.csv')
+
+    zone2dir = {
+        'MIA': 'City/MiaoliCounty/',
+        'TXG': 'City/Taichung/',
+        'CHA': 'City/ChanghuaCounty/',
+        'NAN': 'City/NantouCounty/',
+        'YUN': 'City/YunlinCounty/',
+        'THB': 'InterCity'
+    }
+    node_csv_path = 'P:/09091-中臺區域模式/Working/98_GIS/road/CSV/C_TWN_NET_node.csv'
+    road_csv_path = 'P:/09091-中臺區域模式/Working/98_GIS/road/CSV/C_TWN_NET_link.csv'
+
+    excluded_roadtype = ['RR', 'ZL', 'WL', 'TL']
+    #第一次讀CSV後路網會存起來，之後直接用memory map讀存檔
+    road_graph = ImportNetwork.load_graph(
+        node_csv_path, road_csv_path, excluded_roadtype, min_N=5001, max_N=150000, with_length=True
+    )
+
+    stop_coord = read_bus_stop(ptx_data_dir, zone2dir)
+    stop_node = snap_stop(road_graph, stop_coord, max_snap_dist=500)
+
+    #每個站牌保留旅行時間在cutoff內最近的10個節點，第一筆就是站牌接上的節點
+    distance_matrix = DistanceMatrix(road_graph)
+    distance_matrix.compute(stop_node, cutoff=20, max_targets=10)
+    distance_matrix.save(matrix_path)
+
+if __name__ == '__main__':
+    main()
@@ -2,10 +2,16 @@
 
 import os
 import re
-import csv
-from math import cos, radians, sin, sqrt, tan
 from pathlib import Path
 
+from processRoadNetwork.ContractionHierarchy import ContractionHierarchy
+from processRoadNetwork.ImportNetwork import ImportNetwork
+from processRoadNetwork.Landmarks import Landmarks
+from processRoadNetwork.PathCache import PathCache
+from processRoadNetwork.PathClient import PathClient
+from processRoadNetwork.SearchStats import SearchStats
+from processRoadNetwork.ShortestPath import ShortestPath
+
 
 def check_csv_file(file_name: str, file_type: str, pass_all: bool):
     while not os.path.isfile(file_name) and not pass_all:
@@ -30,246 +36,16 @@ def check_csv_file(file_name: str, file_type: str, pass_all: bool):
 
     return file_name, pass_all
 
-class ImportNetwork():
-    @staticmethod
-    def get_road_list(road_csv_path: str, excluded_roadtype: list):
-        road_dict = {}
-        with open(road_csv_path, newline='', encoding='utf-8') as road_csv:
-            road_row = csv.reader(road_csv)
-            first = True
-            for r in road_row:
-                if first:
-                    roadtype = r.index('ROADTYPE')
-                    length = r.index('LENGTH')
-                    A = r.index('A')
-                    B = r.index('B')
-                    dir = r.index('DIR')
-                    spdclass = r.index('SPDCLASS')
-                    first = False
-                else:
-                    if r[roadtype] not in excluded_roadtype:
-                        if int(r[spdclass]) <= 2:
-                            speed = 100
-                        elif int(r[spdclass]) <= 4:
-                            speed = 90
-                        elif int(r[spdclass]) <= 19:
-                            speed = 60
-                        elif int(r[spdclass]) <= 34:
-                            speed = 50
-                        else:
-                            speed = 40
-                        travel_time = float(r[length]) / speed
-                        if int(r[dir]) == 0 or int(r[dir]) == 2:
-                            road_dict[(int(r[A]), int(r[B]))] = travel_time
-                            road_dict[(int(r[B]), int(r[A]))] = travel_time
-                        elif int(r[dir]) == 1:
-                            road_dict[(int(r[A]), int(r[B]))] = travel_time
-                        else:
-                            road_dict[(int(r[B]), int(r[A]))] = travel_time
-        
-        print('完成道路讀取...')
-        return road_dict
-
-    @staticmethod
-    def get_node_list(node_csv_path: str, min_N: int, max_N: int):
-        node_list = {}
-        with open(node_csv_path, newline='', encoding='utf-8') as node_csv:
-            node_row = csv.reader(node_csv)
-            first = True
-            for n in node_row:
-                if first:
-                    N = n.index('N')
-                    X = n.index('X')
-                    Y = n.index('Y')
-                    first = False
-                else:
-                    if int(n[N]) <= max_N and int(n[N]) >= min_N:
-                        node_list[int(n[N])] = LatLonToTWD97().convert(radians(float(n[Y])), radians(float(n[X])))
-            
-        print('完成節點讀取...')
-        return node_list
-
-    @staticmethod
-    def generate_tree(node_dict: dict, road_dict: dict):
-        road_tree = {n: [] for n in node_dict}
-        for r in road_dict:
-            road_tree[r[0]].append(r[1])
-        print('完成相鄰節點建立...')
-        return road_tree
-
-class ShortestPath(object):
-    """尋找最短路徑"""
-
-    def __init__(self, node_dict: dict, road_dict: dict, road_tree: dict):
-        self.node_dict = node_dict
-        self.road_dict = road_dict
-        self.road_tree = road_tree
-
-    def find_shortest_path(self, OD_node: list, max_level: int = 1000):
-        p1 = OD_node[0]
-        p2 = OD_node[1]
-        # 兩點相鄰
-        if (p1, p2) in self.road_dict:
-            return [p1, p2], self.road_dict[(p1, p2)]
-
-        if p1 in self.node_dict and p2 in self.node_dict:
-            path, distance = self.a_star_alg(p1, p2, max_level)
-            return path, distance
-
-    def a_star_alg(self, p1: int, p2: int, max_level: int = 1000):
-        """Returns a list of nodes as a path from the given start to the given end in the given road network"""
-        
-        # Create start and end node
-        start_node = Node(None, p1, self.node_dict[p1])
-        start_node.g = start_node.h = start_node.f = 0
-        end_node = Node(None, p2, self.node_dict[p2])
-        end_node.g = end_node.h = end_node.f = 0
-
-        # Initialize both open and closed list
-        open_list = []
-        closed_list = []
-
-        # Add the start node
-        open_list.append(start_node)
-
-        # Loop until you find the end
-        level = 0
-        while len(open_list) > 0 and level < max_level:
-            level += 1
-
-            # Get the current node (the node in open_list with the lowest cost)
-            current_node = open_list[0]
-            current_index = 0
-            for index, item in enumerate(open_list):
-                if item.f < current_node.f:
-                    current_node = item
-                    current_index = index
-
-            # Pop current off open list, add to closed list
-            open_list.pop(current_index)
-            closed_list.append(current_node)
-
-            # Found the goal
-            if current_node == end_node:
-                path = []
-                distance = current_node.g
-                current = current_node
-                while current is not None:
-                    path.append(current.number)
-                    current = current.parent
-
-                return path[::-1], distance # Return reversed path
-
-            # Generate children
-            children = []
-            for new_number in self.road_tree[current_node.number]: # Adjacent nodes
-                new_node = Node(current_node, new_number, self.node_dict[new_number])
-                children.append(new_node)
-
-            # Loop through children
-            for child in children:
-                append_to_open_list = False
-
-                # Create the f, g, and h values
-                child.g = current_node.g + self.road_dict[(current_node.number, child.number)]
-                child.h = sqrt((child.x - end_node.x) ** 2 + (child.y - end_node.y) ** 2) / 200
-                child.f = child.g + child.h
-
-                # Child is already in the closed list
-                closed_list, append_to_open_list = self.check_in_list(child, closed_list, append_to_open_list)
-
-                # Child is already in the open list
-                open_list, append_to_open_list = self.check_in_list(child, open_list, append_to_open_list)
-
-                # Add the child to the open list
-                if append_to_open_list:
-                    open_list.append(child)
-
-        return [], 1e10
-
-    @staticmethod
-    def check_in_list(child, check_list, append_to_open_list):
-        '''check if the child is in open or closed list'''
-        child_in_check_list = [index for index, check_node in enumerate(check_list) if check_node == child]
-        if len(child_in_check_list) > 0:
-            for index in child_in_check_list:
-                if child.g < check_list[index].g:
-                    check_list.pop(index)
-                    append_to_open_list = True
-                    break
-        else:
-            append_to_open_list = True
-        
-        return check_list, append_to_open_list
-
-class Node():
-    """A node class for A* Pathfinding"""
-
-    def __init__(self, parent=None, number=None, coord=None):
-        self.parent = parent
-        self.number = number
-        self.x, self.y = coord[0], coord[1]
-        self.g = 0
-        self.h = 0
-        self.f = 0
-
-    def __eq__(self, other):
-        return self.number == other.number
-
-class LatLonToTWD97(object):
-    """This object provide method for converting lat/lon coordinate to TWD97
-    coordinate
-
-    the formula reference to
-    http://www.uwgb.edu/dutchs/UsefulData/UTMFormulas.htm (there is lots of typo)
-    http://www.offshorediver.com/software/utm/Converting UTM to Latitude and Longitude.doc
-
-    Parameters reference to
-    http://rskl.geog.ntu.edu.tw/team/gis/doc/ArcGIS/WGS84%20and%20TM2.htm
-    http://blog.minstrel.idv.tw/2004/06/taiwan-datum-parameter.html
-    """
-
-    def __init__(self, a = 6378137.0, b = 6356752.314245, long0 = radians(121), k0 = 0.9999, dx = 250000,):
-        self.a = a # Equatorial radius
-        self.b = b # Polar radius
-        self.long0 = long0 # central meridian of zone
-        self.k0 = k0 # scale along long0
-        self.dx = dx # delta x in meter
-
-    def convert(self, lat, lon):
-        """Convert lat lon to twd97"""
-        a = self.a
-        b = self.b
-        long0 = self.long0
-        k0 = self.k0
-        dx = self.dx
-
-        e = (1 - b ** 2 / a ** 2) ** 0.5
-        e2 = e ** 2 / (1 - e ** 2)
-        n = (a - b) / (a + b)
-        nu = a / (1 - (e ** 2) * (sin(lat) ** 2)) ** 0.5
-        p = lon - long0
-
-        A = a * (1 - n + (5 / 4.0) * (n ** 2 - n ** 3) + (81 / 64.0)*(n ** 4  - n ** 5))
-        B = (3 * a * n / 2.0) * (1 - n + (7 / 8.0) * (n ** 2 - n ** 3) + (55 / 64.0) * (n ** 4 - n ** 5))
-        C = (15 * a * (n ** 2) / 16.0) * (1 - n + (3 / 4.0) * (n ** 2 - n ** 3))
-        D = (35 * a * (n ** 3) / 48.0) * (1 - n + (11 / 16.0) * (n ** 2 - n ** 3))
-        E = (315 * a * (n ** 4) / 51.0) * (1 - n)
-
-        S = A * lat - B * sin(2 * lat) + C * sin(4 * lat) - D * sin(6 * lat) + E * sin(8 * lat)
-
-        K1 = S * k0
-        K2 = k0 * nu * sin(2 * lat)/4.0
-        K3 = (k0 * nu * sin(lat) * (cos(lat) ** 3) / 24.0) * \
-            (5 - tan(lat) ** 2 + 9 * e2 * (cos(lat) ** 2) + 4 * (e2 ** 2) * (cos(lat) ** 4))
-
-        y = K1 + K2 * (p ** 2) + K3 * (p ** 4)
-
-        K4 = k0 * nu * cos(lat)
-        K5 = (k0 * nu * (cos(lat) ** 3) / 6.0) * (1 - tan(lat) ** 2 + e2 * (cos(lat) ** 2))
-
-        x = K4 * p + K5 * (p ** 3) + dx
-        return x, y
+def get_search_mode():
+    """選擇最短路徑的搜尋模式，'ch'才會預處理contraction hierarchy"""
+    mode_option = ''
+    while mode_option != '1' and mode_option != '2':
+        mode_option = input(
+            '請問最短路徑要用哪種搜尋呢？\n'
+            '1 = A*(啟動比較快)\n'
+            '2 = contraction hierarchy(第一次要花時間預處理，之後讀存檔，區間多時比較快)\n'
+            '請輸入1或2：')
+    return 'a_star' if mode_option == '1' else 'ch'
 
 def get_file_name():
     file_names = {}
@@ -516,10 +292,11 @@ class CheckSyntaxError(CheckError):
 class CheckNodeError(CheckError):
     """點號錯誤的相關東西"""
 
-    def __init__(self, path_finder: ShortestPath):
+    def __init__(self, path_finder: ShortestPath, num_alternatives: int = 2):
         print('\n再來檢查點號序之中的點號錯誤，像是重覆點號、點號錯誤之類的...')
         super().__init__('點號錯誤')
         self.path_finder = path_finder
+        self.num_alternatives = num_alternatives #可行解之外再列幾條替代路徑
         self.checked_result = {}
 
     def go_over_files(self, files_dict: dict, file_paths: dict):
@@ -530,6 +307,8 @@ class CheckNodeError(CheckError):
             no_node_error = self.line_sanity_check(f, files_dict[f])
             if not no_node_error:
                 self.remove_failed_path(file_paths[f])
+        if self.path_finder.stats is not None and len(self.path_finder.stats) > 0:
+            self.print_result('\n'.join(self.path_finder.stats.slowest_report()))
         self.close_logfile()
         print('點號檢查完畢')
 
@@ -548,12 +327,11 @@ class CheckNodeError(CheckError):
             passed_node_list = list(map(abs, passed_node_list))
             stop_pair = list(zip(passed_node_list, passed_node_list[1:]))
             
-            if_fail = False
-            failed_pair = []
-            for (p1, p2) in stop_pair:
-                if (p1, p2) not in self.path_finder.road_dict:
-                    if_fail = True
-                    failed_pair.append((p1, p2))
+            #整條路線的節線一次查完
+            failed_pair = [
+                pair for pair, cost in zip(stop_pair, self.path_finder.link_costs(stop_pair)) if cost is None
+            ]
+            if_fail = len(failed_pair) > 0
             
             no_node_error = no_node_error and (not if_fail)
             if if_fail:
@@ -600,22 +378,24 @@ class CheckNodeError(CheckError):
                             p3 = stop_pair[tail_index+1][1]
                         
                         found = False
+                        #同一個起點的終點一次找完
+                        section_ends = [p2] if p3 == p2 else [p2, p3]
                         # p1 -> p2
                         if not found:
                             section_type = '中間有誤'
-                            failed_caption, found = self.check_section(p1, p2, failed_path, section_type, failed_caption)
+                            failed_caption, found = self.check_section(p1, p2, failed_path, section_type, failed_caption, section_ends)
                         # p0 -> p2
                         if not found and p0 != p1:
                             section_type = '中間有誤、第一點({})可能有誤'.format(p1)
-                            failed_caption, found = self.check_section(p0, p2, failed_path, section_type, failed_caption)
+                            failed_caption, found = self.check_section(p0, p2, failed_path, section_type, failed_caption, section_ends)
                         # p1 -> p3
                         if not found and p3 != p2:
                             section_type = '中間有誤、最後點({})可能有誤'.format(p2)
-                            failed_caption, found = self.check_section(p1, p3, failed_path, section_type, failed_caption)
+                            failed_caption, found = self.check_section(p1, p3, failed_path, section_type, failed_caption, section_ends)
                         # p0 -> p3
                         if not found and p0 != p1 and p3 != p2:
                             section_type = '中間有誤、頭尾點({} & {})可能有誤'.format(p1, p2)
-                            failed_caption, found = self.check_section(p0, p3, failed_path, section_type, failed_caption)
+                            failed_caption, found = self.check_section(p0, p3, failed_path, section_type, failed_caption, section_ends)
                         if not found:
                             failed_caption.append(' {}  (其他錯誤)'.format(', '.join(map(str, failed_path))))
 
@@ -626,20 +406,31 @@ class CheckNodeError(CheckError):
             
         return no_node_error
     
-    def check_section(self, st: int, ed: int, failed_path: list, section_type: str, failed_caption: list):
+    def check_section(self, st: int, ed: int, failed_path: list, section_type: str, failed_caption: list, section_ends: list = None):
+        """section_ends是同一個起點之後可能會查的終點，一次搜尋就全部找好存起來"""
         found = False
-        if (st, ed) in self.checked_result:
-            path = self.checked_result[(st, ed)]
-        else:
-            path, _ = self.path_finder.find_shortest_path([st, ed], 10000)
+        if (st, ed) not in self.checked_result:
+            if section_ends is None or ed not in section_ends:
+                section_ends = [ed]
+            for end, (path, _) in self.path_finder.find_paths_from(st, section_ends, 10000).items():
+                self.checked_result[(st, end)] = path
+        path = self.checked_result[(st, ed)]
 
         if len(path) > 0:
             found = True
             failed_caption.append(' {}  ({}，可行解：{})'.format(', '.join(map(str, failed_path)), section_type, ', '.join(map(str, path))))
-            self.checked_result[(st, ed)] = path
+            for i, alt_path in enumerate(self.get_alternatives(st, ed, path)):
+                failed_caption.append('    替代解{}：{}'.format(i + 1, ', '.join(map(str, alt_path))))
         
         return failed_caption, found
 
+    def get_alternatives(self, st: int, ed: int, path: list):
+        """可行解不是公車真正走的路時，列出其他較短的路徑給人挑"""
+        if self.num_alternatives <= 0:
+            return []
+        k_paths = self.path_finder.k_shortest_paths([st, ed], self.num_alternatives + 1, 10000)
+        return [p for p, _ in k_paths if p != path][:self.num_alternatives]
+
 def main():
 
     error_type = {
@@ -668,10 +459,25 @@ def main():
 
     if not pass_all:
         excluded_roadtype = ['RR', 'ZL', 'WL', 'TL']
-        node_dict = ImportNetwork.get_node_list(node_csv_path, min_N=5001, max_N=150000)
-        road_dict = ImportNetwork.get_road_list(road_csv_path, excluded_roadtype=excluded_roadtype)
-        road_tree = ImportNetwork.generate_tree(node_dict, road_dict)
-        path_finder = ShortestPath(node_dict, road_dict, road_tree)
+        #有開path_server.py就直接查詢，不用自己讀路網
+        path_finder = PathClient.connect()
+        path_cache = None
+        search_stats = None
+        if path_finder is None:
+            search_mode = get_search_mode()
+            #第一次讀CSV後路網會存起來，之後直接用memory map讀存檔
+            road_graph = ImportNetwork.load_graph(node_csv_path, road_csv_path, excluded_roadtype, min_N=5001, max_N=150000)
+            #預處理contraction hierarchy，存在路網檔旁邊，路網沒改就直接讀檔
+            hierarchy = None
+            if search_mode == 'ch':
+                ch_path = '{}_CH.npz'.format(os.path.splitext(road_csv_path)[0])
+                hierarchy = ContractionHierarchy.prepare(road_graph, ch_path)
+            #ALT地標也存在路網檔旁邊，A*用地標的下界當heuristic
+            landmarks = Landmarks.prepare(road_graph, '{}_landmarks.npz'.format(os.path.splitext(road_csv_path)[0]))
+            #之前跑過的區間直接讀硬碟上的快取，路網檔改過會自動作廢
+            path_cache = PathCache.for_network(node_csv_path, road_csv_path, excluded_roadtype)
+            search_stats = SearchStats()
+            path_finder = ShortestPath(road_graph, hierarchy, landmarks, path_cache=path_cache, stats=search_stats)
 
         file_paths = get_file_name()
         files_data = {}
@@ -694,6 +500,9 @@ def main():
         if no_syntax_error:
             NodeCheck = CheckNodeError(path_finder)
             NodeCheck.go_over_files(files_dict, file_paths)
+            if path_cache is not None:
+                path_cache.save()
+                search_stats.save('{}_search_stats.csv'.format(os.path.splitext(road_csv_path)[0]))
             input('檢查完畢')
         else:
             input('公車路線資料有格式錯誤，結束程式')
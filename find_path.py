@@ -1,9 +1,8 @@
 # -*- coding: utf-8 -*-
 
-import csv
 import os
 import urllib.parse
-from math import cos, radians, sin, sqrt, tan
+from math import radians, sqrt
 from shutil import copy2
 from typing import List
 
@@ -17,6 +16,15 @@ from qgis.PyQt.QtCore import *
 from qgis.PyQt.QtGui import *
 from qgis.utils import *
 
+from processRoadNetwork.ContractionHierarchy import ContractionHierarchy
+from processRoadNetwork.ImportNetwork import ImportNetwork
+from processRoadNetwork.Landmarks import Landmarks
+from processRoadNetwork.LatLonToTWD97 import LatLonToTWD97
+from processRoadNetwork.NodeIndex import NodeIndex
+from processRoadNetwork.PathCache import PathCache
+from processRoadNetwork.PathClient import PathClient
+from processRoadNetwork.ShortestPath import ShortestPath
+
 
 class GetFile():
     @staticmethod
@@ -30,247 +38,6 @@ class GetFile():
     def get_file():
         pass
 
-class ImportNetwork():
-    @staticmethod
-    def get_road_list(road_csv_path: str, excluded_roadtype: List[str]):
-        road_dict = {}
-        with open(road_csv_path, newline='', encoding='utf-8') as road_csv:
-            road_row = csv.reader(road_csv)
-            first = True
-            for r in road_row:
-                if first:
-                    roadtype = r.index('ROADTYPE')
-                    length = r.index('LENGTH')
-                    A = r.index('A')
-                    B = r.index('B')
-                    dir = r.index('DIR')
-                    spdclass = r.index('SPDCLASS')
-                    first = False
-                else:
-                    if r[roadtype] not in excluded_roadtype:
-                        if int(r[spdclass]) <= 2:
-                            speed = 100
-                        elif int(r[spdclass]) <= 4:
-                            speed = 90
-                        elif int(r[spdclass]) <= 19:
-                            speed = 60
-                        elif int(r[spdclass]) <= 34:
-                            speed = 50
-                        else:
-                            speed = 40
-                        travel_time = float(r[length]) / speed
-                        if int(r[dir]) == 0 or int(r[dir]) == 2:
-                            road_dict[(int(r[A]), int(r[B]))] = travel_time
-                            road_dict[(int(r[B]), int(r[A]))] = travel_time
-                        elif int(r[dir]) == 1:
-                            road_dict[(int(r[A]), int(r[B]))] = travel_time
-                        else:
-                            road_dict[(int(r[B]), int(r[A]))] = travel_time
-        
-        print('完成道路讀取...')
-        return road_dict
-
-    @staticmethod
-    def get_node_list(node_csv_path: str, min_N: int, max_N: int):
-        node_list = {}
-        with open(node_csv_path, newline='', encoding='utf-8') as node_csv:
-            node_row = csv.reader(node_csv)
-            first = True
-            for n in node_row:
-                if first:
-                    N = n.index('N')
-                    X = n.index('X')
-                    Y = n.index('Y')
-                    first = False
-                else:
-                    if int(n[N]) <= max_N and int(n[N]) >= min_N:
-                        node_list[int(n[N])] = LatLonToTWD97().convert(radians(float(n[Y])), radians(float(n[X])))
-            
-        print('完成節點讀取...')
-        return node_list
-
-    @staticmethod
-    def generate_tree(node_dict: dict, road_dict: dict):
-        road_tree = {n: [] for n in node_dict}
-        for r in road_dict:
-            road_tree[r[0]].append(r[1])
-        print('完成相鄰節點建立...')
-        return road_tree
-
-class ShortestPath(object):
-    """尋找最短路徑"""
-
-    def __init__(self, node_dict: dict, road_dict: dict, road_tree: dict):
-        self.node_dict = node_dict
-        self.road_dict = road_dict
-        self.road_tree = road_tree
-
-    def find_shortest_path(self, OD_node: List[int], max_level: int = 1000):
-        p1 = OD_node[0]
-        p2 = OD_node[1]
-        # 兩點相鄰
-        if (p1, p2) in self.road_dict:
-            return [p1, p2], self.road_dict[(p1, p2)]
-
-        if p1 in self.node_dict and p2 in self.node_dict:
-            path, distance = self.a_star_alg(p1, p2, max_level)
-            return path, distance
-
-    def a_star_alg(self, p1: int, p2: int, max_level: int = 1000):
-        """Returns a list of nodes as a path from the given start to the given end in the given road network"""
-        
-        # Create start and end node
-        start_node = Node(None, p1, self.node_dict[p1])
-        start_node.g = start_node.h = start_node.f = 0
-        end_node = Node(None, p2, self.node_dict[p2])
-        end_node.g = end_node.h = end_node.f = 0
-
-        # Initialize both open and closed list
-        open_list = []
-        closed_list = []
-
-        # Add the start node
-        open_list.append(start_node)
-
-        # Loop until you find the end
-        level = 0
-        while len(open_list) > 0 and level < max_level:
-            level += 1
-
-            # Get the current node (the node in open_list with the lowest cost)
-            current_node = open_list[0]
-            current_index = 0
-            for index, item in enumerate(open_list):
-                if item.f < current_node.f:
-                    current_node = item
-                    current_index = index
-
-            # Pop current off open list, add to closed list
-            open_list.pop(current_index)
-            closed_list.append(current_node)
-
-            # Found the goal
-            if current_node == end_node:
-                path = []
-                distance = current_node.g
-                current = current_node
-                while current is not None:
-                    path.append(current.number)
-                    current = current.parent
-
-                return path[::-1], distance # Return reversed path
-
-            # Generate children
-            children = []
-            for new_number in self.road_tree[current_node.number]: # Adjacent nodes
-                new_node = Node(current_node, new_number, self.node_dict[new_number])
-                children.append(new_node)
-
-            # Loop through children
-            for child in children:
-                append_to_open_list = False
-
-                # Create the f, g, and h values
-                child.g = current_node.g + self.road_dict[(current_node.number, child.number)]
-                child.h = sqrt((child.x - end_node.x) ** 2 + (child.y - end_node.y) ** 2) / 200
-                child.f = child.g + child.h
-
-                # Child is already in the closed list
-                closed_list, append_to_open_list = self.check_in_list(child, closed_list, append_to_open_list)
-
-                # Child is already in the open list
-                open_list, append_to_open_list = self.check_in_list(child, open_list, append_to_open_list)
-
-                # Add the child to the open list
-                if append_to_open_list:
-                    open_list.append(child)
-
-        return [], 1e10
-
-    @staticmethod
-    def check_in_list(child, check_list, append_to_open_list):
-        '''check if the child is in open or closed list'''
-        child_in_check_list = [index for index, check_node in enumerate(check_list) if check_node == child]
-        if len(child_in_check_list) > 0:
-            for index in child_in_check_list:
-                if child.g < check_list[index].g:
-                    check_list.pop(index)
-                    append_to_open_list = True
-                    break
-        else:
-            append_to_open_list = True
-        
-        return check_list, append_to_open_list
-
-class Node():
-    """A node class for A* Pathfinding"""
-
-    def __init__(self, parent=None, number=None, coord=None):
-        self.parent = parent
-        self.number = number
-        self.x, self.y = coord[0], coord[1]
-        self.g = 0
-        self.h = 0
-        self.f = 0
-
-    def __eq__(self, other):
-        return self.number == other.number
-
-class LatLonToTWD97(object):
-    """This object provide method for converting lat/lon coordinate to TWD97
-    coordinate
-
-    the formula reference to
-    http://www.uwgb.edu/dutchs/UsefulData/UTMFormulas.htm (there is lots of typo)
-    http://www.offshorediver.com/software/utm/Converting UTM to Latitude and Longitude.doc
-
-    Parameters reference to
-    http://rskl.geog.ntu.edu.tw/team/gis/doc/ArcGIS/WGS84%20and%20TM2.htm
-    http://blog.minstrel.idv.tw/2004/06/taiwan-datum-parameter.html
-    """
-
-    def __init__(self, a = 6378137.0, b = 6356752.314245, long0 = radians(121), k0 = 0.9999, dx = 250000,):
-        self.a = a # Equatorial radius
-        self.b = b # Polar radius
-        self.long0 = long0 # central meridian of zone
-        self.k0 = k0 # scale along long0
-        self.dx = dx # delta x in meter
-
-    def convert(self, lat, lon):
-        """Convert lat lon to twd97"""
-        a = self.a
-        b = self.b
-        long0 = self.long0
-        k0 = self.k0
-        dx = self.dx
-
-        e = (1 - b ** 2 / a ** 2) ** 0.5
-        e2 = e ** 2 / (1 - e ** 2)
-        n = (a - b) / (a + b)
-        nu = a / (1 - (e ** 2) * (sin(lat) ** 2)) ** 0.5
-        p = lon - long0
-
-        A = a * (1 - n + (5 / 4.0) * (n ** 2 - n ** 3) + (81 / 64.0)*(n ** 4  - n ** 5))
-        B = (3 * a * n / 2.0) * (1 - n + (7 / 8.0) * (n ** 2 - n ** 3) + (55 / 64.0) * (n ** 4 - n ** 5))
-        C = (15 * a * (n ** 2) / 16.0) * (1 - n + (3 / 4.0) * (n ** 2 - n ** 3))
-        D = (35 * a * (n ** 3) / 48.0) * (1 - n + (11 / 16.0) * (n ** 2 - n ** 3))
-        E = (315 * a * (n ** 4) / 51.0) * (1 - n)
-
-        S = A * lat - B * sin(2 * lat) + C * sin(4 * lat) - D * sin(6 * lat) + E * sin(8 * lat)
-
-        K1 = S * k0
-        K2 = k0 * nu * sin(2 * lat)/4.0
-        K3 = (k0 * nu * sin(lat) * (cos(lat) ** 3) / 24.0) * \
-            (5 - tan(lat) ** 2 + 9 * e2 * (cos(lat) ** 2) + 4 * (e2 ** 2) * (cos(lat) ** 4))
-
-        y = K1 + K2 * (p ** 2) + K3 * (p ** 4)
-
-        K4 = k0 * nu * cos(lat)
-        K5 = (k0 * nu * (cos(lat) ** 3) / 6.0) * (1 - tan(lat) ** 2 + e2 * (cos(lat) ** 2))
-
-        x = K4 * p + K5 * (p ** 3) + dx
-        return x, y
-
 class ProcessPath():
     """處理站間路徑相關"""
     
@@ -501,7 +268,10 @@ class PrepareRoute():
 class ProcessUID2node(object):
     """處理UID與點號對應相關"""
 
-    def __init__(self, route_spec: List[str], GeometryFinder: SearchGeometry, StopUID2node_path: str, route_UID2node_dir: str, io_node_path: str):
+    def __init__(
+        self, route_spec: List[str], GeometryFinder: SearchGeometry, StopUID2node_path: str, route_UID2node_dir: str,
+        io_node_path: str, node_index: NodeIndex
+    ):
         self.dialog = QInputDialog()
         self.dialog.setGeometry(100, 100, 0, 0)
         self.msgbox = QMessageBox()
@@ -524,6 +294,7 @@ class ProcessUID2node(object):
         self.read_route()
 
         self.GeometryFinder = GeometryFinder
+        self.node_index = node_index #找站牌附近的節點，有開path_server.py時是PathClient
 
     def read_route(self):
         """讀取UID到點號的對應"""
@@ -717,12 +488,14 @@ class ProcessUID2node(object):
         this_seq = self.seq_to_UID.loc[seq_index, 'StopSequence']
         this_UID = self.seq_to_UID.loc[seq_index, 'StopUID']
         old_ID = self.route_UID2node.loc[seq_index, 'TargetID']
+        nearby = ', '.join('{} ({:.0f}m)'.format(n, d) for n, d in self.nearby_nodes(seq_index))
         while True:
             new_ID, OK = self.dialog.getInt(
                 self.dialog, '新的ID', 
                 '{} ({}): {} ({}/{})\n'
+                '站牌附近的節點: {}\n'
                 '請輸入新的ID\n'
-                '按取消來更改比例尺'.format(this_seq, this_UID, old_ID, seq_index + 1, self.seq_to_UID.shape[0]), 
+                '按取消來更改比例尺'.format(this_seq, this_UID, old_ID, seq_index + 1, self.seq_to_UID.shape[0], nearby), 
                 value=old_ID
             )
             if OK:
@@ -742,6 +515,17 @@ class ProcessUID2node(object):
             else:
                 self.set_scale(scale)
     
+    def nearby_nodes(self, stop: int, k: int = 5):
+        """用節點索引找離站牌最近的k個節點，回傳[(點號, 距離)]，route圖層找不到站牌就回傳[]"""
+        stop_point = self.GeometryFinder.get_point('route', 'StopSequence', [self.seq_to_UID.loc[stop, 'StopSequence']])[0]
+        if stop_point == []:
+            return []
+        x, y = stop_point.x(), stop_point.y()
+        if x < 1000:
+            x, y = LatLonToTWD97().convert(radians(y), radians(x))
+        nodes, dist = self.node_index.query([x], [y], k)
+        return [(int(n), float(d)) for n, d in zip(nodes[0], dist[0]) if n >= 0]
+
     def stop_to_node_distance(self, stop: int, node: int):
         """算站牌到節點的距離"""
         stop_point = self.GeometryFinder.get_point('route', 'StopSequence', [self.seq_to_UID.loc[stop, 'StopSequence']])[0]
@@ -879,30 +663,37 @@ class FindPath(object):
 
     def find_path(self, find_path_todo: list):
         """給定起終點，回傳路徑"""
-        all_path_list = []
-        for OD_str in find_path_todo:
-            OD_node = list(map(int, OD_str))
-            passed_node_list, _ = self.SPathFinder.find_shortest_path(OD_node)
-            if len(passed_node_list) == 0:
-                return [], False
-            
-            all_path_list.append(passed_node_list)
-            
-        path_list = [find_path_todo[0][0]]
-        for sp in all_path_list:
-            for node in sp[1:]:
-                path_list.append(node)
+        #(起點, 中間點..., 終點)一次找完
+        waypoints = [int(find_path_todo[0][0])] + [int(OD[1]) for OD in find_path_todo]
+        path_list, _ = self.SPathFinder.find_waypoint_path(waypoints)
+        if len(path_list) == 0:
+            return [], False
 
         return path_list, True
 
 class ProcessResult(object):
     """確認結果與修改錯誤"""
     @staticmethod
-    def manually_input(stop_node: List[int], passed_node_list: List[int], output_dir, path_filename):
-        """手動輸入最短路徑"""
+    def manually_input(stop_node: List[int], passed_node_list: List[int], output_dir, path_filename, alternatives: list = None):
+        """手動輸入最短路徑，alternatives是前k短的[(點序, 旅行時間)]，可以挑一條當作輸入的起點"""
         further_check = False
         check_path_dialog = QInputDialog()
         check_path_dialog.setGeometry(100, 100, 0, 0)
+
+        if alternatives:
+            shortest_cost = alternatives[0][1]
+            display_list = ['自己輸入'] + [
+                '第{}短 (+{:.0%}): {}'.format(i + 1, cost / shortest_cost - 1 if shortest_cost > 0 else 0, ', '.join(map(str, path)))
+                for i, (path, cost) in enumerate(alternatives)
+            ]
+            chosen_str, chosen_OK = check_path_dialog.getItem(
+                check_path_dialog, '替代路徑',
+                '{} -> {}\n'
+                '要從哪一條路徑開始修改？'.format(stop_node[0], stop_node[1]),
+                display_list, editable=False
+            )
+            if chosen_OK and chosen_str != display_list[0]:
+                passed_node_list = alternatives[display_list.index(chosen_str) - 1][0]
         
         while True:
             passed_node_str, result_OK = check_path_dialog.getText(
@@ -964,11 +755,32 @@ def main():
     road_csv_path = 'P:/09091-中臺區域模式/Working/98_GIS/road/CSV/C_TWN_NET_link.csv'
 
     excluded_roadtype = ['RR', 'ZL', 'WL', 'TL']
-    node_dict = ImportNetwork.get_node_list(node_csv_path, min_N=5001, max_N=150000)
-    road_dict = ImportNetwork.get_road_list(road_csv_path, excluded_roadtype)
-    road_tree = ImportNetwork.generate_tree(node_dict, road_dict)
-
-    shortest_path_finder = ShortestPath(node_dict, road_dict, road_tree)
+    #有開path_server.py就直接查詢，不用自己讀路網
+    shortest_path_finder = PathClient.connect()
+    node_index = shortest_path_finder
+    path_cache = None
+    if shortest_path_finder is None:
+        #contraction hierarchy第一次要花時間預處理(之後讀存檔)，區間多時比較快；不用就是A*
+        use_ch = QMessageBox().information(
+            None, '搜尋模式', '最短路徑要用contraction hierarchy嗎？\n第一次要花時間預處理',
+            buttons=QMessageBox.Yes|QMessageBox.No
+        )
+        search_mode = 'ch' if use_ch == QMessageBox.Yes else 'a_star'
+        #第一次讀CSV後路網會存起來，之後直接用memory map讀存檔
+        road_graph = ImportNetwork.load_graph(node_csv_path, road_csv_path, excluded_roadtype, min_N=5001, max_N=150000)
+
+        #預處理contraction hierarchy，存在路網檔旁邊，路網沒改就直接讀檔
+        hierarchy = None
+        if search_mode == 'ch':
+            ch_path = '{}_CH.npz'.format(os.path.splitext(road_csv_path)[0])
+            hierarchy = ContractionHierarchy.prepare(road_graph, ch_path)
+        #ALT地標也存在路網檔旁邊，A*用地標的下界當heuristic
+        landmarks = Landmarks.prepare(road_graph, '{}_landmarks.npz'.format(os.path.splitext(road_csv_path)[0]))
+        #之前跑過的區間直接讀硬碟上的快取，路網檔改過會自動作廢
+        path_cache = PathCache.for_network(node_csv_path, road_csv_path, excluded_roadtype)
+        shortest_path_finder = ShortestPath(road_graph, hierarchy, landmarks, path_cache=path_cache)
+        #站牌附近的節點用KD-tree找
+        node_index = NodeIndex.from_graph(road_graph)
 
     #選取圖層: 因為有可能有同名圖層，會回傳list回來，所以要挑第一個
     vlayer = {}
@@ -986,7 +798,9 @@ def main():
             geometry_finder = SearchGeometry(vlayer)
 
             #####讀取站牌最近節點的屬性資料
-            bus_stop_mapper = ProcessUID2node(route_spec, geometry_finder, UID2node_path, output_dir['route_UID2node'], io_node_path)
+            bus_stop_mapper = ProcessUID2node(
+                route_spec, geometry_finder, UID2node_path, output_dir['route_UID2node'], io_node_path, node_index
+            )
             bus_stop_mapper.modify()
 
             if_proceed = QMessageBox().information(None, '詢問', '要繼續尋找站間路徑嗎？', buttons=QMessageBox.Yes|QMessageBox.No)
@@ -1001,6 +815,7 @@ def main():
             stop_pair = list(zip(node_list, node_list[1:]))
             uid_pair = list(zip(uid_list, uid_list[1:]))
             further_check_i = []
+            further_check_path = {} #要校正的區間目前的路徑
             for i, stop_nodes in enumerate(stop_pair):
                 stop_uids = uid_pair[i]
                 path_filename = '{}({})_{}({})'.format(stop_nodes[0], stop_uids[0], stop_nodes[1], stop_uids[1])
@@ -1008,15 +823,25 @@ def main():
                     #讀取已儲存的路徑
                     path_path = os.path.join(output_dir['checked_path'], '{}.txt'.format(path_filename))
                     if not os.path.isfile(path_path):
-                        path_list = [stop_nodes[0], 0, stop_nodes[1]]
+                        #batch_find_path、match_shape已經找好的區間直接拿來確認，不用再找一次
+                        path_list, need_search = ProcessPath.load(stop_nodes, output_dir['init_path'], path_filename)
+                        result_OK = not need_search
+                        if need_search and os.path.isfile(os.path.join(output_dir['frthr_inspct'], '{}.txt'.format(path_filename))):
+                            #批次找不到的區間直接進入校正
+                            further_check_path[i], _ = ProcessPath.load(stop_nodes, output_dir['frthr_inspct'], path_filename)
+                            further_check_i.append(i)
+                            continue
                         bypass_limit = False
                         while True:
-                            # set midpoints
-                            find_path_todo = path_finder.set_path_midpoint(stop_nodes, bypass_limit)
-                            path_list, result_OK = path_finder.find_path(find_path_todo)
+                            if need_search:
+                                # set midpoints
+                                find_path_todo = path_finder.set_path_midpoint(stop_nodes, bypass_limit)
+                                path_list, result_OK = path_finder.find_path(find_path_todo)
+                                if result_OK:
+                                    ProcessPath.save(path_list, output_dir['init_path'], path_filename)
+                            need_search = True
                             
                             if result_OK:
-                                ProcessPath.save(path_list, output_dir['init_path'], path_filename)
                                 #確認路徑
                                 path_layer = geometry_finder.display_points(nodes_list=path_list, color='cyan')
                                 option = QMessageBox().information(
@@ -1036,6 +861,7 @@ def main():
                                         bypass_limit = True
                                         continue
                                     else:
+                                        further_check_path[i] = path_list
                                         further_check_i.append(i)
                                         break
 
@@ -1048,6 +874,7 @@ def main():
                                 )
                                 if option == QMessageBox.No:
                                     ProcessPath.save(path_list, output_dir['frthr_inspct'], path_filename)
+                                    further_check_path[i] = path_list
                                     further_check_i.append(i)
                                     break
                                 else:
@@ -1056,6 +883,8 @@ def main():
                 else:
                     path_list = [stop_nodes[0]]
                     ProcessPath.save(path_list, output_dir['checked_path'], path_filename) #把找到的路徑存起來
+            if path_cache is not None:
+                path_cache.save()
         
             ######校正結果
             further_check = False
@@ -1063,6 +892,7 @@ def main():
                 stop_nodes = stop_pair[i]
                 stop_uids = uid_pair[i]
                 path_filename = '{}({})_{}({})'.format(stop_nodes[0], stop_uids[0], stop_nodes[1], stop_uids[1])
+                path_list = further_check_path[i]
                 path_layer = geometry_finder.display_points(nodes_list=stop_nodes, color='cyan')
                 manual_input = QMessageBox().information(
                     None, '載入失敗', '未有該區間已輸出路徑\n要手動輸入嗎？',
@@ -1073,7 +903,8 @@ def main():
                     QgsProject.instance().removeMapLayer(path_layer)
                     continue
 
-                path_list, further_check = ProcessResult.manually_input(stop_nodes, path_list, output_dir, path_filename)
+                alternatives = shortest_path_finder.k_shortest_paths(list(stop_nodes), k=3, max_level=10000)
+                path_list, further_check = ProcessResult.manually_input(stop_nodes, path_list, output_dir, path_filename, alternatives)
                 QgsProject.instance().removeMapLayer(path_layer)
 
             if not further_check:
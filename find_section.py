@@ -19,6 +19,10 @@ from qgis.PyQt.QtCore import *
 from qgis.PyQt.QtGui import *
 from qgis.utils import *
 
+from processRoadNetwork.BoxPathFinder import BoxPathFinder
+from processRoadNetwork.ImportNetwork import ImportNetwork
+from processRoadNetwork.PathClient import PathClient
+
 class ProcessPath(object):
     """處理站間路徑相關"""
 
@@ -592,12 +596,13 @@ class FindPathUtils(object):
 class FindPath(object):
     """生成最短路徑的相關函式"""
 
-    def __init__(self, GeometryFinder: SearchGeometry):
+    def __init__(self, GeometryFinder: SearchGeometry, box_finder: BoxPathFinder = None):
         self.dialog = QInputDialog()
         self.dialog.setGeometry(100, 100, 0, 0)
         self.msgbox = QMessageBox()
         self.msgbox.setGeometry(100, 100, 0, 0)
         self.GeometryFinder = GeometryFinder
+        self.box_finder = box_finder #有預先讀好的路網就不用在QGIS裡裁切路網
         self.max_accepted_dist, _ = QInputDialog().getInt(
             None, '想請教一下',
             '請輸入判斷較長路徑的門檻值(km)',
@@ -706,6 +711,12 @@ class FindPath(object):
 
     def find_path(self, OD_node: list):
         """給定起終點，回傳路徑"""
+        if self.box_finder is not None:
+            passed_node_list, result_OK = self.box_finder.find_path(OD_node)
+            if not result_OK:
+                QMessageBox().information(None, '失敗', '沒找到路徑\n按OK繼續下一條')
+            return passed_node_list, result_OK
+
         passed_node_list = []
         good_result = True
         OD_point = self.GeometryFinder.get_point('node', 'N', OD_node)
@@ -1005,6 +1016,20 @@ def main():
         'YUN': 'City/YunlinCounty/',
         'THB': 'InterCity'
     }
+    node_csv_path = 'P:/09091-中臺區域模式/Working/98_GIS/road/CSV/C_TWN_NET_node.csv'
+    road_csv_path = 'P:/09091-中臺區域模式/Working/98_GIS/road/CSV/C_TWN_NET_link.csv'
+
+    #路網先讀進記憶體，找站間路徑時直接切出框內的子路網，不用產生暫時的圖層
+    excluded_roadtype = ['RR', 'ZL', 'WL', 'TL']
+    #有開path_server.py就直接查詢，不用自己讀路網
+    box_finder = PathClient.connect()
+    if box_finder is None:
+        #第一次讀CSV後路網會存起來，之後直接用memory map讀存檔；跟QGIS一樣找最短距離，要讀節線長度
+        road_graph = ImportNetwork.load_graph(
+            node_csv_path, road_csv_path, excluded_roadtype, min_N=5001, max_N=150000, with_length=True
+        )
+        box_finder = BoxPathFinder(road_graph)
+
     vlayer = {}
 
     #選取圖層: 因為有可能有同名圖層，會回傳list回來，所以要挑第一個
@@ -1020,7 +1045,7 @@ def main():
             GeometryFinder = SearchGeometry(vlayer)
 
             #####找站間最短路徑
-            PathFinder = FindPath(GeometryFinder)
+            PathFinder = FindPath(GeometryFinder, box_finder)
             if GeometryFinder.is_in_layer('node', 'N', stop_nodes): #如果兩站都在區域內才找路徑
                 if stop_nodes[0] != stop_nodes[1]: #如果頭尾不同站才找路徑
                     while True:
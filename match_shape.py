@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import pandas as pd
+
+from processRoadNetwork.ImportNetwork import ImportNetwork
+from processRoadNetwork.MapMatcher import MapMatcher
+from processRoadNetwork.PathFile import PathFile
+
+
+def read_shapes(ptx_data_dir: str, zone2dir: dict):
+    """讀取每個區域get_ptx_bus輸出的shape_list.csv，回傳{路線檔名: WKT}"""
+    shapes = {}
+    for zone in zone2dir:
+        shape_list = pd.read_csv(os.path.join(ptx_data_dir, zone2dir[zone], 'shape_list.csv'))
+        shape_list = shape_list[shape_list.WithShape == 1]
+        for _, route in shape_list.iterrows():
+            route_name = '{}_{}_{}'.format(route.SubRouteUID, route.SubRouteName, route.Direction)
+            shapes[route_name] = route.Shape
+    print('完成線型讀取...(路線數: {})'.format(len(shapes)))
+    return shapes
+
+def main():
+    D_drive = 'D:/Users/63707/Documents/python3/bus_route/'
+    data_dir = os.path.join(D_drive, 'find_path_test')
+    ptx_data_dir = os.path.join(D_drive, 'PTX_data/CSV_20210407/Bus')
+
+    output_dir = {
+        'route_UID2node': os.path.join(data_dir, '00_route_UID2node'),
+        'init_path': os.path.join(data_dir, '01_initial_path_result'),
+        'frthr_inspct': os.path.join(data_dir, '02_further_inspect'),
+        'checked_path': os.path.join(data_dir, '03_checked_path'),
+    }
+
+    zone2dir = {
+        'MIA': 'City/MiaoliCounty/',
+        'TXG': 'City/Taichung/',
+        'CHA': 'City/ChanghuaCounty/',
+        'NAN': 'City/NantouCounty/',
+        'YUN': 'City/YunlinCounty/',
+        'THB': 'InterCity'
+    }
+    node_csv_path = 'P:/09091-中臺區域模式/Working/98_GIS/road/CSV/C_TWN_NET_node.csv'
+    road_csv_path = 'P:/09091-中臺區域模式/Working/98_GIS/road/CSV/C_TWN_NET_link.csv'
+
+    excluded_roadtype = ['RR', 'ZL', 'WL', 'TL']
+    #第一次讀CSV後路網會存起來，之後直接用memory map讀存檔
+    road_graph = ImportNetwork.load_graph(
+        node_csv_path, road_csv_path, excluded_roadtype, min_N=5001, max_N=150000, with_length=True
+    )
+
+    #只處理已經有站牌點號對應的路線
+    shapes = {
+        route_name: wkt for route_name, wkt in read_shapes(ptx_data_dir, zone2dir).items()
+        if os.path.isfile(os.path.join(output_dir['route_UID2node'], '{}.csv'.format(route_name)))
+    }
+    matched = MapMatcher(road_graph).match_shapes(shapes)
+
+    #對應結果依站牌切成區間，放到初步結果等人工在QGIS確認，已經確認過的區間不覆蓋，切不出來的放到待檢查區
+    num_matched, num_failed = 0, 0
+    for route_name, node_seq in matched.items():
+        route_UID2node = pd.read_csv(os.path.join(output_dir['route_UID2node'], '{}.csv'.format(route_name)))
+        node_list = list(map(int, route_UID2node['TargetID'].tolist()))
+        uid_list = route_UID2node['InputID'].tolist()
+        sections = MapMatcher.split_by_stops(node_seq, node_list)
+        for (n1, n2), (u1, u2), path_list in zip(zip(node_list, node_list[1:]), zip(uid_list, uid_list[1:]), sections):
+            path_filename = '{}({})_{}({})'.format(n1, u1, n2, u2)
+            if n1 == 0 or n2 == 0: #0是還沒對應到點號的站牌
+                continue
+            if os.path.isfile(os.path.join(output_dir['checked_path'], '{}.txt'.format(path_filename))):
+                continue
+            if n1 == n2: #頭尾同站跟batch_find_path一樣直接當作確認過
+                PathFile.save([n1], output_dir['checked_path'], path_filename)
+                continue
+            if path_list is not None:
+                PathFile.save(path_list, output_dir['init_path'], path_filename)
+                #之前最短路徑找不到的，現在有對應結果就不用再放在待檢查區
+                failed_path = os.path.join(output_dir['frthr_inspct'], '{}.txt'.format(path_filename))
+                if os.path.isfile(failed_path):
+                    os.remove(failed_path)
+                num_matched += 1
+            else:
+                PathFile.save([n1, 0, n2], output_dir['frthr_inspct'], path_filename)
+                num_failed += 1
+    print('完成區間路徑輸出...(區間數: {}, 切不出來的區間數: {})'.format(num_matched, num_failed))
+
+if __name__ == '__main__':
+    main()
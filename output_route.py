@@ -4,6 +4,8 @@ import os
 
 from pandas import read_csv
 
+from processRoadNetwork.RouteAssembler import RouteAssembler
+
 
 def save_route(path_list: list, save_dir: str, route_spec: list):
     """把路線的站牌間路徑儲存成文字檔"""
@@ -12,23 +14,6 @@ def save_route(path_list: list, save_dir: str, route_spec: list):
     path_file.write(path_str)
     path_file.close()
 
-def load_path(OD_node: list, load_dir: str):
-    """讀取已經儲存的站牌間路徑"""
-    path_path = os.path.join(load_dir, '{}_{}.txt'.format(OD_node[0], OD_node[1]))
-    if_saved = os.path.isfile(path_path)
-    
-    if if_saved:
-        path_file = open(path_path, 'r')
-        path_str = path_file.read()
-        path_file.close()
-        path = path_str.split(',')
-        path = list(map(int, path))
-        path = list(map(abs, path))
-    else:
-        path = [OD_node[0], 0, OD_node[1]]
-    
-    return path, not if_saved
-
 def choose_route(data_dir, zone2dir):
     """選擇路線"""
     route_spec = []
@@ -81,47 +66,17 @@ def read_node_list(file_dir, route_spec):
         node_list = []
     return node_list
 
-def append_path(bus_route, section_result):
-    """把區間的結果加進最終結果"""
-    #如果是第一個區間就加進最終結果的list，不是的話就沿用現有結果
-    if len(bus_route) == 0:
-        bus_route.append(section_result[0])
-    #通過節點用負值加入最終結果的list
-    for node in section_result[1:-1]:
-        bus_route.append(-node)
-    #把區間的終點加入最終結果的list
-    if bus_route[-1] != section_result[-1]:
-        bus_route.append(section_result[-1])
-    return bus_route
-
 def combine_section(node_list, checked_path_dir):
-    """合併路線"""
-    final_bus_route = [] #最終輸出這個
-    no_failed_section = True
-    num_path = len(node_list) - 1
-    for i, OD_node in enumerate(zip(node_list, node_list[1:])):
-        #計算起終點對應的ID
-        if OD_node[0] != OD_node[1]:
-            if OD_node[0] != 0 and OD_node[1] != 0:
-                #讀取已確認的路徑
-                path_list, no_checked_path = load_path(OD_node, checked_path_dir)
-                if no_checked_path:
-                    print('\n失敗: [{} -> {}] 未確認'.format(OD_node[0], OD_node[1]))
-                    no_failed_section = False
-            else:
-                print('\n失敗: [{} -> {}] 有一為0'.format(OD_node[0], OD_node[1]))
-                no_failed_section = False
-
-            if no_failed_section:
-                #接上已經找到的路，沒停靠的通過節點在這邊才加負數
-                progress_bar(i + 1, num_path)
-                final_bus_route = append_path(final_bus_route, path_list)
-    
-    return final_bus_route, no_failed_section
-
-def progress_bar(current_num: int, total_num: int):
-    """ Display the progress bar if the result is printed to the text file. """
-    print('\r[{:<50}] ({}/{})'.format('=' * int(current_num / (2 * total_num) * 100), current_num, total_num), end='')
+    """合併路線，已確認的區間一次讀完再接起來"""
+    assembler = RouteAssembler(checked_path_dir=checked_path_dir)
+    final_bus_route, failed = assembler.assemble(node_list)
+    for OD_node in failed:
+        if OD_node[0] != 0 and OD_node[1] != 0:
+            print('失敗: [{} -> {}] 未確認'.format(OD_node[0], OD_node[1]))
+        else:
+            print('失敗: [{} -> {}] 有一為0'.format(OD_node[0], OD_node[1]))
+
+    return final_bus_route, len(failed) == 0
 
 def main():
     P_drive = 'P:/09091-中臺區域模式/Working/'
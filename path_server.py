@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+from processRoadNetwork.ContractionHierarchy import ContractionHierarchy
+from processRoadNetwork.ImportNetwork import ImportNetwork
+from processRoadNetwork.Landmarks import Landmarks
+from processRoadNetwork.PathCache import PathCache
+from processRoadNetwork.PathServer import PathServer
+from processRoadNetwork.SearchStats import SearchStats
+from processRoadNetwork.ShortestPath import ShortestPath
+
+
+def main():
+    #先開這支，find_path、find_section、check_node_error啟動時會自動連過來，不用每次都讀路網
+    node_csv_path = 'P:/09091-中臺區域模式/Working/98_GIS/road/CSV/C_TWN_NET_node.csv'
+    road_csv_path = 'P:/09091-中臺區域模式/Working/98_GIS/road/CSV/C_TWN_NET_link.csv'
+
+    excluded_roadtype = ['RR', 'ZL', 'WL', 'TL']
+    #python path_server.py ch: 預處理contraction hierarchy(第一次要花時間建立，之後讀存檔)，服務開很久、查詢很多時值得用
+    #沒給或給a_star就用A*
+    search_mode = sys.argv[1] if len(sys.argv) > 1 else 'a_star'
+    if search_mode not in ('a_star', 'ch'):
+        raise SystemExit('搜尋模式只能是a_star或ch: {}'.format(search_mode))
+    #節線長度給/box_path用，跟find_section一樣找最短距離
+    road_graph = ImportNetwork.load_graph(
+        node_csv_path, road_csv_path, excluded_roadtype, min_N=5001, max_N=150000, with_length=True
+    )
+    hierarchy = None
+    if search_mode == 'ch':
+        ch_path = '{}_CH.npz'.format(os.path.splitext(road_csv_path)[0])
+        hierarchy = ContractionHierarchy.prepare(road_graph, ch_path)
+    #ALT地標也存在路網檔旁邊，A*用地標的下界當heuristic
+    landmarks = Landmarks.prepare(road_graph, '{}_landmarks.npz'.format(os.path.splitext(road_csv_path)[0]))
+    path_cache = PathCache.for_network(node_csv_path, road_csv_path, excluded_roadtype)
+    search_stats = SearchStats()
+    path_finder = ShortestPath(road_graph, hierarchy, landmarks, path_cache=path_cache, stats=search_stats)
+
+    #Ctrl+C結束，結束時路徑快取與搜尋統計會存檔
+    PathServer(path_finder).serve_forever()
+    search_stats.save('{}_search_stats.csv'.format(os.path.splitext(road_csv_path)[0]))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+from collections import OrderedDict
+from math import hypot
+from typing import List
+
+from processRoadNetwork.GridIndex import GridIndex
+from processRoadNetwork.RoadGraph import RoadGraph
+from processRoadNetwork.ShortestPath import ShortestPath
+
+
+class BoxPathFinder(object):
+    """
+    取代find_section在QGIS裡畫框、裁切路網再找最短路徑的流程，全部在記憶體裡做\n
+    框框跟FindPath.set_boundary一樣是起終點的外框往外加 min(max_margin, 起終點距離)，
+    原本的0.01度大約是1000m\n
+    框內的點用GridIndex找，切出子路網後在上面跑A*\n
+    QGIS的shortestpathpointtopoint用的是最短距離(STRATEGY 0)，所以路網有節線長度時子路網的成本換成長度，
+    沒有長度才用旅行時間\n
+    只留兩端都在框內的節線：QGIS裁切後跨出框框的節線停在框邊，沒有接到框外的點，本來就走不通\n
+    同一個區間常常改完中間點又重找，最近用過的max_cached個子路網連同搜尋用的ShortestPath留著重複用
+    """
+
+    def __init__(self, graph: RoadGraph, cell_size: float = 1000, max_margin: float = 1000, max_cached: int = 32):
+        self.graph = graph
+        self.max_margin = max_margin
+        self.grid = GridIndex.from_graph(graph, cell_size)
+        self.max_cached = max_cached
+        self._finders = OrderedDict() #{(較小點號, 較大點號): 子路網的ShortestPath}，起終點對調時框框一樣
+
+    def set_boundary(self, OD_node: List[int]):
+        """回傳(x_min, y_min, x_max, y_max)"""
+        (x1, y1), (x2, y2) = self.graph.coord(OD_node[0]), self.graph.coord(OD_node[1])
+        margin = min(self.max_margin, hypot(x2 - x1, y2 - y1))
+        return min(x1, x2) - margin, min(y1, y2) - margin, max(x1, x2) + margin, max(y1, y2) + margin
+
+    def extract(self, OD_node: List[int]):
+        """切出框內的子路網，有節線長度時成本換成長度"""
+        sub_graph = self.graph.subgraph(self.grid.in_box(*self.set_boundary(OD_node)))
+        if sub_graph.lengths is None:
+            return sub_graph
+        return RoadGraph(
+            sub_graph.node_ids, sub_graph.x, sub_graph.y, sub_graph.offsets, sub_graph.targets, sub_graph.lengths,
+            sub_graph.node_index, sub_graph.lengths, sub_graph.lon, sub_graph.lat, sub_graph.node_lookup
+        )
+
+    def _finder(self, OD_node: List[int]):
+        key = (min(OD_node[0], OD_node[1]), max(OD_node[0], OD_node[1]))
+        finder = self._finders.get(key)
+        if finder is None:
+            finder = self._finders[key] = ShortestPath(self.extract(OD_node))
+            if len(self._finders) > self.max_cached:
+                self._finders.popitem(last=False)
+        else:
+            self._finders.move_to_end(key)
+        return finder
+
+    def find_path(self, OD_node: List[int]):
+        """跟FindPath.find_path一樣回傳(點序, 是否找到)，找不到時點序是[起點, 0, 終點]"""
+        p1, p2 = OD_node[0], OD_node[1]
+        if p1 in self.graph and p2 in self.graph:
+            finder = self._finder(OD_node)
+            # 子路網很小，不用限制展開的點數
+            path, _ = finder.a_star_alg(p1, p2, finder.graph.num_nodes + 1)
+            if len(path) > 0:
+                return path, True
+        return [p1, 0, p2], False
@@ -0,0 +1,393 @@
+# -*- coding: utf-8 -*-
+
+import os
+from heapq import heapify, heappop, heappush
+
+import numpy as np
+
+from processRoadNetwork.RoadGraph import RoadGraph
+
+
+class ContractionHierarchy(object):
+    """
+    路網的contraction hierarchy(CH)，預處理一次後存檔，之後站間查詢只要在往上的路網做雙向搜尋\n
+    up_forward: 點 -> 順序較高的點 的節線(含捷徑)，給起點那一邊用\n
+    up_backward: 點 -> 順序較高的點 的反向節線(含捷徑)，給終點那一邊用\n
+    shortcut_middle: 捷徑(u, w) -> 被縮掉的中間點v，用來把捷徑展開回原本的點序
+    """
+
+    file_version = 1
+
+    def __init__(self, graph: RoadGraph, rank, up_forward, up_backward, shortcut_middle: dict):
+        self.graph = graph
+        self.rank = rank
+        self.up_forward = up_forward #(offsets, targets, weights)
+        self.up_backward = up_backward
+        self.shortcut_middle = shortcut_middle
+        self._make_views()
+        # 上一次查詢展開的點數、檢查的節線數與open list最大長度
+        self.last_expansions = 0
+        self.last_relaxed = 0
+        self.last_peak_open = 0
+
+    def _make_views(self):
+        self._forward_view = tuple(memoryview(a) for a in self.up_forward)
+        self._backward_view = tuple(memoryview(a) for a in self.up_backward)
+
+    def __getstate__(self):
+        # memoryview不能pickle，Windows開子程序時要傳過去，子程序再自己建
+        state = self.__dict__.copy()
+        del state['_forward_view'], state['_backward_view']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._make_views()
+
+    @classmethod
+    def prepare(cls, graph: RoadGraph, ch_path: str, max_settled: int = 50):
+        """有存檔且路網沒變就讀檔，不然就重新建立並存檔"""
+        hierarchy = cls.load(ch_path, graph)
+        if hierarchy is None:
+            hierarchy = cls.build(graph, max_settled)
+            hierarchy.save(ch_path)
+        return hierarchy
+
+    @classmethod
+    def build(cls, graph: RoadGraph, max_settled: int = 50):
+        """依edge difference的順序逐點縮減路網，max_settled是witness search最多展開的點數"""
+        num_nodes = graph.num_nodes
+        offsets = graph.offsets.tolist()
+        targets = graph.targets.tolist()
+        weights = graph.weights.tolist()
+
+        # 還沒縮掉的路網，平行的節線只留最小的
+        out_adj = [{} for _ in range(num_nodes)]
+        in_adj = [{} for _ in range(num_nodes)]
+        for u in range(num_nodes):
+            for k in range(offsets[u], offsets[u + 1]):
+                v, w = targets[k], weights[k]
+                if v != u and w < out_adj[u].get(v, float('inf')):
+                    out_adj[u][v] = w
+                    in_adj[v][u] = w
+
+        shortcut_middle = {}
+        contracted = [False] * num_nodes
+        deleted_neighbors = [0] * num_nodes
+        rank = np.zeros(num_nodes, dtype=np.int32)
+        up_forward = [None] * num_nodes
+        up_backward = [None] * num_nodes
+
+        def witness_search(source, skip, max_cost):
+            """從source出發、不經過skip的有限Dijkstra"""
+            dist = {source: 0}
+            heap = [(0, source)]
+            settled = 0
+            while heap and settled < max_settled:
+                d, u = heappop(heap)
+                if d > dist[u]:
+                    continue
+                if d > max_cost:
+                    break
+                settled += 1
+                for v, w in out_adj[u].items():
+                    if v == skip:
+                        continue
+                    nd = d + w
+                    if nd < dist.get(v, float('inf')):
+                        dist[v] = nd
+                        heappush(heap, (nd, v))
+            return dist
+
+        def find_shortcuts(v):
+            """縮掉v需要補的捷徑"""
+            shortcuts = []
+            if not out_adj[v]:
+                return shortcuts
+            max_out = max(out_adj[v].values())
+            for u, w_uv in in_adj[v].items():
+                dist = witness_search(u, v, w_uv + max_out)
+                for w, w_vw in out_adj[v].items():
+                    if w == u:
+                        continue
+                    via = w_uv + w_vw
+                    if dist.get(w, float('inf')) > via:
+                        shortcuts.append((u, w, via))
+            return shortcuts
+
+        def priority(v):
+            num_shortcuts = len(find_shortcuts(v))
+            return num_shortcuts - len(in_adj[v]) - len(out_adj[v]) + deleted_neighbors[v]
+
+        heap = [(priority(v), v) for v in range(num_nodes)]
+        heapify(heap)
+        order = 0
+        while heap:
+            _, v = heappop(heap)
+            if contracted[v]:
+                continue
+            # lazy update: 重算後不是最小就放回去
+            new_priority = priority(v)
+            if heap and new_priority > heap[0][0]:
+                heappush(heap, (new_priority, v))
+                continue
+
+            for u, w, via in find_shortcuts(v):
+                if via < out_adj[u].get(w, float('inf')):
+                    out_adj[u][w] = via
+                    in_adj[w][u] = via
+                    shortcut_middle[(u, w)] = v
+
+            # 剩下的鄰點順序都比v高
+            up_forward[v] = out_adj[v]
+            up_backward[v] = in_adj[v]
+            for w in out_adj[v]:
+                del in_adj[w][v]
+                deleted_neighbors[w] += 1
+            for u in in_adj[v]:
+                del out_adj[u][v]
+                deleted_neighbors[u] += 1
+            out_adj[v] = {}
+            in_adj[v] = {}
+
+            contracted[v] = True
+            rank[v] = order
+            order += 1
+
+        print('完成CH建立...(捷徑數: {})'.format(len(shortcut_middle)))
+        return cls(
+            graph, rank, cls._to_csr(up_forward), cls._to_csr(up_backward), shortcut_middle
+        )
+
+    @staticmethod
+    def _to_csr(adjacency: list):
+        offsets = np.zeros(len(adjacency) + 1, dtype=np.int32)
+        np.cumsum([len(a) for a in adjacency], out=offsets[1:])
+        targets = np.fromiter((v for a in adjacency for v in a), dtype=np.int32, count=offsets[-1])
+        weights = np.fromiter((w for a in adjacency for w in a.values()), dtype=np.float64, count=offsets[-1])
+        return offsets, targets, weights
+
+    def save(self, ch_path: str):
+        """把CH存成npz檔"""
+        if len(self.shortcut_middle) > 0:
+            shortcut = np.array([(u, w, v) for (u, w), v in self.shortcut_middle.items()], dtype=np.int32)
+        else:
+            shortcut = np.zeros((0, 3), dtype=np.int32)
+        with open(ch_path, 'wb') as ch_file:
+            np.savez(
+                ch_file,
+                version=np.array(self.file_version),
+                signature=np.array(self.graph.signature()),
+                rank=self.rank,
+                forward_offsets=self.up_forward[0], forward_targets=self.up_forward[1],
+                forward_weights=self.up_forward[2],
+                backward_offsets=self.up_backward[0], backward_targets=self.up_backward[1],
+                backward_weights=self.up_backward[2],
+                shortcut=shortcut
+            )
+        print('完成CH存檔...')
+
+    @classmethod
+    def load(cls, ch_path: str, graph: RoadGraph):
+        """讀取CH存檔，檔案不存在、版本不同或路網已經改過就回傳None"""
+        if not os.path.isfile(ch_path):
+            return None
+        with np.load(ch_path) as data:
+            if int(data['version']) != cls.file_version or str(data['signature']) != graph.signature():
+                return None
+            shortcut = data['shortcut'].tolist()
+            hierarchy = cls(
+                graph, data['rank'],
+                (data['forward_offsets'], data['forward_targets'], data['forward_weights']),
+                (data['backward_offsets'], data['backward_targets'], data['backward_weights']),
+                {(u, w): v for u, w, v in shortcut}
+            )
+        print('完成CH讀取...')
+        return hierarchy
+
+    def query(self, p1: int, p2: int):
+        """用點號查詢最短路徑，回傳展開後的點序與旅行時間"""
+        path, distance = self.query_index(self.graph.index(p1), self.graph.index(p2))
+        return self.graph.to_node_ids(path), distance
+
+    def query_index(self, start: int, end: int):
+        """在索引上查詢，兩邊都只往順序高的點走"""
+        self._reset_counters()
+        if start < 0 or end < 0:
+            return [], 1e10
+        if start == end:
+            return [start], 0
+
+        adjacency = (self._forward_view, self._backward_view)
+        open_heap = ([(0, start)], [(0, end)])
+        g_score = ({start: 0}, {end: 0})
+        parent = ({start: -1}, {end: -1})
+        best_distance = 1e10
+        meet_node = -1
+
+        side = 0
+        level = 0
+        relaxed = 0
+        peak_open = 2
+        while open_heap[0] or open_heap[1]:
+            if len(open_heap[0]) + len(open_heap[1]) > peak_open:
+                peak_open = len(open_heap[0]) + len(open_heap[1])
+            # 兩邊輪流，一邊空了就只走另一邊
+            if not open_heap[side]:
+                side = 1 - side
+            current_g, current = heappop(open_heap[side])
+            this_g, other_g = g_score[side], g_score[1 - side]
+            if current_g > this_g[current]:
+                side = 1 - side
+                continue
+            if current_g >= best_distance:
+                # 這一邊之後不可能更好了
+                open_heap[side].clear()
+                side = 1 - side
+                continue
+            if current in other_g and current_g + other_g[current] < best_distance:
+                best_distance = current_g + other_g[current]
+                meet_node = current
+
+            offsets, targets, weights = adjacency[side]
+            level += 1
+            relaxed += offsets[current + 1] - offsets[current]
+            for k in range(offsets[current], offsets[current + 1]):
+                child = targets[k]
+                child_g = current_g + weights[k]
+                if child_g < this_g.get(child, 1e10):
+                    this_g[child] = child_g
+                    parent[side][child] = current
+                    heappush(open_heap[side], (child_g, child))
+            side = 1 - side
+
+        self._count(level, relaxed, peak_open)
+        if meet_node == -1:
+            return [], 1e10
+
+        return self.unpack(self._upward_path(meet_node, parent[0], parent[1])), best_distance
+
+    def query_many(self, p1: int, p2_list: list):
+        """一個起點對多個終點，起點往上的搜尋只做一次，回傳{終點: (點序, 旅行時間)}"""
+        self._reset_counters()
+        start = self.graph.index(p1)
+        if start < 0:
+            return {p2: ([], 1e10) for p2 in p2_list}
+
+        forward_g, forward_parent = self._upward_search(start)
+        result = {}
+        for p2 in p2_list:
+            path, distance = self._backward_query(forward_g, forward_parent, start, self.graph.index(p2))
+            result[p2] = (self.graph.to_node_ids(path), distance)
+        return result
+
+    def _upward_search(self, start: int):
+        """從start往順序高的點走完整個搜尋空間"""
+        offsets, targets, weights = self._forward_view
+        g_score = {start: 0}
+        parent = {start: -1}
+        open_heap = [(0, start)]
+        level = 0
+        relaxed = 0
+        peak_open = 1
+        while open_heap:
+            if len(open_heap) > peak_open:
+                peak_open = len(open_heap)
+            current_g, current = heappop(open_heap)
+            if current_g > g_score[current]:
+                continue
+            level += 1
+            relaxed += offsets[current + 1] - offsets[current]
+            for k in range(offsets[current], offsets[current + 1]):
+                child = targets[k]
+                child_g = current_g + weights[k]
+                if child_g < g_score.get(child, 1e10):
+                    g_score[child] = child_g
+                    parent[child] = current
+                    heappush(open_heap, (child_g, child))
+        self._count(level, relaxed, peak_open)
+        return g_score, parent
+
+    def _backward_query(self, forward_g: dict, forward_parent: dict, start: int, end: int):
+        """用已經做好的順向搜尋，從end往回找交會點"""
+        if end < 0:
+            return [], 1e10
+        if start == end:
+            return [start], 0
+
+        offsets, targets, weights = self._backward_view
+        g_score = {end: 0}
+        parent = {end: -1}
+        open_heap = [(0, end)]
+        best_distance = 1e10
+        meet_node = -1
+        level = 0
+        relaxed = 0
+        peak_open = 1
+        while open_heap:
+            if len(open_heap) > peak_open:
+                peak_open = len(open_heap)
+            current_g, current = heappop(open_heap)
+            if current_g > g_score[current]:
+                continue
+            if current_g >= best_distance:
+                break
+            if current in forward_g and current_g + forward_g[current] < best_distance:
+                best_distance = current_g + forward_g[current]
+                meet_node = current
+            level += 1
+            relaxed += offsets[current + 1] - offsets[current]
+            for k in range(offsets[current], offsets[current + 1]):
+                child = targets[k]
+                child_g = current_g + weights[k]
+                if child_g < g_score.get(child, 1e10):
+                    g_score[child] = child_g
+                    parent[child] = current
+                    heappush(open_heap, (child_g, child))
+
+        self._count(level, relaxed, peak_open)
+        if meet_node == -1:
+            return [], 1e10
+
+        return self.unpack(self._upward_path(meet_node, forward_parent, parent)), best_distance
+
+    def _reset_counters(self):
+        self.last_expansions = 0
+        self.last_relaxed = 0
+        self.last_peak_open = 0
+
+    def _count(self, expanded: int, relaxed: int, peak_open: int):
+        """query_many會跑很多次搜尋，計數用加總的，open list取最大"""
+        self.last_expansions += expanded
+        self.last_relaxed += relaxed
+        self.last_peak_open = max(self.last_peak_open, peak_open)
+
+    @staticmethod
+    def _upward_path(meet_node: int, forward_parent: dict, backward_parent: dict):
+        """用兩邊的parent接出含捷徑的點序"""
+        upward_path = []
+        current = meet_node
+        while current != -1:
+            upward_path.append(current)
+            current = forward_parent[current]
+        upward_path.reverse()
+        current = backward_parent[meet_node]
+        while current != -1:
+            upward_path.append(current)
+            current = backward_parent[current]
+        return upward_path
+
+    def unpack(self, upward_path: list):
+        """把含捷徑的點序展開回原本路網的點序"""
+        path = [upward_path[0]]
+        for u, w in zip(upward_path, upward_path[1:]):
+            stack = [(u, w)]
+            while stack:
+                a, b = stack.pop()
+                if (a, b) in self.shortcut_middle:
+                    v = self.shortcut_middle[(a, b)]
+                    stack.append((v, b))
+                    stack.append((a, v))
+                else:
+                    path.append(b)
+        return path
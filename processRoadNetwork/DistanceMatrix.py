@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import os
+from heapq import heappop, heappush
+from multiprocessing import Pool
+
+import numpy as np
+
+from processRoadNetwork.RoadGraph import RoadGraph
+
+_worker_graph = None
+
+
+def _init_worker(graph: RoadGraph):
+    """每個子程序只收一次路網"""
+    global _worker_graph
+    _worker_graph = graph
+
+
+def _solve_origin(task):
+    """子程序裡跑單一起點的有限Dijkstra"""
+    input_id, origin, target_index, cutoff, max_targets = task
+    return input_id, bounded_search(_worker_graph, origin, target_index, cutoff, max_targets)
+
+
+def bounded_search(graph: RoadGraph, origin: int, target_index: dict, cutoff: float, max_targets: int = None):
+    """
+    從索引origin跑Dijkstra，旅行時間超過cutoff就停止\n
+    target_index: {索引: TargetID}，None代表所有點都是目標\n
+    回傳依旅行時間排序的[(TargetID, 旅行時間, 長度)]，長度是沿著最快路徑累加
+    """
+    offsets, targets, weights = memoryview(graph.offsets), memoryview(graph.targets), memoryview(graph.weights)
+    lengths = memoryview(graph.lengths) if graph.lengths is not None else None
+    node_ids = graph.node_ids
+
+    result = []
+    g_score = {origin: 0}
+    length_score = {origin: 0}
+    closed_set = set()
+    open_heap = [(0, origin)]
+    while open_heap:
+        current_g, current = heappop(open_heap)
+        if current in closed_set:
+            continue
+        if current_g > cutoff:
+            break
+        closed_set.add(current)
+
+        if target_index is None:
+            result.append((int(node_ids[current]), current_g, length_score[current]))
+        elif current in target_index:
+            result.append((target_index[current], current_g, length_score[current]))
+        if max_targets is not None and len(result) >= max_targets:
+            break
+
+        for k in range(offsets[current], offsets[current + 1]):
+            child = targets[k]
+            child_g = current_g + weights[k]
+            if child_g < g_score.get(child, float('inf')):
+                g_score[child] = child_g
+                length_score[child] = length_score[current] + (lengths[k] if lengths is not None else 0)
+                heappush(open_heap, (child_g, child))
+
+    return result
+
+
+class DistanceMatrix(object):
+    """
+    多起點對多終點的路網距離矩陣(只保留旅行時間在cutoff以內的組合)\n
+    rows: [(InputID, TargetID, 旅行時間, 長度)]，同一個InputID依旅行時間排序，第一筆就是最近的目標
+    """
+
+    def __init__(self, graph: RoadGraph):
+        self.graph = graph
+        self.rows = []
+
+    def compute(self, origins: dict, cutoff: float, destinations: dict = None, max_targets: int = None, processes: int = None):
+        """
+        origins: {InputID: 起點點號}，destinations: {TargetID: 終點點號}，None代表所有點號都是目標\n
+        cutoff: 旅行時間上限(跟road_dict同單位)，max_targets: 每個起點最多保留幾個目標\n
+        processes: 平行的程序數，None用全部CPU，1就不開子程序
+        """
+        target_index = None
+        if destinations is not None:
+            target_index = {
+                self.graph.index(node): target_id for target_id, node in destinations.items() if node in self.graph
+            }
+        tasks = [
+            (input_id, self.graph.index(node), target_index, cutoff, max_targets)
+            for input_id, node in origins.items() if node in self.graph
+        ]
+
+        if processes == 1:
+            _init_worker(self.graph)
+            results = map(_solve_origin, tasks)
+            self._collect(results, len(tasks))
+        else:
+            with Pool(processes, initializer=_init_worker, initargs=(self.graph,)) as pool:
+                results = pool.imap(_solve_origin, tasks, chunksize=max(1, len(tasks) // 256))
+                self._collect(results, len(tasks))
+
+        print('完成距離矩陣計算...(起點數: {}, 組合數: {})'.format(len(tasks), len(self.rows)))
+        return self.rows
+
+    def _collect(self, results, num_tasks: int):
+        self.rows = []
+        for i, (input_id, found) in enumerate(results):
+            self.rows.extend((input_id, target_id, travel_time, length) for target_id, travel_time, length in found)
+            print('\r[{:<50}] ({}/{})'.format('=' * int((i + 1) / (2 * num_tasks) * 100), i + 1, num_tasks), end='')
+        print()
+
+    def save(self, matrix_path: str):
+        """副檔名是.npz就存成二進位檔，不然存成CSV(欄位: InputID, TargetID, Time, Length)"""
+        if os.path.splitext(matrix_path)[1].lower() == '.npz':
+            with open(matrix_path, 'wb') as matrix_file:
+                np.savez_compressed(
+                    matrix_file,
+                    InputID=np.array([r[0] for r in self.rows]),
+                    TargetID=np.array([r[1] for r in self.rows]),
+                    Time=np.array([r[2] for r in self.rows], dtype=np.float64),
+                    Length=np.array([r[3] for r in self.rows], dtype=np.float64)
+                )
+        else:
+            with open(matrix_path, 'w', newline='', encoding='utf-8') as matrix_file:
+                writer = csv.writer(matrix_file)
+                writer.writerow(['InputID', 'TargetID', 'Time', 'Length'])
+                writer.writerows(self.rows)
+        print('完成距離矩陣輸出...')
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+from processRoadNetwork.RoadGraph import RoadGraph
+
+
+class GridIndex(object):
+    """
+    把節點TWD97座標分到cell_size(m)見方的格子，查詢矩形範圍內的點時只看有碰到的格子\n
+    同一格的點在order裡是連續的一段，cell_start記錄每個有點的格子從哪裡開始
+    """
+
+    def __init__(self, x, y, cell_size: float = 1000):
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.cell_size = cell_size
+        self.x0 = float(self.x.min()) if len(self.x) > 0 else 0.0
+        self.y0 = float(self.y.min()) if len(self.y) > 0 else 0.0
+        self.num_cols = int((self.x.max() - self.x0) // cell_size) + 1 if len(self.x) > 0 else 1
+        self.num_rows = int((self.y.max() - self.y0) // cell_size) + 1 if len(self.y) > 0 else 1
+
+        cell = self._cell_id(self._col(self.x), self._row(self.y))
+        self.order = np.argsort(cell, kind='stable')
+        cells, start = np.unique(cell[self.order], return_index=True)
+        end = np.append(start[1:], len(cell))
+        self.cell_range = dict(zip(cells.tolist(), zip(start.tolist(), end.tolist())))
+
+    @classmethod
+    def from_graph(cls, graph: RoadGraph, cell_size: float = 1000):
+        return cls(graph.x, graph.y, cell_size)
+
+    def _col(self, x):
+        return np.floor_divide(np.asarray(x) - self.x0, self.cell_size).astype(np.int64)
+
+    def _row(self, y):
+        return np.floor_divide(np.asarray(y) - self.y0, self.cell_size).astype(np.int64)
+
+    def _cell_id(self, col, row):
+        return col * self.num_rows + row
+
+    def in_box(self, x_min: float, y_min: float, x_max: float, y_max: float):
+        """回傳矩形範圍內(含邊界)的點索引，由小到大排序"""
+        col_min, col_max = max(int(self._col(x_min)), 0), min(int(self._col(x_max)), self.num_cols - 1)
+        row_min, row_max = max(int(self._row(y_min)), 0), min(int(self._row(y_max)), self.num_rows - 1)
+        chunks = []
+        for col in range(col_min, col_max + 1):
+            for row in range(row_min, row_max + 1):
+                cell_range = self.cell_range.get(self._cell_id(col, row))
+                if cell_range is not None:
+                    chunks.append(self.order[cell_range[0]:cell_range[1]])
+        if len(chunks) == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        # 邊上的格子只有一部分在範圍內
+        candidate = np.concatenate(chunks)
+        x, y = self.x[candidate], self.y[candidate]
+        inside = (x >= x_min) & (x <= x_max) & (y >= y_min) & (y <= y_max)
+        return np.sort(candidate[inside])
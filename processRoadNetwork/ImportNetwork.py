@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import hashlib
+import os
+from typing import List
+
+import numpy as np
+
+from processRoadNetwork.LatLonToTWD97 import LatLonToTWD97
+from processRoadNetwork.RoadGraph import RoadGraph
+
+
+class ImportNetwork():
+    #SPDCLASS對應的速率，index是SPDCLASS，35以上都是40
+    speed_table = np.array([100] * 3 + [90] * 2 + [60] * 15 + [50] * 15 + [40], dtype=np.float64)
+
+    @staticmethod
+    def read_columns(csv_path: str, column_types: dict):
+        """
+        column_types: {欄位名稱: numpy型別}，整個檔案用np.loadtxt一次讀完，回傳每個欄位一個陣列的structured array\n
+        欄位的位置看第一列的標題
+        """
+        with open(csv_path, newline='', encoding='utf-8') as csv_file:
+            header = next(csv.reader(csv_file))
+        names = list(column_types)
+        usecols = [header.index(name) for name in names]
+        # loadtxt的usecols會照欄位位置排，dtype也要照同樣的順序
+        order = np.argsort(usecols, kind='stable')
+        dtype = np.dtype([(names[i], column_types[names[i]]) for i in order])
+        return np.loadtxt(
+            csv_path, delimiter=',', skiprows=1, usecols=[usecols[i] for i in order], dtype=dtype,
+            quotechar='"', encoding='utf-8', ndmin=1
+        )
+
+    @staticmethod
+    def read_links(road_csv_path: str, excluded_roadtype: List[str]):
+        """
+        依DIR展開成有方向的節線，回傳(起點, 終點, 長度, 旅行時間)四個陣列\n
+        DIR是0或2時雙向，1時A到B，其他B到A；順序跟逐列展開一樣，同一列的A到B排在B到A前面
+        """
+        column = ImportNetwork.read_columns(road_csv_path, {
+            'ROADTYPE': 'U16', 'LENGTH': np.float64, 'A': np.int64, 'B': np.int64, 'DIR': np.int64,
+            'SPDCLASS': np.int64
+        })
+        kept = ~np.isin(column['ROADTYPE'], excluded_roadtype)
+        A = column['A'][kept]
+        B = column['B'][kept]
+        dir = column['DIR'][kept]
+        link_length = column['LENGTH'][kept]
+        spdclass = column['SPDCLASS'][kept]
+        speed = ImportNetwork.speed_table[np.clip(spdclass, 0, len(ImportNetwork.speed_table) - 1)]
+        travel_time = link_length / speed
+
+        # 每一列展開成兩格(A到B, B到A)，再把沒有的方向拿掉
+        forward = (dir == 0) | (dir == 1) | (dir == 2)
+        backward = dir != 1
+        keep = np.column_stack((forward, backward)).ravel()
+        source = np.column_stack((A, B)).ravel()[keep]
+        target = np.column_stack((B, A)).ravel()[keep]
+        return source, target, np.repeat(link_length, 2)[keep], np.repeat(travel_time, 2)[keep]
+
+    @staticmethod
+    def get_road_list(road_csv_path: str, excluded_roadtype: List[str]):
+        a, b, _, travel_time = ImportNetwork.read_links(road_csv_path, excluded_roadtype)
+        road_dict = dict(zip(zip(a.tolist(), b.tolist()), travel_time.tolist()))
+
+        print('完成道路讀取...')
+        return road_dict
+
+    @staticmethod
+    def get_road_length(road_csv_path: str, excluded_roadtype: List[str]):
+        """跟get_road_list一樣，但值是節線長度"""
+        a, b, link_length, _ = ImportNetwork.read_links(road_csv_path, excluded_roadtype)
+        length_dict = dict(zip(zip(a.tolist(), b.tolist()), link_length.tolist()))
+
+        print('完成道路長度讀取...')
+        return length_dict
+
+    @staticmethod
+    def read_nodes(node_csv_path: str, min_N: int, max_N: int):
+        """回傳點號在min_N ~ max_N之間的(點號, TWD97 x, TWD97 y, 經度, 緯度)五個陣列"""
+        column = ImportNetwork.read_columns(node_csv_path, {'N': np.int64, 'X': np.float64, 'Y': np.float64})
+        node_ids = column['N']
+        kept = (node_ids <= max_N) & (node_ids >= min_N)
+        lon, lat = column['X'][kept], column['Y'][kept]
+        x, y = LatLonToTWD97().convert_many(np.radians(lat), np.radians(lon))
+        return node_ids[kept], x, y, lon, lat
+
+    @staticmethod
+    def get_node_list(node_csv_path: str, min_N: int, max_N: int):
+        node_ids, x, y, _, _ = ImportNetwork.read_nodes(node_csv_path, min_N, max_N)
+        node_list = dict(zip(node_ids.tolist(), zip(x.tolist(), y.tolist())))
+
+        print('完成節點讀取...')
+        return node_list
+
+    @staticmethod
+    def read_graph(
+        node_csv_path: str, road_csv_path: str, excluded_roadtype: List[str], min_N: int = 5001,
+        max_N: int = 150000, with_length: bool = False
+    ):
+        """
+        不經過dict，直接用陣列建立跟build_graph一樣的路網\n
+        重複的節線跟dict一樣：位置看第一次出現，成本取最後一次出現的
+        """
+        node_ids, x, y, lon, lat = ImportNetwork.read_nodes(node_csv_path, min_N, max_N)
+        order = np.argsort(node_ids, kind='stable')
+        node_ids, x, y, lon, lat = node_ids[order], x[order], y[order], lon[order], lat[order]
+        print('完成節點讀取...')
+        a, b, link_length, travel_time = ImportNetwork.read_links(road_csv_path, excluded_roadtype)
+        print('完成道路讀取...')
+
+        # 重複的點號跟dict一樣只留最後一個
+        last = len(node_ids) - 1 - np.unique(node_ids[::-1], return_index=True)[1]
+        node_ids, x, y, lon, lat = node_ids[last], x[last], y[last], lon[last], lat[last]
+
+        # 兩端點都在路網內的節線
+        source = np.clip(np.searchsorted(node_ids, a), 0, max(len(node_ids) - 1, 0))
+        target = np.clip(np.searchsorted(node_ids, b), 0, max(len(node_ids) - 1, 0))
+        inside = (node_ids[source] == a) & (node_ids[target] == b) if len(node_ids) > 0 else np.zeros(len(a), dtype=bool)
+        source, target = source[inside], target[inside]
+        link_length, travel_time = link_length[inside], travel_time[inside]
+
+        key = source.astype(np.int64) * len(node_ids) + target
+        first = np.unique(key, return_index=True)[1]
+        last = len(key) - 1 - np.unique(key[::-1], return_index=True)[1] #同一條節線後面的會蓋掉前面的
+        order = np.argsort(first, kind='stable')
+        first, last = first[order], last[order]
+
+        road_graph = RoadGraph.from_arrays(
+            node_ids, x, y, source[first].astype(np.int32), target[first].astype(np.int32), travel_time[last],
+            length=link_length[last] if with_length else None, lon=lon, lat=lat
+        )
+        print('完成路網建立...')
+        num_component = len(np.unique(road_graph.component))
+        print('完成強連通塊計算...(連通塊數: {})'.format(num_component))
+        return road_graph
+
+    @staticmethod
+    def build_graph(node_dict: dict, road_dict: dict, length_dict: dict = None):
+        """把node_dict與road_dict轉成CSR格式的路網，有length_dict就一起存節線長度"""
+        road_graph = RoadGraph.from_dicts(node_dict, road_dict, length_dict)
+        print('完成路網建立...')
+        #先算好強連通塊，到不了的區間不用搜尋
+        num_component = len(np.unique(road_graph.component))
+        print('完成強連通塊計算...(連通塊數: {})'.format(num_component))
+        return road_graph
+
+    @staticmethod
+    def load_graph(
+        node_csv_path: str, road_csv_path: str, excluded_roadtype: List[str], min_N: int = 5001,
+        max_N: int = 150000, with_length: bool = False, graph_path: str = None
+    ):
+        """
+        跟get_node_list、get_road_list(、get_road_length)再build_graph一樣，但第一次讀完CSV就把路網存起來，
+        之後直接用唯讀的memory map讀存檔，不用再解析CSV；子程序也map同一份，不會每個程序各存一份\n
+        存檔預設是節線檔旁邊的資料夾，記錄讀取條件與兩個CSV的大小、修改時間：大小或修改時間不同時再比對內容的SHA-1，
+        內容也不同才重新讀CSV
+        """
+        if graph_path is None:
+            graph_path = '{}_graph{}'.format(os.path.splitext(road_csv_path)[0], '_length' if with_length else '')
+        csv_paths = (node_csv_path, road_csv_path)
+        options = 'N={}-{};excluded={};length={}'.format(min_N, max_N, ','.join(sorted(excluded_roadtype)), with_length)
+        file_stat = ';'.join('{}:{}'.format(os.path.getsize(p), os.path.getmtime(p)) for p in csv_paths)
+
+        road_graph = RoadGraph.load(graph_path, options=options, file_stat=file_stat)
+        if road_graph is not None:
+            print('完成路網讀取...(存檔)')
+            return road_graph
+
+        # 檔案被複製或touch過，內容沒變就更新記錄繼續用
+        content_hash = ImportNetwork.hash_files(*csv_paths)
+        road_graph = RoadGraph.load(graph_path, mmap=False, options=options, content_hash=content_hash)
+        if road_graph is None:
+            road_graph = ImportNetwork.read_graph(
+                node_csv_path, road_csv_path, excluded_roadtype, min_N, max_N, with_length
+            )
+        else:
+            print('完成路網讀取...(存檔)')
+        road_graph.save(graph_path, options=options, file_stat=file_stat, content_hash=content_hash)
+        # 改用memory map，之後傳給子程序時只要傳路徑
+        return RoadGraph.load(graph_path)
+
+    @staticmethod
+    def hash_files(*file_paths: str):
+        """依序讀入檔案內容算SHA-1"""
+        sha = hashlib.sha1()
+        for file_path in file_paths:
+            with open(file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    sha.update(chunk)
+        return sha.hexdigest()
+
+    @staticmethod
+    def export_diagnostics(road_graph: RoadGraph, report_path: str, max_component_size: int = 100):
+        """
+        輸出路網檢查表，給QGIS對照用\n
+        小連通塊: 所屬強連通塊不到max_component_size個點，多半是單行道設錯或被排除的道路種類切斷\n
+        只進不出、只出不進: 沒有出去或進來的節線
+        """
+        component = road_graph.component
+        component_size = np.bincount(component)
+        out_degree = np.diff(road_graph.offsets)
+        in_degree = np.bincount(road_graph.targets, minlength=road_graph.num_nodes)
+
+        num_rows = 0
+        with open(report_path, 'w', newline='', encoding='utf-8') as report_csv:
+            report = csv.writer(report_csv)
+            report.writerow(['N', 'ComponentID', 'ComponentSize', 'InDegree', 'OutDegree', 'Issue'])
+            for i in range(road_graph.num_nodes):
+                issues = []
+                if component_size[component[i]] < max_component_size:
+                    issues.append('小連通塊')
+                if out_degree[i] == 0:
+                    issues.append('只進不出')
+                if in_degree[i] == 0:
+                    issues.append('只出不進')
+                if len(issues) > 0:
+                    report.writerow([
+                        int(road_graph.node_ids[i]), int(component[i]), int(component_size[component[i]]),
+                        int(in_degree[i]), int(out_degree[i]), '/'.join(issues)
+                    ])
+                    num_rows += 1
+        print('完成路網檢查表輸出...(有問題的點數: {})'.format(num_rows))
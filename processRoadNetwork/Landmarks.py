@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import numpy as np
+
+from processRoadNetwork.RoadGraph import RoadGraph
+
+
+class Landmarks(object):
+    """
+    ALT(A*, landmarks, triangle inequality)用的地標\n
+    dist_from[L, v]: 地標L到v的旅行時間，dist_to[L, v]: v到地標L的旅行時間\n
+    由三角不等式 d(v, t) >= d(L, t) - d(L, v) 與 d(v, t) >= d(v, L) - d(t, L) 得到下界
+    """
+
+    file_version = 1
+
+    def __init__(self, graph: RoadGraph, landmark_index, dist_from, dist_to, num_active: int = 4):
+        self.graph = graph
+        self.landmark_index = landmark_index
+        self.dist_from = dist_from
+        self.dist_to = dist_to
+        self.num_active = num_active #每次查詢只用下界最好的幾個地標
+
+    @classmethod
+    def prepare(cls, graph: RoadGraph, landmark_path: str, num_landmarks: int = 16):
+        """有存檔且路網沒變就讀檔，不然就重新挑地標並存檔"""
+        landmarks = cls.load(landmark_path, graph)
+        if landmarks is None:
+            landmarks = cls.build(graph, num_landmarks)
+            landmarks.save(landmark_path)
+        return landmarks
+
+    @classmethod
+    def build(cls, graph: RoadGraph, num_landmarks: int = 16, min_component_size: int = 100):
+        """
+        用farthest selection挑地標：每次挑離現有地標最遠(旅行時間)的點\n
+        從最大的強連通塊開始挑，還有至少min_component_size個點的強連通塊跟現有地標互相都到不了時，
+        先在那邊挑一個地標，不然那些點只剩直線距離的下界
+        """
+        reverse_graph = graph.reverse()
+        landmark_index = []
+        dist_from = []
+        dist_to = []
+
+        component = graph.component
+        component_size = np.bincount(component)
+        large = (component_size[component] >= min_component_size) | (component == component_size.argmax())
+        covered = np.zeros(graph.num_nodes, dtype=bool) #跟某個地標之間至少一個方向到得了
+        nearest_dist = np.full(graph.num_nodes, np.inf) #離最近的地標的旅行時間，到不了是inf
+        while len(landmark_index) < num_landmarks:
+            uncovered = np.flatnonzero(large & ~covered)
+            if len(uncovered) > 0:
+                # 沒蓋到的最大強連通塊裡最西邊的點當起點，新地標是離它最遠的點
+                members = uncovered[component[uncovered] == np.bincount(component[uncovered]).argmax()]
+                seed_dist = graph.distances_from(int(members[np.argmin(graph.x[members])]))
+                landmark = int(np.argmax(np.where(np.isfinite(seed_dist) & ~covered, seed_dist, -1)))
+            else:
+                landmark = int(np.argmax(np.where(np.isfinite(nearest_dist), nearest_dist, -1)))
+                if not nearest_dist[landmark] > 0:
+                    break
+            landmark_index.append(landmark)
+            dist_from.append(graph.distances_from(landmark))
+            dist_to.append(reverse_graph.distances_from(landmark))
+            nearest_dist = np.minimum(nearest_dist, dist_from[-1])
+            covered |= np.isfinite(dist_from[-1]) | np.isfinite(dist_to[-1])
+            print('\r完成地標選取...({}/{})'.format(len(landmark_index), num_landmarks), end='')
+        print()
+
+        return cls(
+            graph, np.array(landmark_index, dtype=np.int32),
+            np.array(dist_from, dtype=np.float64).reshape(-1, graph.num_nodes),
+            np.array(dist_to, dtype=np.float64).reshape(-1, graph.num_nodes)
+        )
+
+    def save(self, landmark_path: str):
+        """把地標與距離表存成npz檔"""
+        with open(landmark_path, 'wb') as landmark_file:
+            np.savez(
+                landmark_file,
+                version=np.array(self.file_version),
+                signature=np.array(self.graph.signature()),
+                landmark_index=self.landmark_index,
+                dist_from=self.dist_from,
+                dist_to=self.dist_to
+            )
+        print('完成地標存檔...')
+
+    @classmethod
+    def load(cls, landmark_path: str, graph: RoadGraph):
+        """讀取地標存檔，檔案不存在、版本不同或路網已經改過就回傳None"""
+        if not os.path.isfile(landmark_path):
+            return None
+        with np.load(landmark_path) as data:
+            if int(data['version']) != cls.file_version or str(data['signature']) != graph.signature():
+                return None
+            landmarks = cls(graph, data['landmark_index'], data['dist_from'], data['dist_to'])
+        print('完成地標讀取...')
+        return landmarks
+
+    def active_landmarks(self, start: int, end: int):
+        """挑對這組起終點下界最大的幾個地標"""
+        if start < 0 or len(self.landmark_index) <= self.num_active:
+            return slice(None)
+        with np.errstate(invalid='ignore'):
+            score = np.fmax(
+                self.dist_from[:, end] - self.dist_from[:, start],
+                self.dist_to[:, start] - self.dist_to[:, end]
+            )
+        score = np.where(np.isnan(score), -np.inf, score)
+        return np.argsort(-score)[:self.num_active]
+
+    def lower_bound_to(self, end: int, start: int = -1, out=None, scratch=None):
+        """
+        所有點到end的旅行時間下界(包含直線距離/200)，到不了end的點是inf\n
+        有out時out要先放好直線距離的下界，地標的下界直接取大寫進out，scratch是同長度的暫存陣列，不用配置新的陣列
+        """
+        active = self.active_landmarks(start, end)
+        if out is not None:
+            with np.errstate(invalid='ignore'):
+                for L in np.arange(len(self.landmark_index))[active]:
+                    np.subtract(self.dist_from[L, end], self.dist_from[L], out=scratch)
+                    np.fmax(out, scratch, out=out)
+                    np.subtract(self.dist_to[L], self.dist_to[L, end], out=scratch)
+                    np.fmax(out, scratch, out=out)
+            return out
+        with np.errstate(invalid='ignore'):
+            bound = np.fmax(
+                self.dist_from[active, end][:, None] - self.dist_from[active],
+                self.dist_to[active] - self.dist_to[active, end][:, None]
+            )
+        return self._combine(bound, end)
+
+    def lower_bound_from(self, start: int, end: int = -1):
+        """start到所有點的旅行時間下界(包含直線距離/200)，start到不了的點是inf"""
+        active = self.active_landmarks(start, end) if end >= 0 else slice(None)
+        with np.errstate(invalid='ignore'):
+            bound = np.fmax(
+                self.dist_from[active] - self.dist_from[active, start][:, None],
+                self.dist_to[active, start][:, None] - self.dist_to[active]
+            )
+        return self._combine(bound, start)
+
+    def _combine(self, bound, node: int):
+        """取各地標下界的最大值，再跟直線距離的下界取大"""
+        if bound.shape[0] > 0:
+            bound = np.fmax.reduce(bound, axis=0)
+            bound = np.where(np.isnan(bound), 0, bound)
+        else:
+            bound = np.zeros(self.graph.num_nodes)
+        geometric = np.hypot(self.graph.x - self.graph.x[node], self.graph.y - self.graph.y[node]) / 200
+        return np.maximum(bound, geometric)
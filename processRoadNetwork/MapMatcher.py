@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+
+import re
+from heapq import heappop, heappush
+from math import ceil, hypot, inf, radians
+from multiprocessing import Pool
+from typing import List
+
+import numpy as np
+
+from processRoadNetwork.LatLonToTWD97 import LatLonToTWD97
+from processRoadNetwork.NodeIndex import NodeIndex
+from processRoadNetwork.RoadGraph import RoadGraph
+
+_worker_matcher = None
+
+
+def _init_worker(graph: RoadGraph, link_index: NodeIndex, options: dict):
+    """每個子程序只收一次路網與空間索引"""
+    global _worker_matcher
+    _worker_matcher = MapMatcher(graph, link_index, **options)
+
+
+def _match_one(task):
+    key, wkt = task
+    return key, _worker_matcher.match_shape(wkt)
+
+
+class MapMatcher(object):
+    """
+    用隱藏式馬可夫模型(HMM)把PTX的路線線型對應到路網的點序\n
+    狀態是線型點附近search_radius(m)內最近的max_candidates條節線(含投影位置)\n
+    發射機率看線型點到節線的距離(常態分布，標準差sigma)\n
+    轉移機率看兩個投影點間沿路網的長度跟線型長度的差(指數分布，參數beta)\n
+    轉移只在max_detour倍線型長度內用節線長度跑有限Dijkstra，最後用Viterbi找機率最大的點序\n
+    節線的位置用沿線取樣點的KD-tree(NodeIndex)來找，點號欄位放節線編號
+    """
+
+    def __init__(
+        self, graph: RoadGraph, link_index: NodeIndex = None, search_radius: float = 60, max_candidates: int = 8,
+        sigma: float = 20, beta: float = 50, point_spacing: float = 50, max_detour: float = 2, max_skip: int = 5,
+        max_gap: float = 5000
+    ):
+        if graph.lengths is None:
+            raise ValueError('路網要有節線長度，請用ImportNetwork.get_road_length建立路網')
+        self.graph = graph
+        self.search_radius = search_radius
+        self.max_candidates = max_candidates
+        self.sigma = sigma
+        self.beta = beta
+        self.point_spacing = point_spacing #線型點太疏就內插，太密就略過
+        self.max_detour = max_detour
+        self.max_skip = max_skip #連續幾個接不上的線型點當成偏移略過，超過才當成斷掉
+        self.max_gap = max_gap #前後兩段接不起來時，補路徑的搜尋範圍(m)
+        self._source = np.repeat(np.arange(graph.num_nodes, dtype=np.int32), np.diff(graph.offsets))
+        self._offsets = memoryview(graph.offsets)
+        self._targets = memoryview(graph.targets)
+        self._lengths = memoryview(graph.lengths)
+        self.link_index = link_index if link_index is not None else self.build_link_index()
+
+    def build_link_index(self):
+        """沿每條節線每隔search_radius / 2取一個點建KD-tree，離線型點search_radius內的節線一定找得到取樣點"""
+        graph = self.graph
+        x1, y1 = graph.x[self._source], graph.y[self._source]
+        x2, y2 = graph.x[graph.targets], graph.y[graph.targets]
+        num_step = np.maximum(1, np.ceil(np.hypot(x2 - x1, y2 - y1) / (self.search_radius / 2))).astype(np.int64)
+        link = np.repeat(np.arange(graph.num_links, dtype=np.int64), num_step + 1)
+        first = np.repeat(np.cumsum(num_step + 1) - (num_step + 1), num_step + 1)
+        fraction = (np.arange(len(link)) - first) / num_step[link]
+        return NodeIndex(
+            link, x1[link] + (x2 - x1)[link] * fraction, y1[link] + (y2 - y1)[link] * fraction
+        )
+
+    @staticmethod
+    def shape_to_points(wkt: str):
+        """把PTX線型的WKT(經度 緯度)轉成TWD97座標的list"""
+        converter = LatLonToTWD97()
+        points = []
+        for lon, lat in re.findall(r'(-?\d+\.?\d*)\s+(-?\d+\.?\d*)', wkt):
+            points.append(converter.convert(radians(float(lat)), radians(float(lon))))
+        return points
+
+    def resample(self, points: list):
+        """讓相鄰線型點的距離大約是point_spacing"""
+        if len(points) == 0:
+            return []
+        resampled = [tuple(points[0])]
+        for x, y in points[1:]:
+            last_x, last_y = resampled[-1]
+            dist = hypot(x - last_x, y - last_y)
+            if dist < self.point_spacing:
+                continue
+            num_step = int(ceil(dist / self.point_spacing))
+            for i in range(1, num_step):
+                resampled.append((last_x + (x - last_x) * i / num_step, last_y + (y - last_y) * i / num_step))
+            resampled.append((x, y))
+        if resampled[-1] != tuple(points[-1]):
+            resampled.append(tuple(points[-1]))
+        return resampled
+
+    def candidates(self, points: list):
+        """每個線型點的候選[(節線, 投影位置0~1, 發射機率的log)]"""
+        graph = self.graph
+        xs = np.array([p[0] for p in points])
+        ys = np.array([p[1] for p in points])
+        nearby = self.link_index.query_radius(xs, ys, self.search_radius * 1.25)
+
+        result = []
+        for i, (links, _) in enumerate(nearby):
+            links = np.unique(links)
+            u, v = self._source[links], graph.targets[links]
+            x1, y1, dx, dy = graph.x[u], graph.y[u], graph.x[v] - graph.x[u], graph.y[v] - graph.y[u]
+            seg2 = dx * dx + dy * dy
+            with np.errstate(invalid='ignore', divide='ignore'):
+                fraction = np.clip(np.where(seg2 > 0, ((xs[i] - x1) * dx + (ys[i] - y1) * dy) / seg2, 0), 0, 1)
+            dist = np.hypot(x1 + dx * fraction - xs[i], y1 + dy * fraction - ys[i])
+            keep = np.argsort(dist)[:self.max_candidates]
+            keep = keep[dist[keep] <= self.search_radius]
+            result.append([
+                (int(links[j]), float(fraction[j]), -0.5 * (float(dist[j]) / self.sigma) ** 2) for j in keep
+            ])
+        return result
+
+    def match_shape(self, wkt: str):
+        return self.match(self.shape_to_points(wkt))
+
+    def match(self, points: list):
+        """
+        回傳對應到的點序(點號)\n
+        前後兩段怎麼樣都接不起來的地方放0，跟find_path手動輸入時「找不出來就填0」一樣
+        """
+        points = self.resample(points)
+        if len(points) == 0:
+            return []
+        # 沿著線型累加的距離，轉移機率用這個比較，比直線距離準
+        shape_dist = [0.0]
+        for (x1, y1), (x2, y2) in zip(points, points[1:]):
+            shape_dist.append(shape_dist[-1] + hypot(x2 - x1, y2 - y1))
+
+        # 附近沒有節線的線型點就不用
+        observations = [
+            (shape_dist[i], candidates) for i, candidates in enumerate(self.candidates(points)) if len(candidates) > 0
+        ]
+        if len(observations) == 0:
+            return []
+
+        targets, lengths = self._targets, self._lengths
+        chains = []
+        back = {}
+        score = self._start_states(observations, 0, back)
+        last = 0 #score所在的線型點
+        t = 1
+        while t < len(observations):
+            moved = observations[t][0] - observations[last][0]
+            limit = moved * self.max_detour + 2 * self.search_radius
+            candidates = observations[t][1]
+            tails = {int(self._source[k]) for k, _, _ in candidates}
+
+            # 同一個節線終點出發的狀態只跑一次Dijkstra
+            reached = {}
+            new_score = {}
+            for state, state_score in score.items():
+                k1, f1, _ = state
+                head = targets[k1]
+                rest = (1 - f1) * lengths[k1]
+                for k2, f2, emission in candidates:
+                    moves = []
+                    if k2 == k1:
+                        # 同一條節線往前走，往回的話當成停在原地(線型點的誤差)
+                        moves.append((max(f2 - f1, 0) * lengths[k1], []))
+                    if k2 != k1 or f2 < f1:
+                        # 換節線，或是真的繞了一圈回到同一條節線
+                        if head not in reached:
+                            reached[head] = self._bounded_paths(head, tails, limit)
+                        tail = int(self._source[k2])
+                        if tail in reached[head]:
+                            to_tail, node_seq = reached[head][tail]
+                            moves.append((rest + to_tail + f2 * lengths[k2], node_seq[1:] + [targets[k2]]))
+                    for net_dist, seg in moves:
+                        new_state_score = state_score - abs(net_dist - moved) / self.beta + emission
+                        if new_state_score > new_score.get((k2, f2, t), -inf):
+                            new_score[(k2, f2, t)] = new_state_score
+                            back[(k2, f2, t)] = (state, seg)
+
+            if len(new_score) > 0:
+                score = new_score
+                last = t
+            elif t - last > self.max_skip:
+                # 接不上的點太多，HMM斷掉了，先收前一段，再從第一個接不上的點重新開始
+                chains.append(self._backtrack(score, back))
+                last += 1
+                t = last
+                score = self._start_states(observations, t, back)
+            t += 1
+        chains.append(self._backtrack(score, back))
+
+        path = chains[0]
+        for chain in chains[1:]:
+            gap = self._bounded_paths(path[-1], {chain[0]}, self.max_gap)
+            if chain[0] in gap:
+                path.extend(gap[chain[0]][1][1:])
+                path.extend(chain[1:])
+            else:
+                path.append(-1)
+                path.extend(chain)
+
+        node_ids = self.graph.node_ids
+        matched = []
+        for i in self._remove_short_loops(path):
+            node = int(node_ids[i]) if i >= 0 else 0
+            if len(matched) == 0 or matched[-1] != node:
+                matched.append(node)
+        return matched
+
+    def _start_states(self, observations: list, t: int, back: dict):
+        """從第t個線型點開始新的一段，起點是節線的兩端"""
+        score = {}
+        for k, f, emission in observations[t][1]:
+            back[(k, f, t)] = (None, [int(self._source[k]), self._targets[k]])
+            score[(k, f, t)] = emission
+        return score
+
+    @staticmethod
+    def _backtrack(score: dict, back: dict):
+        """
+        從機率最大的最後狀態往回接出索引序列\n
+        頭尾的線型點比較靠近節線哪一端，就只放到那一端，不要多放一個沒經過的點
+        """
+        last_state = state = max(score, key=score.get)
+        segments = []
+        while state is not None:
+            first_state = state
+            state, seg = back[state]
+            segments.append(seg)
+        path = []
+        for seg in reversed(segments):
+            path.extend(seg)
+        if first_state[1] > 0.5 and len(path) > 1:
+            del path[0]
+        if last_state[1] < 0.5 and len(path) > 1:
+            del path[-1]
+        return path
+
+    def _remove_short_loops(self, path: list):
+        """
+        拿掉繞一圈又回到同一點、總長不到2倍search_radius的小圈，通常是線型點偏到旁邊巷子造成的\n
+        公車真的繞街廓的圈都比這個長，不會被拿掉
+        """
+        max_loop = 2 * self.search_radius
+        result = []
+        cum_length = []
+        position = {}
+        for i in path:
+            if len(result) > 0 and result[-1] >= 0 and i >= 0:
+                length = cum_length[-1] + self._link_length(result[-1], i)
+            else:
+                length = cum_length[-1] if len(cum_length) > 0 else 0
+            if i >= 0 and i in position and length - cum_length[position[i]] <= max_loop:
+                # 回到圈的起點，把圈拿掉
+                for removed in result[position[i] + 1:]:
+                    position.pop(removed, None)
+                del result[position[i] + 1:]
+                del cum_length[position[i] + 1:]
+                continue
+            position[i] = len(result)
+            result.append(i)
+            cum_length.append(length)
+        return result
+
+    def _link_length(self, u: int, v: int):
+        offsets, targets, lengths = self._offsets, self._targets, self._lengths
+        return min(lengths[k] for k in range(offsets[u], offsets[u + 1]) if targets[k] == v)
+
+    def _bounded_paths(self, start: int, ends: set, limit: float):
+        """從start用節線長度跑Dijkstra到limit(m)為止，回傳{終點: (長度, 索引序列)}"""
+        offsets, targets, lengths = self._offsets, self._targets, self._lengths
+        remaining = set(ends)
+        found = {}
+        g_score = {start: 0}
+        parent = {start: -1}
+        closed_set = set()
+        open_heap = [(0, start)]
+        while open_heap and remaining:
+            current_g, current = heappop(open_heap)
+            if current in closed_set:
+                continue
+            if current_g > limit:
+                break
+            closed_set.add(current)
+            if current in remaining:
+                remaining.discard(current)
+                seg = []
+                node = current
+                while node != -1:
+                    seg.append(node)
+                    node = parent[node]
+                found[current] = (current_g, seg[::-1])
+            for k in range(offsets[current], offsets[current + 1]):
+                child = targets[k]
+                child_g = current_g + lengths[k]
+                if child_g < g_score.get(child, inf):
+                    g_score[child] = child_g
+                    parent[child] = current
+                    heappush(open_heap, (child_g, child))
+        return found
+
+    def match_shapes(self, shapes: dict, processes: int = None):
+        """平行處理多條路線，shapes: {路線: WKT}，回傳{路線: 點序}"""
+        options = {
+            'search_radius': self.search_radius, 'max_candidates': self.max_candidates, 'sigma': self.sigma,
+            'beta': self.beta, 'point_spacing': self.point_spacing, 'max_detour': self.max_detour,
+            'max_skip': self.max_skip, 'max_gap': self.max_gap
+        }
+        tasks = list(shapes.items())
+        result = {}
+        if processes == 1:
+            _init_worker(self.graph, self.link_index, options)
+            self._collect(map(_match_one, tasks), len(tasks), result)
+        else:
+            with Pool(processes, initializer=_init_worker, initargs=(self.graph, self.link_index, options)) as pool:
+                self._collect(pool.imap_unordered(_match_one, tasks), len(tasks), result)
+        print('完成線型對應...(路線數: {})'.format(len(result)))
+        return result
+
+    @staticmethod
+    def _collect(matched, num_tasks: int, result: dict):
+        for i, (key, path) in enumerate(matched):
+            result[key] = path
+            print('\r[{:<50}] ({}/{})'.format('=' * int((i + 1) / (2 * num_tasks) * 100), i + 1, num_tasks), end='')
+        if num_tasks > 0:
+            print()
+
+    @staticmethod
+    def split_by_stops(matched: List[int], stop_nodes: List[int]):
+        """
+        依站牌點號把整條路線的點序切成站間路徑，回傳跟stop_nodes相鄰兩站對齊的list\n
+        站牌不在點序上、或站間有接不起來的0時，該區間是None
+        """
+        positions = []
+        start = 0
+        for node in stop_nodes:
+            try:
+                start = matched.index(node, start)
+                positions.append(start)
+            except ValueError:
+                positions.append(None)
+
+        sections = []
+        for (n1, i1), (n2, i2) in zip(zip(stop_nodes, positions), zip(stop_nodes[1:], positions[1:])):
+            if n1 == n2:
+                sections.append([n1])
+            elif i1 is None or i2 is None or i2 < i1 or 0 in matched[i1:i2 + 1]:
+                sections.append(None)
+            else:
+                sections.append(matched[i1:i2 + 1])
+        return sections
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+
+from heapq import heappop, heappush, heapreplace
+
+import numpy as np
+
+from processRoadNetwork.RoadGraph import RoadGraph
+
+
+class NodeIndex(object):
+    """
+    節點TWD97座標的KD-tree，批次查詢最近的k個點或半徑內的點\n
+    每個樹節點涵蓋重新排序後座標的一段連續區間[lo, hi)，並記錄外框，查詢時用外框的距離剪枝
+    """
+
+    def __init__(self, node_ids, x, y, leaf_size: int = 16):
+        self.node_ids = np.asarray(node_ids, dtype=np.int64)
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        self.leaf_size = leaf_size
+        self._build(x, y)
+
+    @classmethod
+    def from_graph(cls, graph: RoadGraph, leaf_size: int = 16):
+        return cls(graph.node_ids, graph.x, graph.y, leaf_size)
+
+    @classmethod
+    def from_node_dict(cls, node_dict: dict, leaf_size: int = 16):
+        """用ImportNetwork.get_node_list讀出來的{點號: TWD97座標}建立"""
+        node_ids = np.array(list(node_dict), dtype=np.int64)
+        coord = np.array([node_dict[n] for n in node_ids.tolist()], dtype=np.float64).reshape(-1, 2)
+        return cls(node_ids, coord[:, 0], coord[:, 1], leaf_size)
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    def _build(self, x, y):
+        """每次沿著範圍比較大的座標軸從中位數切開，切到剩leaf_size個點以下"""
+        order = np.arange(len(x))
+        lo_list, hi_list, left, right, box = [], [], [], [], []
+        stack = [(0, len(x), -1, 0)] #(lo, hi, 父節點, 0=左/1=右)
+        while stack:
+            lo, hi, parent, side = stack.pop()
+            t = len(lo_list)
+            if parent >= 0:
+                (left if side == 0 else right)[parent] = t
+            sub = order[lo:hi]
+            sub_x, sub_y = x[sub], y[sub]
+            lo_list.append(lo)
+            hi_list.append(hi)
+            left.append(-1)
+            right.append(-1)
+            if hi > lo:
+                box.append((sub_x.min(), sub_y.min(), sub_x.max(), sub_y.max()))
+            else:
+                box.append((np.inf, np.inf, -np.inf, -np.inf))
+
+            if hi - lo > self.leaf_size:
+                axis = sub_x if box[t][2] - box[t][0] >= box[t][3] - box[t][1] else sub_y
+                mid = (lo + hi) // 2
+                order[lo:hi] = sub[np.argpartition(axis, mid - lo)]
+                stack.append((mid, hi, t, 1))
+                stack.append((lo, mid, t, 0))
+
+        # 查詢都是逐一取值，轉成list比numpy陣列快
+        self._order = order
+        self._px = x[order].tolist()
+        self._py = y[order].tolist()
+        self._lo, self._hi, self._left, self._right = lo_list, hi_list, left, right
+        self._box = box
+
+    def _box_dist2(self, t: int, qx: float, qy: float):
+        min_x, min_y, max_x, max_y = self._box[t]
+        dx = min_x - qx if qx < min_x else (qx - max_x if qx > max_x else 0)
+        dy = min_y - qy if qy < min_y else (qy - max_y if qy > max_y else 0)
+        return dx * dx + dy * dy
+
+    def _query_one(self, qx: float, qy: float, k: int):
+        """best-first走訪，回傳依距離排序的[(距離平方, 排序後位置)]"""
+        px, py = self._px, self._py
+        best = [] #距離平方取負號的max-heap
+        open_heap = [(0.0, 0)]
+        while open_heap:
+            box_d2, t = heappop(open_heap)
+            if len(best) == k and box_d2 > -best[0][0]:
+                break
+            if self._left[t] < 0:
+                for pos in range(self._lo[t], self._hi[t]):
+                    d2 = (px[pos] - qx) ** 2 + (py[pos] - qy) ** 2
+                    if len(best) < k:
+                        heappush(best, (-d2, pos))
+                    elif d2 < -best[0][0]:
+                        heapreplace(best, (-d2, pos))
+            else:
+                for child in (self._left[t], self._right[t]):
+                    child_d2 = self._box_dist2(child, qx, qy)
+                    if len(best) < k or child_d2 <= -best[0][0]:
+                        heappush(open_heap, (child_d2, child))
+        return sorted((-d2, pos) for d2, pos in best)
+
+    def _radius_one(self, qx: float, qy: float, radius2: float):
+        px, py = self._px, self._py
+        found = []
+        stack = [0]
+        while stack:
+            t = stack.pop()
+            if self._box_dist2(t, qx, qy) > radius2:
+                continue
+            if self._left[t] < 0:
+                for pos in range(self._lo[t], self._hi[t]):
+                    d2 = (px[pos] - qx) ** 2 + (py[pos] - qy) ** 2
+                    if d2 <= radius2:
+                        found.append((d2, pos))
+            else:
+                stack.append(self._left[t])
+                stack.append(self._right[t])
+        found.sort()
+        return found
+
+    def nearest(self, x: float, y: float):
+        """回傳離(x, y)最近的點號與直線距離"""
+        nodes, dist = self.query([x], [y], 1)
+        return int(nodes[0, 0]), float(dist[0, 0])
+
+    def query(self, x, y, k: int = 1):
+        """
+        批次找每個座標最近的k個點，回傳(點號, 距離)兩個(查詢數, k)的陣列，依距離排序\n
+        點數不到k個時不足的部分點號補-1、距離補inf
+        """
+        x = np.atleast_1d(np.asarray(x, dtype=np.float64)).tolist()
+        y = np.atleast_1d(np.asarray(y, dtype=np.float64)).tolist()
+        nodes = np.full((len(x), k), -1, dtype=np.int64)
+        dist = np.full((len(x), k), np.inf)
+        for i, (qx, qy) in enumerate(zip(x, y)):
+            found = self._query_one(qx, qy, k)
+            if len(found) > 0:
+                d2, pos = zip(*found)
+                nodes[i, :len(found)] = self.node_ids[self._order[list(pos)]]
+                dist[i, :len(found)] = np.sqrt(d2)
+        return nodes, dist
+
+    def query_radius(self, x, y, radius: float):
+        """批次找每個座標半徑radius(m)內的點，回傳[(點號陣列, 距離陣列)]，依距離排序"""
+        x = np.atleast_1d(np.asarray(x, dtype=np.float64)).tolist()
+        y = np.atleast_1d(np.asarray(y, dtype=np.float64)).tolist()
+        result = []
+        radius2 = radius * radius
+        for qx, qy in zip(x, y):
+            found = self._radius_one(qx, qy, radius2)
+            d2 = np.array([f[0] for f in found], dtype=np.float64)
+            pos = np.array([f[1] for f in found], dtype=np.int64)
+            result.append((self.node_ids[self._order[pos]], np.sqrt(d2)))
+        return result
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+import os
+import pickle
+from collections import OrderedDict
+
+from processRoadNetwork.ImportNetwork import ImportNetwork
+
+
+class PathCache(object):
+    """
+    存在硬碟上的最短路徑快取，key是(起點, 終點, cost profile)，value是(點序, 旅行時間)\n
+    快取檔記錄節點檔與節線檔的雜湊值，路網檔改過就整個作廢；也記錄路網檔的大小與修改時間，
+    都沒變就不用重算雜湊\n
+    第一次查詢才讀檔，超過max_size就把最久沒用到的丟掉，save()時才寫回硬碟
+    """
+
+    file_version = 1
+
+    def __init__(
+        self, cache_path: str, network_hash: str = None, profile: str = 'time', max_size: int = 200000,
+        network_files: tuple = ()
+    ):
+        self.cache_path = cache_path
+        self.network_files = tuple(network_files) #network_hash沒給就用到時才從這些檔案算
+        self._network_hash = network_hash
+        self.profile = profile #同一個快取檔可以放不同的旅行成本設定
+        self.max_size = max_size
+        self._entries = None
+        self._modified = False
+
+    @classmethod
+    def for_network(cls, node_csv_path: str, road_csv_path: str, excluded_roadtype: list, max_size: int = 200000):
+        """快取檔放在節線檔旁邊，cost profile用排除的道路種類區分"""
+        cache_path = '{}_path_cache.pickle'.format(os.path.splitext(road_csv_path)[0])
+        profile = 'time:{}'.format(','.join(sorted(excluded_roadtype)))
+        return cls(cache_path, profile=profile, max_size=max_size, network_files=(node_csv_path, road_csv_path))
+
+    @property
+    def network_hash(self):
+        if self._network_hash is None:
+            #跟路網存檔用同一個雜湊
+            self._network_hash = ImportNetwork.hash_files(*self.network_files)
+        return self._network_hash
+
+    def _file_stat(self):
+        """路網檔的大小與修改時間，跟ImportNetwork.load_graph記錄的一樣"""
+        if len(self.network_files) == 0:
+            return None
+        return ';'.join('{}:{}'.format(os.path.getsize(p), os.path.getmtime(p)) for p in self.network_files)
+
+    @property
+    def entries(self):
+        if self._entries is None:
+            self._entries = self._load()
+        return self._entries
+
+    def _read(self):
+        """讀取快取檔，檔案不存在、讀不了或版本不同回傳None"""
+        if not os.path.isfile(self.cache_path):
+            return None
+        try:
+            with open(self.cache_path, 'rb') as cache_file:
+                saved = pickle.load(cache_file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            saved = None
+        if not isinstance(saved, dict) or saved.get('version') != self.file_version:
+            # 舊的快取要蓋掉
+            self._modified = True
+            return None
+        return saved
+
+    def _load(self):
+        """讀取快取檔，檔案不存在、版本不同或路網已經改過就從空的開始"""
+        saved = self._read()
+        if saved is None:
+            return OrderedDict()
+        file_stat = self._file_stat()
+        if self._network_hash is None and file_stat is not None and saved.get('file_stat') == file_stat:
+            # 路網檔的大小與修改時間都沒變，直接用記錄的雜湊
+            self._network_hash = saved['network_hash']
+        if saved.get('network_hash') != self.network_hash:
+            # 路網改過，舊的快取要蓋掉
+            self._modified = True
+            return OrderedDict()
+        if saved.get('file_stat') != file_stat:
+            # 檔案被複製或touch過，內容沒變，存檔時更新記錄
+            self._modified = True
+        print('完成路徑快取讀取...(路徑數: {})'.format(len(saved['entries'])))
+        return OrderedDict(saved['entries'])
+
+    def get(self, p1: int, p2: int):
+        """有存過就回傳(點序, 旅行時間)，不然回傳None"""
+        key = (p1, p2, self.profile)
+        entries = self.entries
+        if key not in entries:
+            return None
+        entries.move_to_end(key)
+        path, distance = entries[key]
+        return list(path), distance
+
+    def put(self, p1: int, p2: int, path: list, distance: float):
+        """只存找得到的路徑，找不到的可能只是max_level不夠"""
+        if len(path) == 0:
+            return
+        key = (p1, p2, self.profile)
+        entries = self.entries
+        entries[key] = (tuple(path), distance)
+        entries.move_to_end(key)
+        while len(entries) > self.max_size:
+            entries.popitem(last=False)
+        self._modified = True
+
+    def discard(self, p1: int, p2: int):
+        """刪掉一筆路徑，路網改過、路徑可能不是最短的時候用"""
+        if self.entries.pop((p1, p2, self.profile), None) is not None:
+            self._modified = True
+
+    def items(self):
+        """回傳這個cost profile存的[(起點, 終點, 點序, 旅行時間)]"""
+        return [
+            (p1, p2, list(path), distance)
+            for (p1, p2, profile), (path, distance) in self.entries.items() if profile == self.profile
+        ]
+
+    def adopt(self, old_network_hash: str):
+        """
+        路網檔改過之後接手舊路網的快取：快取檔記錄的是old_network_hash才讀進來，之後就對應現在的路網檔，
+        其他cost profile的路徑沒辦法確認就丟掉\n
+        接手的路徑要先用PathRepair處理受影響的部分再save()\n
+        回傳是否接手了舊的快取，快取本來就對應現在的路網時照常讀取並回傳False
+        """
+        saved = self._read()
+        if saved is None or saved.get('network_hash') != old_network_hash:
+            self._entries = self._load()
+            return False
+        self._entries = OrderedDict((key, value) for key, value in saved['entries'] if key[2] == self.profile)
+        self._modified = True
+        print('完成舊路網快取讀取...(路徑數: {})'.format(len(self._entries)))
+        return True
+
+    def __len__(self):
+        return len(self.entries)
+
+    def save(self):
+        """有變動才寫回硬碟，先寫暫存檔再取代，中斷也不會弄壞舊的快取"""
+        if not self._modified:
+            return
+        temp_path = '{}.tmp'.format(self.cache_path)
+        with open(temp_path, 'wb') as cache_file:
+            pickle.dump(
+                {
+                    'version': self.file_version, 'network_hash': self.network_hash, 'file_stat': self._file_stat(),
+                    'entries': list(self.entries.items())
+                },
+                cache_file, protocol=pickle.HIGHEST_PROTOCOL
+            )
+        os.replace(temp_path, self.cache_path)
+        self._modified = False
+        print('完成路徑快取存檔...(路徑數: {})'.format(len(self.entries)))
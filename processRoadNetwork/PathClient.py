@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+import json
+import urllib.error
+import urllib.request
+from typing import List
+
+
+class PathClient(object):
+    """
+    PathServer的用戶端，方法跟ShortestPath、BoxPathFinder同名同回傳格式，可以直接替換\n
+    路網、CH、路徑快取都在服務那邊，工具程式啟動時不用再讀路網
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 8765, timeout: float = 600):
+        self.url = 'http://{}:{}'.format(host, port)
+        self.timeout = timeout
+        self.stats = None #搜尋統計記在服務那邊
+
+    @classmethod
+    def connect(cls, host: str = '127.0.0.1', port: int = 8765, timeout: float = 600):
+        """服務有在跑就回傳PathClient，不然回傳None，讓呼叫端自己讀路網"""
+        client = cls(host, port, timeout)
+        try:
+            client.status()
+        except (OSError, ValueError, RuntimeError):
+            return None
+        return client
+
+    def _post(self, route: str, body: dict = None):
+        data = json.dumps(body if body is not None else {}).encode('utf-8')
+        request = urllib.request.Request(
+            self.url + route, data=data, headers={'Content-Type': 'application/json; charset=utf-8'}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read().decode('utf-8'))
+        except urllib.error.HTTPError as e:
+            raise RuntimeError('路徑查詢服務錯誤({}): {}'.format(e.code, e.read().decode('utf-8'))) from None
+
+    def status(self):
+        """路網大小與快取路徑數"""
+        return self._post('/status')
+
+    def save_cache(self):
+        """請服務把路徑快取寫回硬碟"""
+        self._post('/save')
+
+    def find_paths(self, sections: List[tuple], max_level: int = 1000, mode: str = None):
+        """一次送很多區間，回傳[(點序, 旅行時間)]，順序跟sections一樣"""
+        result = self._post('/paths', {'sections': [list(s) for s in sections], 'max_level': max_level, 'mode': mode})
+        return [(path, distance) for path, distance in result['paths']]
+
+    def find_shortest_path(self, OD_node: List[int], max_level: int = 1000, mode: str = None):
+        return self.find_paths([OD_node[:2]], max_level, mode)[0]
+
+    def find_paths_from(self, origin: int, destinations: List[int], max_level: int = 1000, mode: str = None):
+        """回傳{終點: (點序, 旅行時間)}"""
+        return dict(zip(destinations, self.find_paths([(origin, p2) for p2 in destinations], max_level, mode)))
+
+    def find_waypoint_path(self, waypoints: List[int], max_level: int = 1000, mode: str = None):
+        result = self._post('/waypoint', {'waypoints': list(waypoints), 'max_level': max_level, 'mode': mode})
+        return result['path'], result['leg_costs']
+
+    def k_shortest_paths(self, OD_node: List[int], k: int = 3, max_level: int = 1000, max_stretch: float = 2.0):
+        result = self._post('/k_shortest', {
+            'OD_node': list(OD_node[:2]), 'k': k, 'max_level': max_level, 'max_stretch': max_stretch
+        })
+        return [(path, distance) for path, distance in result['paths']]
+
+    def find_path(self, OD_node: List[int]):
+        """跟BoxPathFinder.find_path一樣，回傳(點序, 是否找到)"""
+        result = self._post('/box_path', {'OD_node': list(OD_node[:2])})
+        return result['path'], result['found']
+
+    def nearest(self, x: float, y: float):
+        """回傳離TWD97座標(x, y)最近的點號與直線距離"""
+        nodes, distances = self.query([x], [y], 1)
+        return nodes[0][0], distances[0][0]
+
+    def query(self, x: List[float], y: List[float], k: int = 1):
+        """批次找每個TWD97座標最近的k個點，回傳(點號, 距離)兩個[查詢數][k]的list，不足的點號是-1、距離是None"""
+        result = self._post('/nearest', {'x': list(x), 'y': list(y), 'k': k})
+        return result['nodes'], result['distances']
+
+    def query_lonlat(self, lon: List[float], lat: List[float], k: int = 1):
+        """跟query一樣，但輸入是經緯度(度)"""
+        result = self._post('/nearest', {'lon': list(lon), 'lat': list(lat), 'k': k})
+        return result['nodes'], result['distances']
+
+    def link_costs(self, links: List[tuple]):
+        """回傳每條節線的旅行時間，沒有這條節線是None"""
+        return self._post('/links', {'links': [list(link) for link in links]})['costs']
+
+    def has_link(self, p1: int, p2: int):
+        return self.link_costs([(p1, p2)])[0] is not None
@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+
+import os
+from typing import List
+
+
+class PathFile(object):
+    """站間路徑的文字檔，跟find_path的ProcessPath.save一樣的格式：'{檔名}.txt'裡是逗號分隔的點序"""
+
+    @staticmethod
+    def save(path_list: List[int], save_dir: str, path_filename: str):
+        with open(os.path.join(save_dir, '{}.txt'.format(path_filename)), 'w') as path_file:
+            path_file.write(','.join(map(str, path_list)))
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+from processRoadNetwork.ContractionHierarchy import ContractionHierarchy
+from processRoadNetwork.Landmarks import Landmarks
+from processRoadNetwork.PathCache import PathCache
+from processRoadNetwork.RoadGraph import RoadGraph
+from processRoadNetwork.SectionSolver import SectionSolver
+
+
+class PathRepair(object):
+    """
+    節線改過之後，只重算快取裡可能受影響的區間路徑，graph是改過之後的路網\n
+    變慢或刪掉的節線: 只有經過它的路徑會受影響\n
+    變快或新增的節線(a, b): 只有 d(起點, a) + 新成本 + d(b, 終點) < 原本旅行時間 的路徑會受影響，
+    從a往回、從b往前各跑一次有範圍的Dijkstra就能一次判斷所有路徑\n
+    受影響的路徑交給SectionSolver，同一個起點的區間共用一棵搜尋樹
+    """
+
+    def __init__(self, graph: RoadGraph, hierarchy: ContractionHierarchy = None, landmarks: Landmarks = None):
+        self.graph = graph
+        self.hierarchy = hierarchy
+        self.landmarks = landmarks
+
+    @staticmethod
+    def diff_links(old_road_dict: dict, new_road_dict: dict):
+        """比較ImportNetwork.get_road_list讀出來的兩個路網，回傳{(起點, 終點): (舊成本, 新成本)}，沒有這條節線的是None"""
+        changes = {}
+        for link, old_cost in old_road_dict.items():
+            new_cost = new_road_dict.get(link)
+            if new_cost != old_cost:
+                changes[link] = (old_cost, new_cost)
+        for link, new_cost in new_road_dict.items():
+            if link not in old_road_dict:
+                changes[link] = (None, new_cost)
+        return changes
+
+    def affected(self, cached_paths: list, changes: dict):
+        """cached_paths: [(起點, 終點, 點序, 旅行時間)]，回傳可能不再是最短路徑的(起點, 終點)"""
+        worse = set()
+        better = {}
+        for link, (old_cost, new_cost) in changes.items():
+            if new_cost is None or (old_cost is not None and new_cost > old_cost):
+                worse.add(link)
+            elif old_cost is None or new_cost < old_cost:
+                better[link] = new_cost
+
+        affected = set()
+        for p1, p2, path, _ in cached_paths:
+            if any(n not in self.graph for n in path) or not worse.isdisjoint(zip(path, path[1:])):
+                affected.add((p1, p2))
+
+        # 變快的節線，用新路網算起點到a、b到終點的距離，範圍只要到快取裡最長的旅行時間
+        remaining = [
+            (p1, p2, distance) for p1, p2, _, distance in cached_paths
+            if (p1, p2) not in affected and p1 in self.graph and p2 in self.graph
+        ]
+        if len(better) > 0 and len(remaining) > 0:
+            origin = np.array([self.graph.index(p1) for p1, _, _ in remaining], dtype=np.int64)
+            destination = np.array([self.graph.index(p2) for _, p2, _ in remaining], dtype=np.int64)
+            distance = np.array([d for _, _, d in remaining], dtype=np.float64)
+            limit = float(distance.max())
+            reverse_graph = self.graph.reverse()
+            to_a = {}
+            from_b = {}
+            is_affected = np.zeros(len(remaining), dtype=bool)
+            for (a, b), new_cost in better.items():
+                if a not in self.graph or b not in self.graph:
+                    continue
+                a_index, b_index = self.graph.index(a), self.graph.index(b)
+                if a_index not in to_a:
+                    to_a[a_index] = reverse_graph.distances_from(a_index, limit)
+                if b_index not in from_b:
+                    from_b[b_index] = self.graph.distances_from(b_index, limit)
+                is_affected |= to_a[a_index][origin] + new_cost + from_b[b_index][destination] < distance - 1e-9
+            affected.update((remaining[i][0], remaining[i][1]) for i in np.flatnonzero(is_affected))
+
+        return affected
+
+    def repair(
+        self, path_cache: PathCache, changes: dict, max_level: int = 1000, mode: str = None, processes: int = None
+    ):
+        """刪掉受影響的快取再重算，回傳重算的{(起點, 終點): (點序, 旅行時間)}，現在到不了的就不會再放回快取"""
+        cached_paths = path_cache.items()
+        affected = self.affected(cached_paths, changes)
+        for p1, p2 in affected:
+            path_cache.discard(p1, p2)
+        print('完成受影響路徑判斷...(快取路徑數: {}, 受影響: {})'.format(len(cached_paths), len(affected)))
+
+        if len(affected) == 0:
+            return {}
+        solver = SectionSolver(self.graph, self.hierarchy, self.landmarks, path_cache)
+        return solver.solve(sorted(affected), max_level, mode, processes)
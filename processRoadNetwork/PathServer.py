@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+
+import json
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from processRoadNetwork.BoxPathFinder import BoxPathFinder
+from processRoadNetwork.LatLonToTWD97 import LatLonToTWD97
+from processRoadNetwork.NodeIndex import NodeIndex
+from processRoadNetwork.ShortestPath import ShortestPath
+
+
+class _Job(object):
+    """交給搜尋執行緒的一件工作，handler等done之後拿result"""
+
+    def __init__(self, kind: str, args: tuple):
+        self.kind = kind
+        self.args = args
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128 #預設只有5，很多程式同時連會被拒絕
+
+
+class PathServer(object):
+    """
+    常駐在本機的路徑查詢服務，路網、CH、路徑快取、KD-tree只讀一次，給find_path、find_section、check_node_error共用\n
+    用localhost的HTTP收JSON，POST的路徑與內容：\n
+    /paths: {"sections": [[起點, 終點], ...], "max_level", "mode"} -> {"paths": [[點序, 旅行時間], ...]}\n
+    /waypoint: {"waypoints", "max_level", "mode"} -> {"path", "leg_costs"}\n
+    /k_shortest: {"OD_node", "k", "max_level", "max_stretch"} -> {"paths": [[點序, 旅行時間], ...]}\n
+    /box_path: {"OD_node"} -> {"path", "found"}，跟BoxPathFinder.find_path一樣\n
+    /nearest: {"x", "y", "k"} 或 {"lon", "lat", "k"} -> {"nodes", "distances"}\n
+    /links: {"links": [[起點, 終點], ...]} -> {"costs": [旅行時間或null, ...]}\n
+    /save: 把路徑快取寫回硬碟；GET /status回傳路網大小與快取路徑數\n
+    搜尋都在同一個執行緒做：同時進來的/paths會等batch_window秒收集起來，重複的區間只找一次，
+    同一個起點與mode的區間一起交給ShortestPath.find_paths_from，'ch'與'a_star'會合併成一次搜尋
+    """
+
+    def __init__(
+        self, path_finder: ShortestPath, host: str = '127.0.0.1', port: int = 8765, batch_window: float = 0.005
+    ):
+        self.path_finder = path_finder
+        self.graph = path_finder.graph
+        self.node_index = NodeIndex.from_graph(self.graph)
+        self.box_finder = BoxPathFinder(self.graph)
+        self.batch_window = batch_window
+        self._jobs = queue.Queue()
+        self._httpd = _HTTPServer((host, port), self._handler_class())
+        self._solver = threading.Thread(target=self._solve_loop, daemon=True)
+
+    @property
+    def address(self):
+        return self._httpd.server_address
+
+    def serve_forever(self):
+        """開始服務，Ctrl+C結束時把路徑快取存檔"""
+        self._solver.start()
+        print('完成路徑查詢服務啟動...(http://{}:{})'.format(*self.address))
+        try:
+            self._httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._httpd.server_close()
+            self.save_cache()
+
+    def shutdown(self):
+        """給其他執行緒呼叫，讓serve_forever結束"""
+        self._httpd.shutdown()
+
+    def save_cache(self):
+        """把路徑快取寫回硬碟，搜尋執行緒還在跑就交給它做，才不會跟搜尋同時改快取"""
+        if self.path_finder.path_cache is None:
+            return
+        if self._solver.is_alive():
+            self._submit('call', (self.path_finder.path_cache.save,))
+        else:
+            self.path_finder.path_cache.save()
+
+    def _submit(self, kind: str, args: tuple):
+        """把工作排進搜尋執行緒，等它做完"""
+        job = _Job(kind, args)
+        self._jobs.put(job)
+        job.done.wait()
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def _solve_loop(self):
+        while True:
+            jobs = [self._jobs.get()]
+            # 等一下，讓同時送出的查詢一起處理
+            if self.batch_window > 0:
+                time.sleep(self.batch_window)
+            while True:
+                try:
+                    jobs.append(self._jobs.get_nowait())
+                except queue.Empty:
+                    break
+
+            self._solve_sections([job for job in jobs if job.kind == 'sections'])
+            for job in jobs:
+                if job.kind == 'call':
+                    try:
+                        func, *args = job.args
+                        job.result = func(*args)
+                    except Exception as e:
+                        job.error = e
+                    job.done.set()
+
+    def _solve_sections(self, jobs: list):
+        """所有/paths的區間依(max_level, mode)分組，同一組裡同一個起點的終點一起找"""
+        groups = {}
+        for job in jobs:
+            sections, max_level, mode = job.args
+            todo = groups.setdefault((max_level, mode), {})
+            for p1, p2 in sections:
+                todo.setdefault(p1, set()).add(p2)
+
+        found = {}
+        error = None
+        for (max_level, mode), todo in groups.items():
+            try:
+                for origin, destinations in todo.items():
+                    for destination, result in self.path_finder.find_paths_from(
+                        origin, sorted(destinations), max_level, mode
+                    ).items():
+                        found[(max_level, mode, origin, destination)] = result
+            except Exception as e:
+                error = e
+        for job in jobs:
+            sections, max_level, mode = job.args
+            try:
+                job.result = [found[(max_level, mode, p1, p2)] for p1, p2 in sections]
+            except KeyError:
+                job.error = error if error is not None else KeyError('區間沒有算出來')
+            job.done.set()
+
+    def find_paths(self, sections: list, max_level: int = 1000, mode: str = None):
+        """回傳每個區間的(點序, 旅行時間)，起終點相同的是([起點], 0)"""
+        sections = [(int(p1), int(p2)) for p1, p2 in sections]
+        todo = [(p1, p2) for p1, p2 in sections if p1 != p2]
+        if len(todo) > 0:
+            self.path_finder.get_mode(mode) #先確認mode，不要在搜尋執行緒出錯
+            found = dict(zip(todo, self._submit('sections', (todo, max_level, mode))))
+        else:
+            found = {}
+        return [found[(p1, p2)] if p1 != p2 else ([p1], 0) for p1, p2 in sections]
+
+    def find_waypoint_path(self, waypoints: list, max_level: int = 1000, mode: str = None):
+        """跟ShortestPath.find_waypoint_path一樣，各段一起送進批次"""
+        waypoints = [int(n) for n in waypoints]
+        if len(waypoints) == 0:
+            return [], []
+        path = [waypoints[0]]
+        leg_costs = []
+        for leg_path, leg_cost in self.find_paths(list(zip(waypoints, waypoints[1:])), max_level, mode):
+            if len(leg_path) == 0:
+                return [], []
+            path.extend(leg_path[1:])
+            leg_costs.append(leg_cost)
+        return path, leg_costs
+
+    def nearest(self, x: list, y: list, k: int = 1):
+        nodes, dist = self.node_index.query(x, y, k)
+        return nodes.tolist(), [[d if d != float('inf') else None for d in row] for row in dist.tolist()]
+
+    def link_costs(self, links: list):
+        return [self.graph.link_cost(int(p1), int(p2)) for p1, p2 in links]
+
+    def status(self):
+        """快取第一次用到才讀檔，搜尋執行緒也會改它，所以跟存檔一樣交給搜尋執行緒做"""
+        if self._solver.is_alive():
+            return self._submit('call', (self._status,))
+        return self._status()
+
+    def _status(self):
+        path_cache = self.path_finder.path_cache
+        return {
+            'num_nodes': self.graph.num_nodes, 'num_links': self.graph.num_links,
+            'cached_paths': len(path_cache) if path_cache is not None else 0,
+        }
+
+    def handle(self, route: str, body: dict):
+        """依路徑處理一個請求，回傳要轉成JSON的dict；沒有這個路徑回傳None"""
+        if route == '/status':
+            return self.status()
+        if route == '/paths':
+            return {'paths': self.find_paths(body['sections'], body.get('max_level', 1000), body.get('mode'))}
+        if route == '/waypoint':
+            path, leg_costs = self.find_waypoint_path(body['waypoints'], body.get('max_level', 1000), body.get('mode'))
+            return {'path': path, 'leg_costs': leg_costs}
+        if route == '/k_shortest':
+            paths = self._submit('call', (
+                self.path_finder.k_shortest_paths, [int(n) for n in body['OD_node']], body.get('k', 3),
+                body.get('max_level', 1000), body.get('max_stretch', 2.0)
+            ))
+            return {'paths': paths}
+        if route == '/box_path':
+            path, found = self._submit('call', (self.box_finder.find_path, [int(n) for n in body['OD_node']]))
+            return {'path': path, 'found': found}
+        if route == '/nearest':
+            if 'lon' in body:
+                x, y = LatLonToTWD97().convert_many(np.radians(body['lat']), np.radians(body['lon']))
+            else:
+                x, y = body['x'], body['y']
+            nodes, distances = self.nearest(x, y, body.get('k', 1))
+            return {'nodes': nodes, 'distances': distances}
+        if route == '/links':
+            return {'costs': self.link_costs(body['links'])}
+        if route == '/save':
+            self.save_cache()
+            return {'saved': True}
+        return None
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self._respond({})
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                try:
+                    body = json.loads(self.rfile.read(length).decode('utf-8')) if length > 0 else {}
+                except ValueError as e:
+                    self._send(400, {'error': str(e)})
+                    return
+                self._respond(body)
+
+            def _respond(self, body: dict):
+                try:
+                    result = server.handle(self.path, body)
+                except (KeyError, TypeError, ValueError) as e:
+                    self._send(400, {'error': '{}: {}'.format(type(e).__name__, e)})
+                except Exception as e:
+                    self._send(500, {'error': '{}: {}'.format(type(e).__name__, e)})
+                else:
+                    if result is None:
+                        self._send(404, {'error': '沒有這個功能: {}'.format(self.path)})
+                    else:
+                        self._send(200, result)
+
+            def _send(self, code: int, result: dict):
+                # numpy的數字轉成一般的int、float
+                data = json.dumps(result, ensure_ascii=False, default=lambda o: o.item()).encode('utf-8')
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass #不要每個請求都印一行
+
+        return Handler
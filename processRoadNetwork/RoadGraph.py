@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import os
+from heapq import heappop, heappush
+
+import numpy as np
+
+
+class RoadGraph(object):
+    """
+    以CSR(compressed sparse row)格式儲存的路網\n
+    點號(N)對應到0 ~ num_nodes-1的連續索引，點i的相鄰節線為targets[offsets[i]:offsets[i+1]]\n
+    weights與targets對齊，存節線的旅行時間；lengths(可有可無)也與targets對齊，存節線長度\n
+    component是每個點所屬的強連通塊編號，第一次用到時才計算\n
+    點號夠密集時用node_lookup陣列(點號 -> 索引)查索引，不然用node_index字典\n
+    用load讀進來的路網是唯讀的memory map，pickle給子程序時只傳存檔路徑，子程序自己map同一個檔案，不會多佔記憶體
+    """
+
+    file_version = 2
+
+    def __init__(
+        self, node_ids, x, y, offsets, targets, weights, node_index: dict = None, lengths=None,
+        lon=None, lat=None, node_lookup=None
+    ):
+        self.node_ids = node_ids #索引 -> 點號
+        self.x = x #TWD97座標
+        self.y = y
+        self.lon = lon #經緯度(度)，可有可無
+        self.lat = lat
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+        self.lengths = lengths
+        if node_index is None and node_lookup is None:
+            node_lookup = RoadGraph.dense_lookup(node_ids)
+            if node_lookup is None:
+                node_index = {int(n): i for i, n in enumerate(node_ids.tolist())}
+        self.node_index = node_index #點號 -> 索引
+        self.node_lookup = node_lookup
+        self._lookup = memoryview(node_lookup) if node_lookup is not None else None
+        self.graph_path = None #memory map的存檔路徑
+        self._reverse = None
+        self._component = None
+        self._component_dag = None
+
+    @staticmethod
+    def dense_lookup(node_ids, max_ratio: int = 4):
+        """點號的最大值不超過點數的max_ratio倍時，回傳點號 -> 索引的陣列(沒有的是-1)，不然回傳None"""
+        if len(node_ids) == 0 or int(node_ids.min()) < 0 or int(node_ids.max()) >= max_ratio * len(node_ids) + 1024:
+            return None
+        node_lookup = np.full(int(node_ids.max()) + 1, -1, dtype=np.int32)
+        node_lookup[node_ids] = np.arange(len(node_ids), dtype=np.int32)
+        return node_lookup
+
+    @classmethod
+    def from_dicts(cls, node_dict: dict, road_dict: dict, length_dict: dict = None):
+        """用ImportNetwork讀出來的node_dict與road_dict建立路網，兩端點不在node_dict內的節線會被略過"""
+        node_ids = np.array(sorted(node_dict), dtype=np.int64)
+        coord = np.array([node_dict[n] for n in node_ids.tolist()], dtype=np.float64).reshape(-1, 2)
+        node_index = {n: i for i, n in enumerate(node_ids.tolist())}
+
+        source, target, weight, length = [], [], [], []
+        for (p1, p2), travel_time in road_dict.items():
+            if p1 in node_index and p2 in node_index:
+                source.append(node_index[p1])
+                target.append(node_index[p2])
+                weight.append(travel_time)
+                if length_dict is not None:
+                    length.append(length_dict[(p1, p2)])
+
+        return cls.from_arrays(
+            node_ids, coord[:, 0], coord[:, 1],
+            np.array(source, dtype=np.int32), np.array(target, dtype=np.int32),
+            np.array(weight, dtype=np.float64), length=np.array(length, dtype=np.float64) if length_dict is not None else None
+        )
+
+    @classmethod
+    def from_arrays(
+        cls, node_ids, x, y, source, target, weight, node_index: dict = None, length=None, lon=None, lat=None,
+        node_lookup=None
+    ):
+        """用節線的起點、終點索引陣列建立路網"""
+        order = np.argsort(source, kind='stable')
+        offsets = np.zeros(len(node_ids) + 1, dtype=np.int32)
+        np.cumsum(np.bincount(source, minlength=len(node_ids)), out=offsets[1:])
+        return cls(
+            node_ids, x, y, offsets,
+            np.ascontiguousarray(target[order], dtype=np.int32),
+            np.ascontiguousarray(weight[order], dtype=np.float64),
+            node_index,
+            np.ascontiguousarray(length[order], dtype=np.float64) if length is not None else None,
+            lon, lat, node_lookup
+        )
+
+    @property
+    def num_nodes(self):
+        return len(self.node_ids)
+
+    @property
+    def num_links(self):
+        return len(self.targets)
+
+    def signature(self):
+        """路網的雜湊值，預處理的存檔用這個判斷路網有沒有改過"""
+        sha = hashlib.sha1()
+        for a in (self.node_ids, self.offsets, self.targets, self.weights):
+            sha.update(np.ascontiguousarray(a).tobytes())
+        return sha.hexdigest()
+
+    def save(self, graph_path: str, **source: str):
+        """
+        把路網存成資料夾，每個陣列一個.npy檔，給load用memory map讀\n
+        source是讀取條件與原始檔的記錄，寫在meta.json裡，讀檔時拿來比對；meta.json最後才寫，存到一半的不會被讀到
+        """
+        reverse = self.reverse()
+        arrays = {
+            'node_ids': self.node_ids, 'x': self.x, 'y': self.y, 'lon': self.lon, 'lat': self.lat,
+            'node_lookup': self.node_lookup,
+            'offsets': self.offsets, 'targets': self.targets, 'weights': self.weights, 'lengths': self.lengths,
+            'reverse_offsets': reverse.offsets, 'reverse_targets': reverse.targets,
+            'reverse_weights': reverse.weights, 'reverse_lengths': reverse.lengths,
+            'component': self.component,
+        }
+        arrays = {name: a for name, a in arrays.items() if a is not None}
+
+        os.makedirs(graph_path, exist_ok=True)
+        meta_path = os.path.join(graph_path, 'meta.json')
+        if os.path.isfile(meta_path):
+            os.remove(meta_path)
+        for name, a in arrays.items():
+            np.save(os.path.join(graph_path, '{}.npy'.format(name)), np.ascontiguousarray(a))
+        with open(meta_path, 'w', encoding='utf-8') as meta_file:
+            json.dump({'version': self.file_version, 'arrays': list(arrays), 'source': source}, meta_file)
+        print('完成路網存檔...')
+
+    @classmethod
+    def load(cls, graph_path: str, mmap: bool = True, **source: str):
+        """讀取路網存檔，mmap是True時用唯讀的memory map；存檔不存在、版本不同或source有一項對不上就回傳None"""
+        meta_path = os.path.join(graph_path, 'meta.json')
+        if not os.path.isfile(meta_path):
+            return None
+        with open(meta_path, encoding='utf-8') as meta_file:
+            meta = json.load(meta_file)
+        if meta.get('version') != cls.file_version:
+            return None
+        for key, value in source.items():
+            if meta['source'].get(key) != value:
+                return None
+
+        data = {
+            name: np.load(os.path.join(graph_path, '{}.npy'.format(name)), mmap_mode='r' if mmap else None)
+            for name in meta['arrays']
+        }
+        road_graph = cls(
+            data['node_ids'], data['x'], data['y'], data['offsets'], data['targets'], data['weights'],
+            lengths=data.get('lengths'), lon=data.get('lon'), lat=data.get('lat'), node_lookup=data.get('node_lookup')
+        )
+        road_graph._component = data['component']
+        road_graph._reverse = cls(
+            road_graph.node_ids, road_graph.x, road_graph.y,
+            data['reverse_offsets'], data['reverse_targets'], data['reverse_weights'], road_graph.node_index,
+            data.get('reverse_lengths'), road_graph.lon, road_graph.lat, road_graph.node_lookup
+        )
+        road_graph._reverse._reverse = road_graph
+        if mmap:
+            road_graph.graph_path = graph_path
+        return road_graph
+
+    def __getstate__(self):
+        # memory map的路網只傳路徑，子程序自己map同一個檔案
+        if self.graph_path is not None:
+            return {'graph_path': self.graph_path}
+        state = self.__dict__.copy()
+        state['_lookup'] = None
+        return state
+
+    def __setstate__(self, state):
+        if 'graph_path' in state and len(state) == 1:
+            road_graph = RoadGraph.load(state['graph_path'])
+            if road_graph is None:
+                raise OSError('路網存檔不見了: {}'.format(state['graph_path']))
+            state = road_graph.__dict__
+        self.__dict__.update(state)
+        self._lookup = memoryview(self.node_lookup) if self.node_lookup is not None else None
+
+    def reverse(self):
+        """回傳把所有節線反過來的路網，給反向搜尋用；DIR的單行限制在建立節線時就已經處理好了"""
+        if self._reverse is None:
+            source = np.repeat(np.arange(self.num_nodes, dtype=np.int32), np.diff(self.offsets))
+            self._reverse = RoadGraph.from_arrays(
+                self.node_ids, self.x, self.y, self.targets, source, self.weights, self.node_index, self.lengths,
+                self.lon, self.lat, self.node_lookup
+            )
+            self._reverse._reverse = self
+        return self._reverse
+
+    def subgraph(self, index_array):
+        """只留index_array裡的點與兩端都在裡面的節線，回傳新的路網"""
+        index_array = np.asarray(index_array, dtype=np.int64)
+        local = np.full(self.num_nodes, -1, dtype=np.int32)
+        local[index_array] = np.arange(len(index_array), dtype=np.int32)
+        source = local[np.repeat(np.arange(self.num_nodes, dtype=np.int32), np.diff(self.offsets))]
+        target = local[self.targets]
+        keep = (source >= 0) & (target >= 0)
+        return RoadGraph.from_arrays(
+            self.node_ids[index_array], self.x[index_array], self.y[index_array],
+            source[keep], target[keep], self.weights[keep], None,
+            self.lengths[keep] if self.lengths is not None else None,
+            self.lon[index_array] if self.lon is not None else None,
+            self.lat[index_array] if self.lat is not None else None
+        )
+
+    def distances_from(self, source: int, limit: float = float('inf')):
+        """從索引source跑Dijkstra，回傳到每個點的旅行時間，到不了或超過limit的是inf"""
+        offsets, targets, weights = memoryview(self.offsets), memoryview(self.targets), memoryview(self.weights)
+        dist = [float('inf')] * self.num_nodes
+        dist[source] = 0
+        heap = [(0, source)]
+        while heap:
+            d, u = heappop(heap)
+            if d > dist[u]:
+                continue
+            for k in range(offsets[u], offsets[u + 1]):
+                v = targets[k]
+                nd = d + weights[k]
+                if nd < dist[v] and nd <= limit:
+                    dist[v] = nd
+                    heappush(heap, (nd, v))
+        return np.array(dist, dtype=np.float64)
+
+    @property
+    def component(self):
+        if self._component is None:
+            self._component = self.strong_components()
+        return self._component
+
+    def strong_components(self):
+        """
+        非遞迴的Tarjan演算法，回傳每個點的強連通塊編號\n
+        Tarjan先完成的連通塊編號比較小，所以有節線從連通塊A連到B(A != B)時一定是編號A > 編號B
+        """
+        offsets, targets = self.offsets.tolist(), self.targets.tolist()
+        num_nodes = self.num_nodes
+        order = [-1] * num_nodes #拜訪順序
+        low = [0] * num_nodes
+        component = [-1] * num_nodes
+        stack = []
+        num_component = 0
+        counter = 0
+        for root in range(num_nodes):
+            if order[root] >= 0:
+                continue
+            # call stack存(點, 下一條要看的節線)
+            call_stack = [(root, offsets[root])]
+            order[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            while call_stack:
+                u, k = call_stack[-1]
+                if k < offsets[u + 1]:
+                    call_stack[-1] = (u, k + 1)
+                    v = targets[k]
+                    if order[v] < 0:
+                        order[v] = low[v] = counter
+                        counter += 1
+                        stack.append(v)
+                        call_stack.append((v, offsets[v]))
+                    elif component[v] < 0 and order[v] < low[u]:
+                        low[u] = order[v]
+                    continue
+                call_stack.pop()
+                if call_stack and low[u] < low[call_stack[-1][0]]:
+                    low[call_stack[-1][0]] = low[u]
+                if low[u] == order[u]:
+                    while True:
+                        v = stack.pop()
+                        component[v] = num_component
+                        if v == u:
+                            break
+                    num_component += 1
+        return np.array(component, dtype=np.int32)
+
+    def reachable(self, p1: int, p2: int):
+        """
+        p1能不能走到p2，點號不在路網內就是False\n
+        同一個強連通塊一定到得了，編號比較小的連通塊一定到不了別的大編號連通塊，其他情況才在連通塊的DAG上找
+        """
+        i, j = self.index(p1), self.index(p2)
+        if i < 0 or j < 0:
+            return False
+        component = self.component
+        c1, c2 = int(component[i]), int(component[j])
+        if c1 == c2:
+            return True
+        if c1 < c2:
+            return False
+
+        if self._component_dag is None:
+            source = np.repeat(component, np.diff(self.offsets))
+            target = component[self.targets]
+            cross = source != target
+            dag = {}
+            for a, b in set(zip(source[cross].tolist(), target[cross].tolist())):
+                dag.setdefault(a, []).append(b)
+            self._component_dag = dag
+        # 只往編號比c2大的連通塊走
+        visited = {c1}
+        stack = [c1]
+        while stack:
+            for c in self._component_dag.get(stack.pop(), []):
+                if c == c2:
+                    return True
+                if c > c2 and c not in visited:
+                    visited.add(c)
+                    stack.append(c)
+        return False
+
+    def __contains__(self, node: int):
+        return self.index(node) >= 0
+
+    def index(self, node: int):
+        """點號轉索引，不在路網內回傳-1"""
+        if self._lookup is not None:
+            return self._lookup[node] if 0 <= node < len(self._lookup) else -1
+        return self.node_index.get(node, -1)
+
+    def link_cost(self, p1: int, p2: int):
+        """回傳p1 -> p2節線的旅行時間，沒有這條節線就回傳None"""
+        i = self.index(p1)
+        j = self.index(p2)
+        if i < 0 or j < 0:
+            return None
+        st, ed = self.offsets[i], self.offsets[i + 1]
+        found = np.flatnonzero(self.targets[st:ed] == j)
+        if len(found) == 0:
+            return None
+        return float(self.weights[st + found[0]])
+
+    def has_link(self, p1: int, p2: int):
+        """確認p1 -> p2是不是路網內的節線"""
+        return self.link_cost(p1, p2) is not None
+
+    def coord(self, node: int):
+        """回傳點號的TWD97座標"""
+        i = self.index(node)
+        if i < 0:
+            raise KeyError(node)
+        return float(self.x[i]), float(self.y[i])
+
+    def to_node_ids(self, index_list: list):
+        """索引序列轉回點號序列"""
+        node_ids = self.node_ids
+        return [int(node_ids[i]) for i in index_list]
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+import os
+from typing import List
+
+from processRoadNetwork.SectionSolver import SectionSolver
+
+
+class RouteAssembler(object):
+    """
+    一次把整條路線(或很多條路線)的站序串成最終結果的格式：站牌點號用正值，通過的節點用負值\n
+    checked_path_dir裡有'{起點}_{終點}.txt'的區間用已確認的路徑，整個資料夾只列一次\n
+    其他區間全部收集起來交給SectionSolver一次找完(快取也在那邊查)，沒有solver就當作失敗
+    """
+
+    def __init__(self, solver: SectionSolver = None, checked_path_dir: str = None):
+        self.solver = solver
+        self.checked_path_dir = checked_path_dir
+
+    def load_checked(self, sections):
+        """讀取已確認的區間路徑，回傳{(起點, 終點): 點序}，點序取絕對值"""
+        if self.checked_path_dir is None or not os.path.isdir(self.checked_path_dir):
+            return {}
+        saved = set(os.listdir(self.checked_path_dir))
+        checked = {}
+        for p1, p2 in sections:
+            path_filename = '{}_{}.txt'.format(p1, p2)
+            if path_filename in saved:
+                with open(os.path.join(self.checked_path_dir, path_filename), 'r') as path_file:
+                    checked[(p1, p2)] = [abs(int(n)) for n in path_file.read().split(',')]
+        return checked
+
+    def section_paths(self, node_lists: List[List[int]], max_level: int = 1000, mode: str = None, processes: int = None):
+        """所有路線用到的區間，回傳{(起點, 終點): 點序}，找不到的區間不會出現"""
+        sections = set()
+        for node_list in node_lists:
+            sections.update(
+                (p1, p2) for p1, p2 in zip(node_list, node_list[1:]) if p1 != p2 and p1 != 0 and p2 != 0
+            )
+        section_path = self.load_checked(sections)
+
+        todo = sorted(sections.difference(section_path))
+        if self.solver is not None and len(todo) > 0:
+            for OD_node, (path, _) in self.solver.solve(todo, max_level, mode, processes).items():
+                if len(path) > 0:
+                    section_path[OD_node] = path
+        print('完成區間路徑整理...(區間數: {}, 已確認: {}, 找不到: {})'.format(
+            len(sections), len(sections) - len(todo), len(sections) - len(section_path)
+        ))
+        return section_path
+
+    @staticmethod
+    def join_sections(node_list: List[int], section_path: dict):
+        """
+        把區間路徑接成整條路線，回傳(路線, 失敗的區間)\n
+        跟combine_section一樣，遇到第一個失敗的區間之後就不再接下去
+        """
+        bus_route = []
+        failed = []
+        for OD_node in zip(node_list, node_list[1:]):
+            if OD_node[0] == OD_node[1]:
+                continue
+            path = section_path.get(OD_node)
+            if path is None:
+                failed.append(OD_node)
+                continue
+            if len(failed) > 0:
+                continue
+            if len(bus_route) == 0:
+                bus_route.append(path[0])
+            #通過節點用負值加入
+            bus_route.extend([-n for n in path[1:-1]])
+            if bus_route[-1] != path[-1]:
+                bus_route.append(path[-1])
+        return bus_route, failed
+
+    def assemble(self, node_list: List[int], max_level: int = 1000, mode: str = None, processes: int = None):
+        """一條路線的TargetID序列，回傳(路線, 失敗的區間)"""
+        return self.assemble_routes([node_list], max_level, mode, processes)[0]
+
+    def assemble_routes(
+        self, node_lists: List[List[int]], max_level: int = 1000, mode: str = None, processes: int = None
+    ):
+        """很多條路線一起處理，區間只找一次，回傳[(路線, 失敗的區間)]"""
+        section_path = self.section_paths(node_lists, max_level, mode, processes)
+        return [self.join_sections(node_list, section_path) for node_list in node_lists]
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import json
+import os
+
+
+class SearchStats(object):
+    """
+    記錄每次最短路徑搜尋的統計，給ShortestPath的stats參數用\n
+    Expanded: 展開的點數，Relaxed: 檢查過的節線數，PeakOpen: open list最大的長度\n
+    WallTime: 花的秒數，HitMaxLevel: 是不是展開到max_level還沒找到
+    """
+
+    fields = ('Origin', 'Destination', 'Mode', 'Found', 'Expanded', 'Relaxed', 'PeakOpen', 'WallTime', 'HitMaxLevel')
+
+    def __init__(self):
+        self.records = []
+
+    def record(
+        self, origin: int, destination, mode: str, found: bool, expanded: int, relaxed: int, peak_open: int,
+        wall_time: float, hit_max_level: bool
+    ):
+        """一個起點對多個終點的搜尋，destination是用/串起來的終點"""
+        self.records.append((
+            origin, destination, mode, found, expanded, relaxed, peak_open, wall_time, hit_max_level
+        ))
+
+    def extend(self, records: list):
+        """把子程序裡記的統計併進來"""
+        self.records.extend(records)
+
+    def pop_records(self):
+        """取出目前的記錄並清空，子程序每做完一個工作就交回去"""
+        records, self.records = self.records, []
+        return records
+
+    def __len__(self):
+        return len(self.records)
+
+    def slowest(self, n: int = 10):
+        """花最久的n次搜尋，回傳[{欄位: 值}]"""
+        records = sorted(self.records, key=lambda r: r[7], reverse=True)[:n]
+        return [dict(zip(self.fields, r)) for r in records]
+
+    def slowest_report(self, n: int = 10):
+        """花最久的n次搜尋，整理成一行一筆的文字"""
+        lines = ['花最久的{}次搜尋：'.format(min(n, len(self.records)))]
+        for r in self.slowest(n):
+            lines.append(
+                ' {Origin} -> {Destination}  ({Mode}, {WallTime:.3f}秒, 展開{Expanded}點, 節線{Relaxed}條, '
+                'open list最多{PeakOpen}筆{max_level})'.format(
+                    max_level=', 到max_level還沒找到' if r['HitMaxLevel'] else '', **r
+                )
+            )
+        return lines
+
+    def summary(self):
+        """整批搜尋的合計"""
+        num_queries = len(self.records)
+        total_time = sum(r[7] for r in self.records)
+        return {
+            'Queries': num_queries,
+            'NotFound': sum(1 for r in self.records if not r[3]),
+            'HitMaxLevel': sum(1 for r in self.records if r[8]),
+            'Expanded': sum(r[4] for r in self.records),
+            'Relaxed': sum(r[5] for r in self.records),
+            'PeakOpen': max((r[6] for r in self.records), default=0),
+            'WallTime': total_time,
+            'MeanWallTime': total_time / num_queries if num_queries > 0 else 0,
+        }
+
+    def save(self, stats_path: str):
+        """副檔名是.json就連合計一起存成JSON，不然存成CSV"""
+        if os.path.splitext(stats_path)[1].lower() == '.json':
+            with open(stats_path, 'w', encoding='utf-8') as stats_file:
+                json.dump(
+                    {'summary': self.summary(), 'queries': [dict(zip(self.fields, r)) for r in self.records]},
+                    stats_file, ensure_ascii=False, indent=1
+                )
+        else:
+            with open(stats_path, 'w', newline='', encoding='utf-8') as stats_file:
+                writer = csv.writer(stats_file)
+                writer.writerow(self.fields)
+                writer.writerows(self.records)
+        print('完成搜尋統計輸出...(搜尋次數: {})'.format(len(self.records)))
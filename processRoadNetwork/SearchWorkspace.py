@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+
+class SearchWorkspace(object):
+    """
+    一次搜尋用到的陣列，配置一次之後每次查詢重複使用\n
+    g、parent只有在seen[i] == generation時才有效，closed[i] == generation表示這次已經展開過，
+    所以reset只要把generation加一、清空heap，不用把陣列歸零\n
+    bound、scratch是算heuristic用的numpy陣列，每次查詢直接覆寫
+    """
+
+    max_generation = 2 ** 31 - 1
+
+    def __init__(self, num_nodes: int):
+        self.num_nodes = num_nodes
+        # 用list而不是numpy陣列，逐一讀寫比較快
+        self.g = [0.0] * num_nodes
+        self.parent = [-1] * num_nodes
+        self.seen = [0] * num_nodes
+        self.closed = [0] * num_nodes
+        self.heap = []
+        self.generation = 0
+        self.bound = np.zeros(num_nodes, dtype=np.float64)
+        self.scratch = np.zeros(num_nodes, dtype=np.float64)
+
+    def reset(self):
+        """開始新的一次搜尋，回傳這次的generation"""
+        self.heap.clear()
+        self.generation += 1
+        if self.generation > self.max_generation:
+            self.seen = [0] * self.num_nodes
+            self.closed = [0] * self.num_nodes
+            self.generation = 1
+        return self.generation
+
+    def visit(self, node: int, g: float, parent: int):
+        """記錄起點的g與parent"""
+        self.g[node] = g
+        self.parent[node] = parent
+        self.seen[node] = self.generation
+
+    def path_to(self, node: int):
+        """沿著parent走回-1，回傳由node往回的索引序列"""
+        parent = self.parent
+        path = []
+        while node != -1:
+            path.append(node)
+            node = parent[node]
+        return path
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+from multiprocessing import get_context
+from typing import List, Tuple
+
+from processRoadNetwork.ContractionHierarchy import ContractionHierarchy
+from processRoadNetwork.Landmarks import Landmarks
+from processRoadNetwork.PathCache import PathCache
+from processRoadNetwork.RoadGraph import RoadGraph
+from processRoadNetwork.SearchStats import SearchStats
+from processRoadNetwork.ShortestPath import ShortestPath
+
+_worker_finder = None
+
+
+def _init_worker(graph: RoadGraph, hierarchy: ContractionHierarchy, landmarks: Landmarks, collect_stats: bool):
+    """每個子程序只收一次路網，自己建一個ShortestPath"""
+    global _worker_finder
+    _worker_finder = ShortestPath(graph, hierarchy, landmarks, stats=SearchStats() if collect_stats else None)
+
+
+def _solve_origin(task):
+    """子程序裡把同一個起點的區間一次找完，搜尋統計跟結果一起交回去"""
+    origin, destinations, max_level, mode = task
+    paths = _worker_finder.find_paths_from(origin, destinations, max_level, mode)
+    records = _worker_finder.stats.pop_records() if _worker_finder.stats is not None else []
+    return origin, paths, records
+
+
+class SectionSolver(object):
+    """
+    不開QGIS，一次把很多站間區間的最短路徑找完\n
+    重複的區間只找一次，同一個起點的區間合併成一次搜尋，再分給多個程序平行處理\n
+    有stats時各程序的搜尋統計會收集回來
+    """
+
+    def __init__(
+        self, graph: RoadGraph, hierarchy: ContractionHierarchy = None, landmarks: Landmarks = None,
+        path_cache: PathCache = None, stats: SearchStats = None
+    ):
+        self.graph = graph
+        self.hierarchy = hierarchy
+        self.landmarks = landmarks
+        self.path_cache = path_cache
+        self.stats = stats
+
+    def solve(
+        self, sections: List[Tuple[int, int]], max_level: int = 1000, mode: str = None, processes: int = None,
+        start_method: str = None
+    ):
+        """
+        sections: [(起點, 終點)]，回傳{(起點, 終點): (點序, 旅行時間)}，找不到的是([], 1e10)\n
+        processes: 平行的程序數，None用全部CPU，1就不開子程序\n
+        start_method: 子程序的啟動方式，None用作業系統預設(Windows是spawn，路網與CH都要能pickle)
+        """
+        ShortestPath(self.graph, self.hierarchy, self.landmarks).get_mode(mode) #先確認mode，不要等到子程序才出錯
+
+        result = {}
+        todo = {}
+        for p1, p2 in set(sections):
+            cached = self.path_cache.get(p1, p2) if self.path_cache is not None else None
+            if cached is not None:
+                result[(p1, p2)] = cached
+            else:
+                todo.setdefault(p1, []).append(p2)
+        tasks = [(origin, destinations, max_level, mode) for origin, destinations in todo.items()]
+
+        initargs = (self.graph, self.hierarchy, self.landmarks, self.stats is not None)
+        if processes == 1:
+            _init_worker(*initargs)
+            self._collect(map(_solve_origin, tasks), len(tasks), result)
+        else:
+            with get_context(start_method).Pool(processes, initializer=_init_worker, initargs=initargs) as pool:
+                found = pool.imap_unordered(_solve_origin, tasks, chunksize=max(1, len(tasks) // 256))
+                self._collect(found, len(tasks), result)
+
+        print('完成區間路徑計算...(區間數: {}, 快取: {})'.format(len(result), len(result) - sum(map(len, todo.values()))))
+        return result
+
+    def _collect(self, found, num_tasks: int, result: dict):
+        for i, (origin, paths, records) in enumerate(found):
+            if self.stats is not None:
+                self.stats.extend(records)
+            for destination, (path, distance) in paths.items():
+                result[(origin, destination)] = (path, distance)
+                if self.path_cache is not None:
+                    self.path_cache.put(origin, destination, path, distance)
+            print('\r[{:<50}] ({}/{})'.format('=' * int((i + 1) / (2 * num_tasks) * 100), i + 1, num_tasks), end='')
+        if num_tasks > 0:
+            print()
@@ -0,0 +1,630 @@
+# -*- coding: utf-8 -*-
+
+import threading
+from heapq import heappop, heappush
+from math import inf
+from time import perf_counter
+from typing import List
+
+import numpy as np
+
+from processRoadNetwork.ContractionHierarchy import ContractionHierarchy
+from processRoadNetwork.Landmarks import Landmarks
+from processRoadNetwork.PathCache import PathCache
+from processRoadNetwork.RoadGraph import RoadGraph
+from processRoadNetwork.SearchStats import SearchStats
+from processRoadNetwork.SearchWorkspace import SearchWorkspace
+
+
+class ShortestPath(object):
+    """
+    尋找最短路徑\n
+    mode = 'a_star': 從起點單向搜尋\n
+    mode = 'bidirectional': 起點往前、終點沿反向路網往回同時搜尋，適合跨縣市的長區間\n
+    mode = 'ch': 用預處理好的contraction hierarchy查詢，沒有max_level的限制\n
+    mode = 'weighted': heuristic乘上(1 + epsilon)的A*，找到的旅行時間保證 <= (1 + epsilon) * 最短，
+    不存進path_cache，last_lower_bound記錄最短旅行時間的下界\n
+    沒有指定mode時，有hierarchy就用'ch'，不然用'a_star'\n
+    有landmarks時，'a_star'與'bidirectional'改用ALT下界當heuristic\n
+    有path_cache時先查快取，新找到的路徑也會存進去\n
+    last_expansions、last_relaxed、last_peak_open記錄上一次搜尋展開的點數、檢查的節線數與open list最大長度\n
+    有stats時每次真的有搜尋的查詢都會記進去
+    """
+
+    search_modes = ('a_star', 'bidirectional', 'ch', 'weighted')
+
+    def __init__(
+        self, graph: RoadGraph, hierarchy: ContractionHierarchy = None, landmarks: Landmarks = None,
+        path_cache: PathCache = None, stats: SearchStats = None, epsilon: float = 0.1
+    ):
+        self.graph = graph
+        self.hierarchy = hierarchy
+        self.landmarks = landmarks
+        self.path_cache = path_cache
+        self.stats = stats
+        self.epsilon = epsilon
+        self.last_lower_bound = 0
+        self.last_expansions = 0
+        self.last_relaxed = 0
+        self.last_peak_open = 0
+        # 搜尋時直接讀memoryview，逐一取值比numpy陣列快
+        self._offsets = memoryview(graph.offsets)
+        self._targets = memoryview(graph.targets)
+        self._weights = memoryview(graph.weights)
+        self._reverse_arrays = None
+        # 每個執行緒各自的SearchWorkspace，連續查詢時不用重新配置
+        self._local = threading.local()
+
+    def get_mode(self, mode: str = None):
+        """確認搜尋模式，沒有指定就用預設的"""
+        if mode is None:
+            mode = 'a_star' if self.hierarchy is None else 'ch'
+        if mode not in self.search_modes:
+            raise ValueError('mode必須是{}其中之一'.format(', '.join(self.search_modes)))
+        if mode == 'ch' and self.hierarchy is None:
+            raise ValueError('沒有預處理好的contraction hierarchy')
+        return mode
+
+    def find_shortest_path(self, OD_node: List[int], max_level: int = 1000, mode: str = None):
+        mode = self.get_mode(mode)
+
+        p1 = OD_node[0]
+        p2 = OD_node[1]
+        # 兩點相鄰
+        link_cost = self.graph.link_cost(p1, p2)
+        if link_cost is not None:
+            self.last_lower_bound = link_cost
+            return [p1, p2], link_cost
+
+        # 強連通塊判斷到不了就不用搜尋
+        if self.graph.reachable(p1, p2):
+            if self.path_cache is not None:
+                cached = self.path_cache.get(p1, p2)
+                if cached is not None:
+                    self.last_lower_bound = cached[1]
+                    return cached
+            start_time = perf_counter()
+            if mode == 'ch':
+                path, distance = self.hierarchy.query(p1, p2)
+                self._copy_counters(self.hierarchy)
+            elif mode == 'bidirectional':
+                path, distance = self.bidirectional_alg(p1, p2, max_level)
+            elif mode == 'weighted':
+                path, distance, lower_bound = self.weighted_alg(p1, p2, max_level)
+            else:
+                path, distance = self.a_star_alg(p1, p2, max_level)
+            self._record(p1, p2, mode, len(path) > 0, perf_counter() - start_time, max_level)
+            if mode == 'weighted':
+                self.last_lower_bound = lower_bound
+                return path, distance # 不一定是最短的，不存進快取
+            self.last_lower_bound = distance
+            if self.path_cache is not None:
+                self.path_cache.put(p1, p2, path, distance)
+            return path, distance
+
+        self.last_lower_bound = 1e10
+        return [], 1e10
+
+    def find_paths_from(self, origin: int, destinations: List[int], max_level: int = 1000, mode: str = None):
+        """
+        一個起點對多個終點，回傳{終點: (點序, 旅行時間)}\n
+        mode = 'ch'時用hierarchy的query_many；'a_star'時是一次Dijkstra，所有終點都確定就停止，
+        終點都先確認過到得了，所以不受max_level限制，結果跟沒有限制的A*一樣是最短路徑；
+        超過max_level才確定的終點不存進快取，不然之後有max_level限制的find_shortest_path會拿到自己找不到的路徑\n
+        'bidirectional'與'weighted'沒有一對多的版本，每個終點各自用find_shortest_path找
+        """
+        mode = self.get_mode(mode)
+
+        result = {}
+        todo = []
+        for p2 in destinations:
+            # 兩點相鄰
+            link_cost = self.graph.link_cost(origin, p2)
+            if link_cost is not None:
+                result[p2] = ([origin, p2], link_cost)
+            elif self.graph.reachable(origin, p2):
+                cached = self.path_cache.get(origin, p2) if self.path_cache is not None else None
+                if cached is not None:
+                    result[p2] = cached
+                else:
+                    todo.append(p2)
+            else:
+                result[p2] = ([], 1e10)
+
+        if len(todo) > 0 and mode in ('bidirectional', 'weighted'):
+            for p2 in todo:
+                result[p2] = self.find_shortest_path([origin, p2], max_level, mode)
+        elif len(todo) > 0:
+            start_time = perf_counter()
+            cacheable = todo
+            if mode == 'ch':
+                result.update(self.hierarchy.query_many(origin, todo))
+                self._copy_counters(self.hierarchy)
+            else:
+                found, settled_level = self._one_to_many(self.graph.index(origin), {self.graph.index(p2) for p2 in todo})
+                for p2 in todo:
+                    path, distance = found[self.graph.index(p2)]
+                    result[p2] = (self.graph.to_node_ids(path), distance)
+                cacheable = [p2 for p2 in todo if settled_level.get(self.graph.index(p2), inf) <= max_level]
+            self._record(
+                origin, '/'.join(map(str, todo)), mode, all(len(result[p2][0]) > 0 for p2 in todo),
+                perf_counter() - start_time, max_level
+            )
+            if self.path_cache is not None:
+                for p2 in cacheable:
+                    self.path_cache.put(origin, p2, *result[p2])
+
+        return result
+
+    def find_waypoint_path(self, waypoints: List[int], max_level: int = 1000, mode: str = None):
+        """
+        依序經過waypoints(起點, 中間點..., 終點)的路徑，回傳(串起來的點序, 各段的旅行時間)\n
+        同一段重複出現只找一次，有任何一段找不到就回傳([], [])，last_lower_bound是各段下界的合計
+        """
+        mode = self.get_mode(mode)
+        if len(waypoints) == 0:
+            return [], []
+
+        path = [waypoints[0]]
+        leg_costs = []
+        leg_result = {}
+        lower_bound = 0
+        for p1, p2 in zip(waypoints, waypoints[1:]):
+            if p1 == p2:
+                leg_costs.append(0)
+                continue
+            if (p1, p2) not in leg_result:
+                leg_path, leg_cost = self.find_shortest_path([p1, p2], max_level, mode)
+                leg_result[(p1, p2)] = (leg_path, leg_cost, self.last_lower_bound)
+            leg_path, leg_cost, leg_lower_bound = leg_result[(p1, p2)]
+            if len(leg_path) == 0:
+                self.last_lower_bound = 1e10
+                return [], []
+            path.extend(leg_path[1:])
+            leg_costs.append(leg_cost)
+            lower_bound += leg_lower_bound
+
+        self.last_lower_bound = lower_bound
+        return path, leg_costs
+
+    def link_costs(self, links: List[tuple]):
+        """回傳每條節線的旅行時間，沒有這條節線是None"""
+        return [self.graph.link_cost(p1, p2) for p1, p2 in links]
+
+    def k_shortest_paths(self, OD_node: List[int], k: int = 3, max_level: int = 1000, max_stretch: float = 2.0):
+        """
+        Yen演算法找前k短、不繞圈的路徑，回傳依旅行時間排序的[(點序, 旅行時間)]\n
+        先從終點沿反向路網建一棵最短路徑樹，範圍是最短旅行時間的max_stretch倍，不受max_level限制\n
+        每次的spur搜尋都拿這棵樹：樹上的路徑沒被擋住就直接用，被擋住才跑A*，樹上的距離當heuristic，max_level是每次A*的展開次數上限
+        """
+        p1 = OD_node[0]
+        p2 = OD_node[1]
+        if not self.graph.reachable(p1, p2):
+            return []
+        paths = self._k_shortest(self.graph.index(p1), self.graph.index(p2), k, max_level, max_stretch)
+        return [(self.graph.to_node_ids(path), distance) for path, distance in paths]
+
+    def _set_counters(self, expanded: int, relaxed: int, peak_open: int):
+        self.last_expansions = expanded
+        self.last_relaxed = relaxed
+        self.last_peak_open = peak_open
+
+    def _copy_counters(self, searcher):
+        self._set_counters(searcher.last_expansions, searcher.last_relaxed, searcher.last_peak_open)
+
+    def _record(self, origin: int, destination, mode: str, found: bool, wall_time: float, max_level: int):
+        """把上一次搜尋的計數記到stats，'ch'沒有max_level的限制"""
+        if self.stats is None:
+            return
+        hit_max_level = not found and mode != 'ch' and self.last_expansions >= max_level
+        self.stats.record(
+            origin, destination, mode, found, self.last_expansions, self.last_relaxed, self.last_peak_open,
+            wall_time, hit_max_level
+        )
+
+    def a_star_alg(self, p1: int, p2: int, max_level: int = 1000):
+        """Returns a list of nodes as a path from the given start to the given end in the given road network"""
+        path, distance = self._a_star(self.graph.index(p1), self.graph.index(p2), max_level)
+        return self.graph.to_node_ids(path), distance
+
+    def weighted_alg(self, p1: int, p2: int, max_level: int = 1000, epsilon: float = None):
+        """
+        heuristic乘上(1 + epsilon)的A*，回傳(點序, 旅行時間, 最短旅行時間的下界)\n
+        找到終點時，open list裡 g + h 的最小值就是最短旅行時間的下界，旅行時間 <= (1 + epsilon) * 下界
+        """
+        if epsilon is None:
+            epsilon = self.epsilon
+        path, distance = self._a_star(self.graph.index(p1), self.graph.index(p2), max_level, 1 + epsilon)
+        return self.graph.to_node_ids(path), distance, self.last_lower_bound
+
+    def bidirectional_alg(self, p1: int, p2: int, max_level: int = 1000):
+        """雙向A*，max_level是兩個方向合計的展開次數"""
+        path, distance = self._bidirectional(self.graph.index(p1), self.graph.index(p2), max_level)
+        return self.graph.to_node_ids(path), distance
+
+    def _get_reverse_arrays(self):
+        if self._reverse_arrays is None:
+            reverse_graph = self.graph.reverse()
+            self._reverse_arrays = (
+                memoryview(reverse_graph.offsets),
+                memoryview(reverse_graph.targets),
+                memoryview(reverse_graph.weights)
+            )
+        return self._reverse_arrays
+
+    def _workspace(self, slot: int = 0):
+        """
+        這個執行緒自己的搜尋陣列，第一次用到才配置，之後每次查詢只要reset
+
+        雙向搜尋兩邊各用一個slot
+        """
+        workspaces = getattr(self._local, 'workspaces', None)
+        if workspaces is None:
+            workspaces = self._local.workspaces = {}
+        if slot not in workspaces:
+            workspaces[slot] = SearchWorkspace(self.graph.num_nodes)
+        return workspaces[slot]
+
+    def _euclidean_bound(self, end: int, workspace: SearchWorkspace = None):
+        """
+        一次算好所有點到end的直線距離下界，搜尋時直接查表，不用每次展開都開根號\n
+        有workspace時寫進workspace.bound，不用每次查詢都配置新的陣列
+        """
+        graph = self.graph
+        if workspace is None:
+            return np.hypot(graph.x - graph.x[end], graph.y - graph.y[end]) / 200
+        # 平方相加再開根號比np.hypot快
+        bound, scratch = workspace.bound, workspace.scratch
+        np.subtract(graph.x, graph.x[end], out=bound)
+        np.multiply(bound, bound, out=bound)
+        np.subtract(graph.y, graph.y[end], out=scratch)
+        np.multiply(scratch, scratch, out=scratch)
+        np.add(bound, scratch, out=bound)
+        np.sqrt(bound, out=bound)
+        bound /= 200
+        return bound
+
+    def _bidirectional(self, start: int, end: int, max_level: int):
+        """
+        雙向A*，兩邊共用平均位勢 p(v) = (h_end(v) - h_start(v)) / 2，反向用 -p(v)\n
+        這樣兩邊的reduced cost一致，兩邊heap頂端的key相加 >= 目前最佳解時就能停止，結果仍是最短路徑
+        """
+        if start == end:
+            self._set_counters(0, 0, 0)
+            return [start], 0
+        workspace = (self._workspace(0), self._workspace(1))
+        if self.landmarks is not None:
+            with np.errstate(invalid='ignore'):
+                potential = (self.landmarks.lower_bound_to(end, start) - self.landmarks.lower_bound_from(start, end)) / 2
+            potential = np.where(np.isnan(potential), 0, potential)
+        else:
+            potential = self._euclidean_bound(end, workspace[0])
+            np.subtract(potential, self._euclidean_bound(start, workspace[1]), out=potential)
+            potential /= 2
+        p = memoryview(potential).__getitem__
+
+        # 0: 順向，1: 反向
+        adjacency = [(self._offsets, self._targets, self._weights), self._get_reverse_arrays()]
+        sign = (1, -1)
+        generation = (workspace[0].reset(), workspace[1].reset())
+        open_heap = (workspace[0].heap, workspace[1].heap)
+        open_heap[0].append((p(start), 0, 0, start))
+        open_heap[1].append((-p(end), 0, 0, end))
+        workspace[0].visit(start, 0, -1)
+        workspace[1].visit(end, 0, -1)
+        g_score = (workspace[0].g, workspace[1].g)
+        parent = (workspace[0].parent, workspace[1].parent)
+        seen = (workspace[0].seen, workspace[1].seen)
+        closed = (workspace[0].closed, workspace[1].closed)
+        push_count = 1
+
+        best_distance = 1e10
+        meet_node = -1
+        level = 0
+        relaxed = 0
+        peak_open = 2
+        while open_heap[0] and open_heap[1] and level < max_level:
+            if open_heap[0][0][0] + open_heap[1][0][0] >= best_distance:
+                break
+            if len(open_heap[0]) + len(open_heap[1]) > peak_open:
+                peak_open = len(open_heap[0]) + len(open_heap[1])
+
+            # 挑heap比較小的一邊展開
+            side = 0 if len(open_heap[0]) <= len(open_heap[1]) else 1
+            _, _, current_g, current = heappop(open_heap[side])
+            this_generation, this_closed = generation[side], closed[side]
+            if this_closed[current] == this_generation:
+                continue
+            level += 1
+            this_closed[current] = this_generation
+
+            offsets, targets, weights = adjacency[side]
+            this_g, this_parent, this_seen = g_score[side], parent[side], seen[side]
+            other_g, other_seen, other_generation = g_score[1 - side], seen[1 - side], generation[1 - side]
+            relaxed += offsets[current + 1] - offsets[current]
+            for k in range(offsets[current], offsets[current + 1]):
+                child = targets[k]
+                child_g = current_g + weights[k]
+                if this_seen[child] == this_generation and child_g >= this_g[child]:
+                    continue
+
+                this_g[child] = child_g
+                this_parent[child] = current
+                this_seen[child] = this_generation
+                this_closed[child] = 0
+                heappush(open_heap[side], (child_g + sign[side] * p(child), push_count, child_g, child))
+                push_count += 1
+
+                # 另一邊已經走到這個點，就有一條完整的路
+                if other_seen[child] == other_generation and child_g + other_g[child] < best_distance:
+                    best_distance = child_g + other_g[child]
+                    meet_node = child
+
+        self._set_counters(level, relaxed, peak_open)
+        if meet_node == -1:
+            return [], 1e10
+
+        path = workspace[0].path_to(meet_node)[::-1]
+        path.extend(workspace[1].path_to(meet_node)[1:])
+        return path, best_distance
+
+    def _one_to_many(self, start: int, ends: set):
+        """
+        從start跑Dijkstra，ends裡的點都確定最短路徑後就停止；ends到不了的話會把start到得了的點都走完\n
+        回傳({終點: (索引序列, 旅行時間)}, {終點: 確定時已展開的點數})
+        """
+        offsets, targets, weights = self._offsets, self._targets, self._weights
+        remaining = set(ends)
+        found = {end: ([], 1e10) for end in ends}
+        settled_level = {}
+
+        workspace = self._workspace()
+        generation = workspace.reset()
+        g_score, parent, seen, closed = workspace.g, workspace.parent, workspace.seen, workspace.closed
+        open_heap = workspace.heap
+        open_heap.append((0, start))
+        workspace.visit(start, 0, -1)
+
+        level = 0
+        relaxed = 0
+        peak_open = 1
+        while len(open_heap) > 0 and len(remaining) > 0:
+            if len(open_heap) > peak_open:
+                peak_open = len(open_heap)
+            current_g, current = heappop(open_heap)
+            if closed[current] == generation:
+                continue
+            level += 1
+            closed[current] = generation
+            relaxed += offsets[current + 1] - offsets[current]
+
+            if current in remaining:
+                remaining.discard(current)
+                found[current] = (workspace.path_to(current)[::-1], current_g)
+                settled_level[current] = level
+
+            for k in range(offsets[current], offsets[current + 1]):
+                child = targets[k]
+                child_g = current_g + weights[k]
+                if seen[child] == generation and child_g >= g_score[child]:
+                    continue
+                g_score[child] = child_g
+                parent[child] = current
+                seen[child] = generation
+                heappush(open_heap, (child_g, child))
+
+        self._set_counters(level, relaxed, peak_open)
+        return found, settled_level
+
+    def _a_star(self, start: int, end: int, max_level: int, weight: float = 1):
+        """
+        在索引上跑A*，回傳索引序列\n
+        weight > 1時是weighted A*，找到後把最短旅行時間的下界存在last_lower_bound
+        """
+        offsets, targets, weights = self._offsets, self._targets, self._weights
+        workspace = self._workspace()
+        # 一次算好所有點的heuristic，有地標用ALT下界，不然用直線距離
+        h_array = self._euclidean_bound(end, workspace)
+        if self.landmarks is not None:
+            h_array = self.landmarks.lower_bound_to(end, start, h_array, workspace.scratch)
+        h_array = memoryview(h_array)
+
+        # open list用heap存(f, 加入順序, g, 索引)，g記錄各點目前最小的g
+        generation = workspace.reset()
+        g_score, parent, seen, closed = workspace.g, workspace.parent, workspace.seen, workspace.closed
+        open_heap = workspace.heap
+        open_heap.append((0, 0, 0, start))
+        workspace.visit(start, 0, -1)
+        push_count = 1
+
+        # Loop until you find the end
+        level = 0
+        relaxed = 0
+        peak_open = 1
+        while len(open_heap) > 0 and level < max_level:
+            if len(open_heap) > peak_open:
+                peak_open = len(open_heap)
+            # Get the current node (the node in open_heap with the lowest cost)
+            _, _, current_g, current = heappop(open_heap)
+            if closed[current] == generation:
+                continue # 已經用更小的g展開過，這筆是過期的
+            level += 1
+            closed[current] = generation
+
+            # Found the goal
+            if current == end:
+                self._set_counters(level, relaxed, peak_open)
+                self.last_lower_bound = current_g
+                if weight > 1:
+                    # 最短路徑上一定有一個點還在open list裡，而且g已經是最短的；過期的那筆g比較大，不影響最小值
+                    for _, _, node_g, node in open_heap:
+                        if closed[node] != generation and node_g + h_array[node] < self.last_lower_bound:
+                            self.last_lower_bound = node_g + h_array[node]
+                return workspace.path_to(current)[::-1], current_g # Return reversed path
+
+            # Loop through children
+            relaxed += offsets[current + 1] - offsets[current]
+            for k in range(offsets[current], offsets[current + 1]): # Adjacent nodes
+                child = targets[k]
+                child_g = current_g + weights[k]
+                if seen[child] == generation and child_g >= g_score[child]:
+                    continue
+
+                # 找到更短的路就更新，已經展開過的點要重新打開
+                g_score[child] = child_g
+                parent[child] = current
+                seen[child] = generation
+                closed[child] = 0
+                child_h = h_array[child]
+                if child_h == inf:
+                    continue # 地標判斷這個點到不了終點
+                heappush(open_heap, (child_g + weight * child_h, push_count, child_g, child))
+                push_count += 1
+
+        self._set_counters(level, relaxed, peak_open)
+        return [], 1e10
+
+    def _edge_cost(self, u: int, v: int):
+        """索引u到v的節線成本，平行的節線取最小"""
+        offsets, targets, weights = self._offsets, self._targets, self._weights
+        return min(weights[k] for k in range(offsets[u], offsets[u + 1]) if targets[k] == v)
+
+    def _reverse_tree(self, end: int, start: int, max_stretch: float):
+        """
+        從end沿反向路網跑Dijkstra，start確定後再往外走到max_stretch倍的旅行時間；start一定要到得了end\n
+        回傳(各點到end的旅行時間, 往end的下一個點, 樹的半徑, 是否走完所有到得了的點)
+        """
+        offsets, targets, weights = self._get_reverse_arrays()
+        tree_dist = {}
+        tree_next = {end: -1}
+        g_score = {end: 0}
+        open_heap = [(0, end)]
+        radius = inf
+
+        while len(open_heap) > 0:
+            current_g, current = heappop(open_heap)
+            if current in tree_dist:
+                continue
+            if current_g > radius:
+                return tree_dist, tree_next, current_g, False
+            tree_dist[current] = current_g
+            if current == start:
+                radius = current_g * max_stretch
+
+            for k in range(offsets[current], offsets[current + 1]):
+                child = targets[k]
+                child_g = current_g + weights[k]
+                if child in g_score and child_g >= g_score[child]:
+                    continue
+                g_score[child] = child_g
+                tree_next[child] = current
+                heappush(open_heap, (child_g, child))
+
+        return tree_dist, tree_next, inf, True
+
+    def _k_shortest(self, start: int, end: int, k: int, max_level: int, max_stretch: float):
+        """在索引上跑Yen演算法"""
+        if start == end:
+            return [([start], 0)]
+        tree_dist, tree_next, radius, exhaustive = self._reverse_tree(end, start, max_stretch)
+        if start not in tree_dist:
+            return []
+
+        def tree_path(node):
+            path = [node]
+            while tree_next[path[-1]] != -1:
+                path.append(tree_next[path[-1]])
+            return path
+
+        euclidean = memoryview(self._euclidean_bound(end))
+
+        def heuristic(node):
+            # 樹裡面是確切的距離；樹外面的點到end至少是樹的半徑，走完整棵樹還不在裡面就是到不了
+            if node in tree_dist:
+                return tree_dist[node]
+            if exhaustive:
+                return inf
+            return max(radius, euclidean[node])
+
+        found = [(tree_path(start), tree_dist[start])]
+        candidates = []
+        seen = {tuple(found[0][0])}
+        push_count = 0
+        while len(found) < k:
+            last_path = found[-1][0]
+            root_cost = 0
+            for j in range(len(last_path) - 1):
+                spur = last_path[j]
+                root = last_path[:j + 1]
+                # 跟已經找到的路徑有相同root的，下一段節線都不能走
+                blocked_links = {p[j + 1] for p, _ in found if len(p) > j + 1 and p[:j + 1] == root}
+                blocked_nodes = set(root[:-1])
+
+                spur_path = None
+                if spur in tree_dist and tree_next[spur] not in blocked_links:
+                    spur_path = tree_path(spur)
+                    if blocked_nodes.isdisjoint(spur_path):
+                        spur_cost = tree_dist[spur]
+                    else:
+                        spur_path = None
+                if spur_path is None:
+                    spur_path, spur_cost = self._spur_search(
+                        spur, end, heuristic, blocked_nodes, blocked_links, max_level
+                    )
+
+                if len(spur_path) > 0:
+                    path = root[:-1] + spur_path
+                    if tuple(path) not in seen:
+                        seen.add(tuple(path))
+                        heappush(candidates, (root_cost + spur_cost, push_count, path))
+                        push_count += 1
+                root_cost += self._edge_cost(spur, last_path[j + 1])
+
+            if len(candidates) == 0:
+                break
+            distance, _, path = heappop(candidates)
+            found.append((path, distance))
+
+        return found
+
+    def _spur_search(self, start: int, end: int, heuristic, blocked_nodes: set, blocked_links: set, max_level: int):
+        """不經過blocked_nodes、start不走到blocked_links的A*"""
+        offsets, targets, weights = self._offsets, self._targets, self._weights
+        open_heap = [(heuristic(start), 0, 0, start)]
+        g_score = {start: 0}
+        parent = {start: -1}
+        closed_set = set()
+        push_count = 1
+
+        level = 0
+        while len(open_heap) > 0 and level < max_level:
+            _, _, current_g, current = heappop(open_heap)
+            if current in closed_set:
+                continue
+            level += 1
+            closed_set.add(current)
+
+            if current == end:
+                path = []
+                while current != -1:
+                    path.append(current)
+                    current = parent[current]
+                return path[::-1], current_g
+
+            for k in range(offsets[current], offsets[current + 1]):
+                child = targets[k]
+                if child in blocked_nodes or (current == start and child in blocked_links):
+                    continue
+                child_g = current_g + weights[k]
+                if child in g_score and child_g >= g_score[child]:
+                    continue
+                child_h = heuristic(child)
+                if child_h == inf:
+                    continue
+                g_score[child] = child_g
+                parent[child] = current
+                closed_set.discard(child)
+                heappush(open_heap, (child_g + child_h, push_count, child_g, child))
+                push_count += 1
+
+        return [], 1e10
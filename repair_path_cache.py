@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+from processRoadNetwork.ContractionHierarchy import ContractionHierarchy
+from processRoadNetwork.ImportNetwork import ImportNetwork
+from processRoadNetwork.PathCache import PathCache
+from processRoadNetwork.PathRepair import PathRepair
+
+
+def main():
+    node_csv_path = 'P:/09091-中臺區域模式/Working/98_GIS/road/CSV/C_TWN_NET_node.csv'
+    road_csv_path = 'P:/09091-中臺區域模式/Working/98_GIS/road/CSV/C_TWN_NET_link.csv'
+    #修改節線(車道數、方向等)之前備份的節線檔
+    old_road_csv_path = 'P:/09091-中臺區域模式/Working/98_GIS/road/CSV/C_TWN_NET_link_backup.csv'
+
+    excluded_roadtype = ['RR', 'ZL', 'WL', 'TL']
+    road_graph = ImportNetwork.load_graph(node_csv_path, road_csv_path, excluded_roadtype, min_N=5001, max_N=150000)
+    #比對節線只要兩個節線檔
+    old_road_dict = ImportNetwork.get_road_list(old_road_csv_path, excluded_roadtype)
+    road_dict = ImportNetwork.get_road_list(road_csv_path, excluded_roadtype)
+
+    changes = PathRepair.diff_links(old_road_dict, road_dict)
+    del old_road_dict, road_dict
+    print('完成節線比對...(改過的節線數: {})'.format(len(changes)))
+
+    #路網改過，contraction hierarchy會自動重建
+    ch_path = '{}_CH.npz'.format(os.path.splitext(road_csv_path)[0])
+    hierarchy = ContractionHierarchy.prepare(road_graph, ch_path)
+
+    #快取還是舊路網的才接手，只重算受影響的路徑，存檔時就對應新路網
+    path_cache = PathCache.for_network(node_csv_path, road_csv_path, excluded_roadtype)
+    if path_cache.adopt(ImportNetwork.hash_files(node_csv_path, old_road_csv_path)):
+        PathRepair(road_graph, hierarchy).repair(path_cache, changes)
+    path_cache.save()
+
+if __name__ == '__main__':
+    main()
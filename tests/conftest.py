@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from processRoadNetwork.RoadGraph import RoadGraph
+
+
+def grid_dicts(size: int = 8, spacing: float = 500.0):
+    """size x size的格子路網，點號從5001開始，雙向節線，旅行時間 = 長度 / 50"""
+    node_dict = {}
+    road_dict = {}
+    for row in range(size):
+        for col in range(size):
+            node_dict[5001 + row * size + col] = (col * spacing, row * spacing)
+    for row in range(size):
+        for col in range(size):
+            p = 5001 + row * size + col
+            if col + 1 < size:
+                road_dict[(p, p + 1)] = spacing / 50
+                road_dict[(p + 1, p)] = spacing / 50
+            if row + 1 < size:
+                road_dict[(p, p + size)] = spacing / 50
+                road_dict[(p + size, p)] = spacing / 50
+    return node_dict, road_dict
+
+
+@pytest.fixture
+def grid_graph():
+    return RoadGraph.from_dicts(*grid_dicts())
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+
+from processRoadNetwork.BoxPathFinder import BoxPathFinder
+from processRoadNetwork.RoadGraph import RoadGraph
+from tests.conftest import grid_dicts
+
+
+def test_box_path_uses_link_length():
+    node_dict, road_dict = grid_dicts()
+    length_dict = {link: 500.0 for link in road_dict}
+    # 第一列很快但繞遠路的節線：旅行時間最短，距離不是
+    for p in range(5001, 5008):
+        road_dict[(p, p + 1)] = 1.0
+    road_dict[(5001, 5010)] = 100.0
+    length_dict[(5001, 5010)] = 710.0
+    road_dict[(5010, 5001)] = 100.0
+    length_dict[(5010, 5001)] = 710.0
+    finder = BoxPathFinder(RoadGraph.from_dicts(node_dict, road_dict, length_dict))
+    path, found = finder.find_path([5001, 5018])
+    assert found and path == [5001, 5010, 5018]
+
+    # 沒有長度時照旅行時間
+    finder = BoxPathFinder(RoadGraph.from_dicts(node_dict, road_dict))
+    path, found = finder.find_path([5001, 5003])
+    assert found and path == [5001, 5002, 5003]
+
+
+def test_box_path_stays_in_box():
+    node_dict, road_dict = grid_dicts()
+    # 框框是兩點外框加min(max_margin, 距離)，max_margin = 600時5001到5004的框只有前兩列，第一列斷掉要從第二列繞
+    del road_dict[(5002, 5003)]
+    finder = BoxPathFinder(RoadGraph.from_dicts(node_dict, road_dict), max_margin=600)
+    path, found = finder.find_path([5001, 5004])
+    assert found and len(path) == 6 and max(path) <= 5016
+    # 只能往框外繞才到得了時就找不到
+    del road_dict[(5010, 5011)]
+    finder = BoxPathFinder(RoadGraph.from_dicts(node_dict, road_dict), max_margin=600)
+    assert finder.find_path([5001, 5004]) == ([5001, 0, 5004], False)
+
+
+def test_box_finder_reused():
+    finder = BoxPathFinder(RoadGraph.from_dicts(*grid_dicts()), max_cached=2)
+    first = finder._finder([5001, 5010])
+    assert finder._finder([5010, 5001]) is first
+    finder.find_path([5001, 5020])
+    finder.find_path([5001, 5030])
+    assert finder._finder([5001, 5010]) is not first
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+
+import pickle
+
+from processRoadNetwork.ContractionHierarchy import ContractionHierarchy
+from processRoadNetwork.SectionSolver import SectionSolver
+from processRoadNetwork.ShortestPath import ShortestPath
+
+
+def test_pickle_round_trip(grid_graph):
+    hierarchy = ContractionHierarchy.build(grid_graph)
+    copied = pickle.loads(pickle.dumps(hierarchy))
+    for p1, p2 in [(5001, 5064), (5008, 5057), (5030, 5030)]:
+        assert copied.query(p1, p2) == hierarchy.query(p1, p2)
+
+
+def test_solve_with_spawn(grid_graph):
+    hierarchy = ContractionHierarchy.build(grid_graph)
+    sections = [(5001, 5064), (5001, 5020), (5008, 5057), (5033, 5002)]
+    result = SectionSolver(grid_graph, hierarchy).solve(sections, mode='ch', processes=2, start_method='spawn')
+    reference = ShortestPath(grid_graph)
+    for p1, p2 in sections:
+        assert abs(result[(p1, p2)][1] - reference.find_shortest_path([p1, p2], 10 ** 6)[1]) < 1e-9
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from processRoadNetwork.DistanceMatrix import DistanceMatrix
+from processRoadNetwork.RoadGraph import RoadGraph
+from tests.conftest import grid_dicts
+
+
+def test_matrix_matches_single_source_distances():
+    node_dict, road_dict = grid_dicts()
+    road_dict[(5001, 5002)] = 25.0 #單向變慢
+    graph = RoadGraph.from_dicts(node_dict, road_dict, {link: w * 50 for link, w in road_dict.items()})
+    origins = {'S1': 5001, 'S2': 5036, 'S3': 9999}
+    destinations = {'T1': 5002, 'T2': 5064, 'T3': 5029}
+    rows = DistanceMatrix(graph).compute(origins, cutoff=100, destinations=destinations, processes=1)
+
+    found = {(input_id, target_id): (time, length) for input_id, target_id, time, length in rows}
+    for input_id, p1 in origins.items():
+        if p1 not in graph:
+            continue
+        distance = graph.distances_from(graph.index(p1))
+        for target_id, p2 in destinations.items():
+            expected = distance[graph.index(p2)]
+            if expected <= 100:
+                time, length = found[(input_id, target_id)]
+                assert time == pytest.approx(expected)
+                assert length == pytest.approx(expected * 50)
+            else:
+                assert (input_id, target_id) not in found
+    # 同一個起點依旅行時間排序
+    assert [r[1] for r in rows if r[0] == 'S1'] == ['T1', 'T3']
+
+
+def test_max_targets_keeps_nearest():
+    graph = RoadGraph.from_dicts(*grid_dicts())
+    rows = DistanceMatrix(graph).compute({'S1': 5001}, cutoff=1000, max_targets=3, processes=1)
+    assert [r[1] for r in rows] == [5001, 5002, 5009] or [r[1] for r in rows] == [5001, 5009, 5002]
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import numpy as np
+import pytest
+
+from processRoadNetwork.ImportNetwork import ImportNetwork
+
+NODE_CSV = 'N,X,Y\n5001,120.60,24.10\n5002,120.61,24.10\n5003,120.61,24.11\n5004,120.60,24.11\n5003,120.615,24.11\n160000,120.62,24.12\n'
+ROAD_CSV = (
+    'A,B,DIR,LENGTH,SPDCLASS,ROADTYPE\n'
+    '5001,5002,0,1000,1,HW\n' #雙向
+    '5002,5003,1,1100,10,PR\n' #只有A到B
+    '5004,5003,3,1200,40,PR\n' #只有B到A
+    '5004,5001,2,1300,20,PR\n' #雙向
+    '5001,5002,1,900,36,PR\n' #重複的節線，成本用後面的
+    '5003,160000,0,500,10,PR\n' #點號超出範圍
+    '5001,5003,0,800,10,RR\n' #排除的道路種類
+)
+
+
+@pytest.fixture
+def network_files(tmp_path):
+    node_csv_path = tmp_path / 'node.csv'
+    road_csv_path = tmp_path / 'link.csv'
+    node_csv_path.write_text(NODE_CSV, encoding='utf-8')
+    road_csv_path.write_text(ROAD_CSV, encoding='utf-8')
+    return str(node_csv_path), str(road_csv_path)
+
+
+def assert_same_graph(graph, expected):
+    np.testing.assert_array_equal(graph.node_ids, expected.node_ids)
+    np.testing.assert_allclose(graph.x, expected.x)
+    np.testing.assert_array_equal(graph.offsets, expected.offsets)
+    np.testing.assert_array_equal(graph.targets, expected.targets)
+    np.testing.assert_allclose(graph.weights, expected.weights)
+    np.testing.assert_allclose(graph.lengths, expected.lengths)
+
+
+def test_read_graph_matches_build_graph(network_files):
+    node_csv_path, road_csv_path = network_files
+    node_dict = ImportNetwork.get_node_list(node_csv_path, min_N=5001, max_N=150000)
+    road_dict = ImportNetwork.get_road_list(road_csv_path, ['RR'])
+    length_dict = ImportNetwork.get_road_length(road_csv_path, ['RR'])
+    expected = ImportNetwork.build_graph(node_dict, road_dict, length_dict)
+    graph = ImportNetwork.read_graph(node_csv_path, road_csv_path, ['RR'], with_length=True)
+    assert_same_graph(graph, expected)
+
+    links = [(5001, 5002), (5001, 5004), (5002, 5001), (5002, 5003), (5003, 5004), (5004, 5001)]
+    assert graph.num_links == len(links) and all(graph.has_link(p1, p2) for p1, p2 in links)
+    assert graph.link_cost(5001, 5002) == pytest.approx(900 / 40)
+    assert graph.link_cost(5002, 5001) == pytest.approx(1000 / 100)
+    assert graph.coord(5003) == node_dict[5003]
+
+
+def test_load_graph_reuses_store_until_files_change(network_files, monkeypatch):
+    node_csv_path, road_csv_path = network_files
+    graph = ImportNetwork.load_graph(node_csv_path, road_csv_path, ['RR'], with_length=True)
+    assert graph.graph_path is not None
+
+    def fail(*args, **kwargs):
+        raise AssertionError('read the CSV again')
+    with monkeypatch.context() as m:
+        m.setattr(ImportNetwork, 'read_graph', staticmethod(fail))
+        assert_same_graph(ImportNetwork.load_graph(node_csv_path, road_csv_path, ['RR'], with_length=True), graph)
+        # touch過但內容一樣，比對SHA-1後照用
+        stat = os.stat(road_csv_path)
+        os.utime(road_csv_path, (stat.st_atime, stat.st_mtime + 10))
+        assert_same_graph(ImportNetwork.load_graph(node_csv_path, road_csv_path, ['RR'], with_length=True), graph)
+
+    with open(road_csv_path, 'a', encoding='utf-8') as road_csv:
+        road_csv.write('5003,5001,1,700,10,PR\n')
+    changed = ImportNetwork.load_graph(node_csv_path, road_csv_path, ['RR'], with_length=True)
+    assert changed.num_links == graph.num_links + 1
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+from processRoadNetwork.Landmarks import Landmarks
+from processRoadNetwork.RoadGraph import RoadGraph
+from tests.conftest import grid_dicts
+
+
+def test_isolated_westmost_node():
+    node_dict, road_dict = grid_dicts()
+    node_dict[9999] = (-5000.0, 0.0) #最西邊的點沒有任何節線
+    graph = RoadGraph.from_dicts(node_dict, road_dict)
+    landmarks = Landmarks.build(graph, num_landmarks=4)
+
+    assert len(landmarks.landmark_index) == 4
+    assert graph.index(9999) not in landmarks.landmark_index.tolist()
+    # 格子對角的下界要比直線距離好
+    start, end = graph.index(5001), graph.index(5064)
+    assert landmarks.lower_bound_to(end, start)[start] > np.hypot(3500, 3500) / 200
+
+
+def test_unreachable_component_is_covered():
+    node_dict, road_dict = grid_dicts()
+    # 另一塊跟原本格子互相都到不了的格子，點號往後移
+    island_nodes, island_roads = grid_dicts(size=4)
+    node_dict.update({n + 1000: (x + 10000, y) for n, (x, y) in island_nodes.items()})
+    road_dict.update({(p1 + 1000, p2 + 1000): w for (p1, p2), w in island_roads.items()})
+    graph = RoadGraph.from_dicts(node_dict, road_dict)
+    landmarks = Landmarks.build(graph, num_landmarks=4, min_component_size=16)
+
+    island = [graph.index(n + 1000) for n in island_nodes]
+    assert any(i in island for i in landmarks.landmark_index.tolist())
+    assert np.isfinite(landmarks.dist_from[:, island]).any(axis=0).all()
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+from processRoadNetwork.MapMatcher import MapMatcher
+from processRoadNetwork.RoadGraph import RoadGraph
+from tests.conftest import grid_dicts
+
+
+def test_match_noisy_shape_on_grid():
+    node_dict, road_dict = grid_dicts()
+    graph = RoadGraph.from_dicts(node_dict, road_dict, {link: 500.0 for link in road_dict})
+    rng = np.random.default_rng(0)
+    # 沿第一列往東再沿最後一行往北，線型點偏離道路10m左右
+    points = [(x, rng.normal(0, 10)) for x in np.arange(0, 3500, 100)]
+    points += [(3500 + rng.normal(0, 10), y) for y in np.arange(0, 3501, 100)]
+    matched = MapMatcher(graph).match(points)
+    assert matched == list(range(5001, 5009)) + list(range(5016, 5065, 8))
+
+
+def test_split_by_stops():
+    matched = [5001, 5002, 5003, 5011, 0, 5019, 5020]
+    sections = MapMatcher.split_by_stops(matched, [5001, 5003, 5003, 5011, 5020, 5099])
+    assert sections == [[5001, 5002, 5003], [5003], [5003, 5011], None, None]
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+
+from processRoadNetwork.NodeIndex import NodeIndex
+
+
+@pytest.fixture
+def points():
+    rng = np.random.default_rng(0)
+    # 有重複座標、也有擠在一起的點
+    x = np.concatenate([rng.uniform(150000, 350000, 2000), np.full(20, 200000.0), rng.normal(250000, 50, 200)])
+    y = np.concatenate([rng.uniform(2400000, 2800000, 2000), np.full(20, 2600000.0), rng.normal(2600000, 50, 200)])
+    return np.arange(5001, 5001 + len(x)), x, y
+
+
+def test_query_matches_brute_force(points):
+    node_ids, x, y = points
+    index = NodeIndex(node_ids, x, y, leaf_size=8)
+    rng = np.random.default_rng(1)
+    qx = np.concatenate([rng.uniform(140000, 360000, 200), x[:50]])
+    qy = np.concatenate([rng.uniform(2390000, 2810000, 200), y[:50]])
+    nodes, dist = index.query(qx, qy, k=5)
+
+    brute = np.hypot(x[None, :] - qx[:, None], y[None, :] - qy[:, None])
+    expected = np.sort(brute, axis=1)[:, :5]
+    np.testing.assert_allclose(dist, expected)
+    # 距離一樣時點號可能不同，只檢查回傳的點真的是這個距離
+    found_dist = np.hypot(x[nodes - 5001] - qx[:, None], y[nodes - 5001] - qy[:, None])
+    np.testing.assert_allclose(found_dist, dist)
+
+
+def test_query_radius_matches_brute_force(points):
+    node_ids, x, y = points
+    index = NodeIndex(node_ids, x, y)
+    qx, qy = [250000.0, 200000.0, 0.0], [2600000.0, 2600000.0, 0.0]
+    for (found, found_dist), px, py in zip(index.query_radius(qx, qy, 120.0), qx, qy):
+        brute = np.hypot(x - px, y - py)
+        assert sorted(found.tolist()) == sorted(node_ids[brute <= 120.0].tolist())
+        assert np.all(np.diff(found_dist) >= 0)
+
+
+def test_fewer_nodes_than_k():
+    index = NodeIndex.from_node_dict({5001: (0.0, 0.0), 5002: (3.0, 4.0)})
+    nodes, dist = index.query([0.0], [0.0], k=3)
+    assert nodes.tolist() == [[5001, 5002, -1]]
+    assert dist.tolist() == [[0.0, 5.0, np.inf]]
+    assert index.nearest(3.0, 3.0) == (5002, 1.0)
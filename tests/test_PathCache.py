@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+
+from processRoadNetwork.ImportNetwork import ImportNetwork
+from processRoadNetwork.PathCache import PathCache
+
+
+@pytest.fixture
+def network_files(tmp_path):
+    node_csv_path = tmp_path / 'node.csv'
+    road_csv_path = tmp_path / 'link.csv'
+    node_csv_path.write_text('N,X,Y\n5001,0,0\n5002,500,0\n')
+    road_csv_path.write_text('A,B,DIR\n5001,5002,0\n')
+    return str(node_csv_path), str(road_csv_path)
+
+
+def saved_cache(node_csv_path, road_csv_path):
+    path_cache = PathCache.for_network(node_csv_path, road_csv_path, [])
+    path_cache.put(5001, 5002, [5001, 5002], 10.0)
+    path_cache.save()
+    return PathCache.for_network(node_csv_path, road_csv_path, [])
+
+
+def test_unchanged_files_are_not_hashed(network_files, monkeypatch):
+    path_cache = saved_cache(*network_files)
+
+    def fail(*file_paths):
+        raise AssertionError('hashed unchanged network files')
+    monkeypatch.setattr(ImportNetwork, 'hash_files', staticmethod(fail))
+    assert path_cache.get(5001, 5002) == ([5001, 5002], 10.0)
+
+
+def test_touched_files_are_hashed(network_files):
+    path_cache = saved_cache(*network_files)
+    stat = os.stat(network_files[1])
+    os.utime(network_files[1], (stat.st_atime, stat.st_mtime + 10))
+    # 內容沒變，快取照用
+    assert path_cache.get(5001, 5002) == ([5001, 5002], 10.0)
+
+
+def test_changed_files_invalidate(network_files):
+    path_cache = saved_cache(*network_files)
+    with open(network_files[1], 'a') as road_csv:
+        road_csv.write('5002,5001,0\n')
+    assert path_cache.get(5001, 5002) is None
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from processRoadNetwork.PathCache import PathCache
+from processRoadNetwork.PathRepair import PathRepair
+from processRoadNetwork.RoadGraph import RoadGraph
+from processRoadNetwork.ShortestPath import ShortestPath
+from tests.conftest import grid_dicts
+
+PAIRS = [(5001, 5008), (5001, 5064), (5009, 5016), (5057, 5001), (5036, 5029), (5010, 5055)]
+
+
+def cached_paths(tmp_path, graph):
+    path_cache = PathCache(str(tmp_path / 'cache.pickle'), 'old')
+    finder = ShortestPath(graph, path_cache=path_cache)
+    for p1, p2 in PAIRS:
+        finder.find_shortest_path([p1, p2], 10 ** 6)
+    return path_cache
+
+
+def test_repair_invalidates_changed_paths(tmp_path):
+    node_dict, road_dict = grid_dicts()
+    path_cache = cached_paths(tmp_path, RoadGraph.from_dicts(node_dict, road_dict))
+
+    new_road_dict = dict(road_dict)
+    new_road_dict[(5002, 5003)] = 100.0 #第一列變慢
+    new_road_dict[(5010, 5047)] = 1.0 #新增的捷徑
+    del new_road_dict[(5036, 5035)]
+    new_graph = RoadGraph.from_dicts(node_dict, new_road_dict)
+    changes = PathRepair.diff_links(road_dict, new_road_dict)
+    assert len(changes) == 3
+
+    reference = ShortestPath(new_graph)
+    repair = PathRepair(new_graph)
+    affected = repair.affected(path_cache.items(), changes)
+    for p1, p2, _, distance in path_cache.items():
+        if reference.find_shortest_path([p1, p2], 10 ** 6)[1] != pytest.approx(distance):
+            assert (p1, p2) in affected
+    # 沒有經過改過的節線、也用不到捷徑的路徑不用重算
+    assert (5057, 5001) not in affected
+
+    repair.repair(path_cache, changes)
+    assert len(path_cache) == len(PAIRS)
+    for p1, p2, path, distance in path_cache.items():
+        assert distance == pytest.approx(reference.find_shortest_path([p1, p2], 10 ** 6)[1])
+        assert all(new_graph.has_link(a, b) for a, b in zip(path, path[1:]))
+
+
+def test_adopt_only_takes_over_old_network(tmp_path):
+    node_dict, road_dict = grid_dicts()
+    cached_paths(tmp_path, RoadGraph.from_dicts(node_dict, road_dict)).save()
+
+    path_cache = PathCache(str(tmp_path / 'cache.pickle'), 'new')
+    assert path_cache.adopt('old')
+    assert len(path_cache) == len(PAIRS)
+    path_cache.save()
+
+    # 已經對應新路網的快取照常讀取，不會再當成舊路網修一次
+    path_cache = PathCache(str(tmp_path / 'cache.pickle'), 'new')
+    assert not path_cache.adopt('old')
+    assert len(path_cache) == len(PAIRS)
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+import threading
+
+import pytest
+
+from processRoadNetwork.PathClient import PathClient
+from processRoadNetwork.PathServer import PathServer
+from processRoadNetwork.ShortestPath import ShortestPath
+
+
+@pytest.fixture
+def client(grid_graph):
+    server = PathServer(ShortestPath(grid_graph, epsilon=0.5), port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield PathClient(*server.address)
+    server.shutdown()
+    thread.join(5)
+
+
+def test_paths_use_requested_mode(client, grid_graph):
+    local = ShortestPath(grid_graph, epsilon=0.5)
+    sections = [(5001, 5064), (5001, 5057), (5008, 5057)]
+    for mode in ['a_star', 'bidirectional', 'weighted']:
+        expected = [local.find_shortest_path(list(s), 10 ** 6, mode) for s in sections]
+        found = client.find_paths(sections, 10 ** 6, mode)
+        assert [d for _, d in found] == pytest.approx([d for _, d in expected])
+        if mode != 'a_star': #'a_star'的一對多是Dijkstra，旅行時間相同的路徑可能選不一樣的
+            assert found == expected
+
+
+def test_unknown_mode_is_rejected(client):
+    with pytest.raises(RuntimeError, match='400'):
+        client.find_paths([(5001, 5064)], mode='dijkstra')
+
+
+def test_link_costs(client):
+    assert client.link_costs([(5001, 5002), (5001, 5064)]) == [10.0, None]
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+import pickle
+
+import numpy as np
+
+from processRoadNetwork.RoadGraph import RoadGraph
+from tests.conftest import grid_dicts
+
+
+def random_graph(num_nodes: int = 60, num_links: int = 90, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    node_dict = {5001 + i: (float(x), float(y)) for i, (x, y) in enumerate(rng.uniform(0, 5000, (num_nodes, 2)))}
+    road_dict = {}
+    for a, b in rng.integers(5001, 5001 + num_nodes, (num_links, 2)).tolist():
+        if a != b:
+            road_dict[(a, b)] = float(rng.uniform(1, 10))
+    return RoadGraph.from_dicts(node_dict, road_dict), road_dict
+
+
+def test_reachable_matches_search():
+    graph, road_dict = random_graph()
+    for p1 in graph.node_ids.tolist():
+        reached = {p1}
+        stack = [p1]
+        while stack:
+            u = stack.pop()
+            for a, b in road_dict:
+                if a == u and b not in reached:
+                    reached.add(b)
+                    stack.append(b)
+        for p2 in graph.node_ids.tolist():
+            assert graph.reachable(p1, p2) == (p2 in reached)
+    assert not graph.reachable(5001, 4000)
+
+
+def test_save_load_round_trip(tmp_path):
+    node_dict, road_dict = grid_dicts()
+    graph = RoadGraph.from_dicts(node_dict, road_dict, {link: 500.0 for link in road_dict})
+    graph_path = str(tmp_path / 'graph')
+    graph.save(graph_path, options='a', file_stat='1')
+
+    loaded = RoadGraph.load(graph_path, options='a', file_stat='1')
+    assert loaded.signature() == graph.signature()
+    assert isinstance(loaded.targets, np.memmap)
+    np.testing.assert_array_equal(loaded.lengths, graph.lengths)
+    np.testing.assert_array_equal(loaded.component, graph.component)
+    assert loaded.reverse().signature() == graph.reverse().signature()
+    # 讀取條件或檔案記錄對不上就不用存檔
+    assert RoadGraph.load(graph_path, options='b', file_stat='1') is None
+    assert RoadGraph.load(graph_path, options='a', file_stat='2') is None
+
+    # memory map的路網pickle時只傳路徑
+    state = pickle.dumps(loaded)
+    assert len(state) < 1000
+    assert pickle.loads(state).signature() == graph.signature()
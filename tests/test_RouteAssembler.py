@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from processRoadNetwork.RouteAssembler import RouteAssembler
+from processRoadNetwork.SectionSolver import SectionSolver
+from processRoadNetwork.ShortestPath import ShortestPath
+
+SECTION_PATH = {
+    (5001, 5003): [5001, 5002, 5003],
+    (5003, 5011): [5003, 5011],
+    (5011, 5001): [5011, 5010, 5009, 5001],
+}
+
+
+def combine_section(node_list, section_path):
+    """原本output_route.combine_section + append_path的做法，當作對照"""
+    bus_route = []
+    no_failed_section = True
+    for OD_node in zip(node_list, node_list[1:]):
+        if OD_node[0] != OD_node[1]:
+            path_list = section_path.get(OD_node) if 0 not in OD_node else None
+            if path_list is None:
+                no_failed_section = False
+            if no_failed_section:
+                if len(bus_route) == 0:
+                    bus_route.append(path_list[0])
+                for node in path_list[1:-1]:
+                    bus_route.append(-node)
+                if bus_route[-1] != path_list[-1]:
+                    bus_route.append(path_list[-1])
+    return bus_route, no_failed_section
+
+
+@pytest.mark.parametrize('node_list', [
+    [5001, 5003, 5011, 5001],
+    [5001, 5001, 5003, 5003, 5011],
+    [5001, 5003, 0, 5011, 5001],
+    [5001, 5003, 5099, 5011, 5001],
+    [0, 5001, 5003],
+    [5003],
+    [],
+])
+def test_join_sections_matches_combine_section(node_list):
+    bus_route, failed = RouteAssembler.join_sections(node_list, SECTION_PATH)
+    expected_route, expected_ok = combine_section(node_list, SECTION_PATH)
+    assert bus_route == expected_route
+    assert (len(failed) == 0) == expected_ok
+    # 失敗的區間全部列出來，不只第一個
+    assert failed == [
+        OD_node for OD_node in zip(node_list, node_list[1:])
+        if OD_node[0] != OD_node[1] and OD_node not in SECTION_PATH
+    ]
+
+
+def test_assemble_uses_checked_then_solver(grid_graph, tmp_path):
+    # 已確認的路徑可能存成負值
+    (tmp_path / '5001_5003.txt').write_text('5001,-5009,-5010,-5011,5003')
+    assembler = RouteAssembler(SectionSolver(grid_graph), str(tmp_path))
+    routes = assembler.assemble_routes([[5001, 5003, 5019], [5003, 5019, 5019, 0]], mode='a_star', processes=1)
+
+    reference = ShortestPath(grid_graph).find_shortest_path([5003, 5019], 10 ** 6)[0]
+    assert routes[0] == ([5001, -5009, -5010, -5011, 5003] + [-n for n in reference[1:-1]] + [5019], [])
+    assert routes[1] == ([5003] + [-n for n in reference[1:-1]] + [5019], [(5019, 0)])
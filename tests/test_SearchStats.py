@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import json
+
+from processRoadNetwork.SearchStats import SearchStats
+from processRoadNetwork.ShortestPath import ShortestPath
+
+
+def test_records_searches(grid_graph, tmp_path):
+    stats = SearchStats()
+    finder = ShortestPath(grid_graph, stats=stats)
+    finder.find_shortest_path([5001, 5064], 10 ** 6)
+    finder.find_shortest_path([5001, 5064], max_level=5)
+    finder.find_shortest_path([5001, 5002], 10 ** 6) #相鄰的點不用搜尋
+
+    assert len(stats) == 2
+    found, capped = [dict(zip(SearchStats.fields, r)) for r in stats.records]
+    assert found['Found'] and not found['HitMaxLevel']
+    assert found['Expanded'] > capped['Expanded'] == 5
+    assert not capped['Found'] and capped['HitMaxLevel']
+    assert found['Relaxed'] >= found['Expanded'] and found['PeakOpen'] > 0
+
+    summary = stats.summary()
+    assert summary['Queries'] == 2 and summary['NotFound'] == 1 and summary['HitMaxLevel'] == 1
+    assert len(stats.slowest(1)) == 1 and len(stats.slowest_report()) == 3
+
+    stats.save(str(tmp_path / 'stats.csv'))
+    with open(tmp_path / 'stats.csv', newline='', encoding='utf-8') as stats_file:
+        rows = list(csv.reader(stats_file))
+    assert rows[0] == list(SearchStats.fields) and len(rows) == 3
+    stats.save(str(tmp_path / 'stats.json'))
+    with open(tmp_path / 'stats.json', encoding='utf-8') as stats_file:
+        assert json.load(stats_file)['summary']['Queries'] == 2
+
+    assert len(stats.pop_records()) == 2 and len(stats) == 0
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+
+from processRoadNetwork.ContractionHierarchy import ContractionHierarchy
+from processRoadNetwork.PathCache import PathCache
+from processRoadNetwork.RoadGraph import RoadGraph
+from processRoadNetwork.SearchStats import SearchStats
+from processRoadNetwork.ShortestPath import ShortestPath
+from tests.conftest import grid_dicts
+
+DESTINATIONS = [5064, 5057, 5008, 5036, 5002]
+
+
+@pytest.mark.parametrize('mode', ['a_star', 'bidirectional', 'ch'])
+def test_find_paths_from_matches_single_search(grid_graph, mode):
+    finder = ShortestPath(grid_graph, ContractionHierarchy.build(grid_graph))
+    reference = ShortestPath(grid_graph)
+    found = finder.find_paths_from(5001, DESTINATIONS, 10 ** 6, mode)
+    for p2 in DESTINATIONS:
+        path, distance = found[p2]
+        assert path[0] == 5001 and path[-1] == p2
+        assert distance == pytest.approx(reference.find_shortest_path([5001, p2], 10 ** 6)[1])
+
+
+def test_find_paths_from_weighted_uses_weighted_search(grid_graph):
+    finder = ShortestPath(grid_graph, epsilon=0.5)
+    found = finder.find_paths_from(5001, DESTINATIONS, 10 ** 6, 'weighted')
+    for p2 in DESTINATIONS:
+        assert found[p2] == finder.find_shortest_path([5001, p2], 10 ** 6, 'weighted')
+
+
+def test_one_to_many_ignores_max_level(grid_graph):
+    # 對角要展開幾乎整個格子，max_level = 5一定不夠，但終點確定到得了
+    found = ShortestPath(grid_graph).find_paths_from(5001, [5064], max_level=5, mode='a_star')
+    assert len(found[5064][0]) == 15
+
+
+def test_k_shortest_tree_ignores_max_level(grid_graph):
+    # 反向最短路徑樹只受max_stretch限制，max_level很小時最短的那條還是要找得到
+    paths = ShortestPath(grid_graph).k_shortest_paths([5001, 5064], k=3, max_level=5)
+    assert len(paths) >= 1
+    assert paths[0][1] == pytest.approx(140.0)
+
+
+def test_one_to_many_does_not_cache_beyond_max_level(grid_graph, tmp_path):
+    path_cache = PathCache(str(tmp_path / 'cache.pickle'), 'test')
+    finder = ShortestPath(grid_graph, path_cache=path_cache)
+    found = finder.find_paths_from(5001, [5064, 5003], max_level=5, mode='a_star')
+    assert len(found[5064][0]) == 15
+    # 5064超過max_level才確定，沒有存進快取，有限制的單一查詢還是照自己的max_level
+    assert path_cache.get(5001, 5064) is None
+    assert path_cache.get(5001, 5003) is not None
+    assert finder.find_shortest_path([5001, 5064], max_level=5, mode='a_star') == ([], 1e10)
+
+
+def test_waypoint_chain_joins_legs(grid_graph):
+    finder = ShortestPath(grid_graph)
+    path, leg_costs = finder.find_waypoint_path([5001, 5008, 5008, 5064, 5008], 10 ** 6)
+    assert leg_costs == [70.0, 0, 70.0, 70.0]
+    assert path[0] == 5001 and path[-1] == 5008
+    assert path.index(5064) == 14
+    assert all(grid_graph.has_link(a, b) for a, b in zip(path, path[1:]))
+    # 有一段到不了就整條都找不到
+    assert finder.find_waypoint_path([5001, 5008, 9999], 10 ** 6) == ([], [])
+
+
+def test_unreachable_pair_is_not_searched():
+    node_dict, road_dict = grid_dicts()
+    # 5001只出不進
+    for p in (5002, 5009):
+        del road_dict[(p, 5001)]
+    finder = ShortestPath(RoadGraph.from_dicts(node_dict, road_dict), stats=SearchStats())
+    assert finder.find_shortest_path([5064, 5001], 10 ** 6) == ([], 1e10)
+    assert len(finder.stats) == 0
+    assert finder.k_shortest_paths([5064, 5001]) == []
+    assert len(finder.find_shortest_path([5001, 5064], 10 ** 6)[0]) == 15
+    assert len(finder.stats) == 1
+
+
+@pytest.mark.parametrize('epsilon', [0.0, 0.5, 2.0])
+def test_weighted_within_bound(epsilon):
+    rng = np.random.default_rng(0)
+    node_dict, road_dict = grid_dicts(size=12)
+    road_dict = {link: w * rng.uniform(1, 3) for link, w in road_dict.items()}
+    graph = RoadGraph.from_dicts(node_dict, road_dict)
+    finder = ShortestPath(graph, epsilon=epsilon)
+    for p2 in (5144, 5012, 5077):
+        optimal = finder.find_shortest_path([5001, p2], 10 ** 6, 'a_star')[1]
+        path, distance = finder.find_shortest_path([5001, p2], 10 ** 6, 'weighted')
+        assert path[0] == 5001 and path[-1] == p2
+        assert sum(graph.link_cost(a, b) for a, b in zip(path, path[1:])) == pytest.approx(distance)
+        assert finder.last_lower_bound <= optimal + 1e-9
+        assert optimal - 1e-9 <= distance <= (1 + epsilon) * finder.last_lower_bound + 1e-9